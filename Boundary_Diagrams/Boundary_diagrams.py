@@ -1,10 +1,32 @@
-import matplotlib.pyplot as plt
-import pypowsybl.network as pp
-import pypowsybl.loadflow as lf 
-import pandas as pd
-import pypowsybl.report as nf
+import logging
 import math
 import os 
+import sys
+
+# Shared helpers live in the repository level Common folder
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Common.lazy import lazy_import, preload
+# Imported on first use, so runs with nothing to solve or plot do not load pypowsybl or matplotlib
+plt = lazy_import('matplotlib.pyplot')
+pp = lazy_import('pypowsybl.network')
+lf = lazy_import('pypowsybl.loadflow')
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+from Common.accumulator import ColumnAccumulator
+from Common.batch import date_range
+from Common.borders import border_table, borders_in_scan, x_node_flows
+from Common.flow_aggregates import FlowAggregator
+from Common.pipeline import Pipeline, Stage, failed_keys
+from Common.solver import AC_PROFILES, STRATEGY_FILE, StrategyStore, run_loadflow
+from Common.solver_report import SolverReport
+from Common.ucte_scan import scan_ucte
+from Common.time_axis import day_timestamps, parse_resolution
+
+# Columns returned by extract_boundary_nodes
+BOUNDARY_SCHEMA = {'id': 'category', 'bus_breaker_id': 'category', 'I': 'float', 'P': 'float', 'Q': 'float', 'Timestamp': 'category'}
+
+# Borders studied when none are given, see Common/borders.py for the mapping table
+DEFAULT_BORDERS = ['GR']
 
 def get_user_inputs():
     """
@@ -13,11 +35,12 @@ def get_user_inputs():
     ucte_folder = input("Enter the path for UCTE folder (e.g., 'C:/Users/k.sidiropoulos/Downloads/CGM_greek_nodes'): ").strip()
     output_folder = input("Enter the path for Excel output folder (e.g., 'C:/Users/k.sidiropoulos/Downloads/CGM_greek_nodes/Daily_excel'): ").strip()
     output_folder1 = input("Enter the path for diagrams output folder (e.g., 'C:/Users/k.sidiropoulos/Downloads/CGM_greek_nodes/Daily_excel/diagrams'): ").strip()
-    Date = input("Enter the date in YYYYMMDD format (e.g., '20240717'): ").strip()
+    Date = input("Enter the date in YYYYMMDD format (e.g., '20240717'), or a period (e.g., '20240701-20240731'): ").strip()
     File_type = input("Enter the file type (e.g., 'FO3'): ").strip()
     country_code = input("Enter the country code (e.g., 'UX'): ").strip()
     format = input("Enter the file format (e.g., 'UCT'): ").strip()
     numbers = input("Enter the range of numbers (e.g., '0-20'): ").strip()
+    resolution = parse_resolution(input("Enter the time resolution in minutes (60 or 15, leave blank for 60): "))
     
     # Convert 'numbers' input to a range
     try:
@@ -28,115 +51,278 @@ def get_user_inputs():
         numbers = range(0, 21)
 
     # Return user inputs
-    return ucte_folder, output_folder, output_folder1, Date, File_type, country_code, format, numbers
+    return ucte_folder, output_folder, output_folder1, Date, File_type, country_code, format, numbers, day_timestamps(resolution)
 
 def main():
     # Get user inputs
-    ucte_folder, output_folder, output_folder1, Date, File_type, country_code, format, numbers = get_user_inputs()
-    #Timestamps
-    hours = ['0030', '0130', '0230', '0330', '0430', '0530', '0630', '0730', '0830', '0930', '1030', '1130', 
-         '1230', '1330', '1430', '1530', '1630', '1730', '1830', '1930', '2030', '2130', '2230', '2330']
-    combined = pd.DataFrame()  # Initialize combined DataFrame 
-    #Iterate through each timestamp
-    for hour in hours:
-        highest_number = -1
-        selected_ucte_path = None
-        #Iterate through numbers to check for highest UCTE version
-        for number in numbers:
-            # Construct the UCTE filename
-            ucte_filename = f'{Date}_{hour}_{File_type}_{country_code}{number}.{format}'
-            ucte_path = os.path.join(ucte_folder, ucte_filename)
-
-            if os.path.exists(ucte_path):
-                if number > highest_number:
-                    highest_number = number
-                    selected_ucte_path = ucte_path
-
-        if selected_ucte_path:
-            print(f'Highest number version was: {highest_number}')
-            network = load_and_run_loadflow(selected_ucte_path)
-            filtered_data = extract_boundary_nodes(network, hour)
-            combined = pd.concat([combined, filtered_data], ignore_index=True)
-        else:
-            print(f'No valid version found for hour: {hour}. Skipping this hour.')
-            continue  # Skip this hour and move on to the next one
+    ucte_folder, output_folder, output_folder1, Date, File_type, country_code, format, numbers, hours = get_user_inputs()
+    if '-' in Date:
+        # Period: profiles, envelopes and duration curves per node instead of the daily plots
+        start_date, end_date = Date.split('-')
+        process_boundary_period(ucte_folder, output_folder, output_folder1, date_range(start_date, end_date),
+                                File_type, country_code, format, numbers, hours)
+    else:
+        process_boundary_files(ucte_folder, output_folder, output_folder1, Date, File_type, country_code, format, numbers, hours)
 
-    if not combined.empty:
-        output_file = os.path.join(output_folder, f'GREEK_BOUNDARY_NODES_{Date}.xlsx')
-        save_combined_data(combined, output_file)
+def process_boundary_files(ucte_folder, output_folder, output_folder1, Date, File_type, country_code, format, numbers, hours=None,
+                           readers=1, solvers=1, borders=None):
+    """
+    Solve the highest UCTE version of every hour, save the boundary nodes of every border (Greek by default,
+    {code: border} from border_table) and plot them. All borders come from the same solved networks.
+    Reading the next UCTE files overlaps with the load flow of the current hour.
+    """
+    #Timestamps, hourly by default
+    hours = hours or day_timestamps()
+    borders = borders or border_table(DEFAULT_BORDERS)
+    combined = {code: ColumnAccumulator(BOUNDARY_SCHEMA) for code in borders}  # Rows of every hour are appended here
+    store = StrategyStore(os.path.join(output_folder, STRATEGY_FILE))
+    try:
+        results, failed = solve_boundary_day(ucte_folder, Date, File_type, country_code, format, numbers, hours, store, readers,
+                                             solvers, borders)
+    finally:
+        store.save()
+    if failed:
+        print(f"Hours {', '.join(failed)} of {Date} failed, the output is written without them.")
+    for hour, border_nodes in results:
+        for code, filtered_data in border_nodes.items():
+            combined[code].append_frame(filtered_data)
+
+    saved = [code for code in borders if len(combined[code])]
+    for code in saved:
+        output_file = os.path.join(output_folder, f"{borders[code]['name']}_BOUNDARY_NODES_{Date}.xlsx")
+        save_combined_data(combined[code].to_frame(), output_file)
         generate_plots(hours, output_file, output_folder1)
+    if saved:
         print("Current, active power, and reactive power plotting completed. Files are saved to the output folder.")
     else:
         print("No valid data was processed. No output generated.")
 
-def load_and_run_loadflow(selected_ucte_path):
+def solve_boundary_day(ucte_folder, Date, File_type, country_code, format, numbers, hours, store=None, readers=1, solvers=1,
+                       borders=None):
+    """
+    Returns [(hour, {border: boundary nodes of the hour})] in timestamp order for the hours that could be solved,
+    and the hours that failed with an error (logged by the pipeline).
+    """
+    borders = borders or border_table(DEFAULT_BORDERS)
+
+    def read(hour):
+        selected_ucte_path = find_highest_version_path(ucte_folder, Date, hour, File_type, country_code, format, numbers)
+        if not selected_ucte_path:
+            print(f'No valid version found for hour: {hour}. Skipping this hour.')
+            return None  # Skip this hour and move on to the next one
+        # Pre-scan: invalid files and files without X-nodes of the borders are not loaded at all
+        scan = scan_ucte(selected_ucte_path)
+        if not scan['valid']:
+            print(f"Skipping hour {hour}, invalid UCTE file: {'; '.join(scan['errors'])}")
+            return None
+        if not borders_in_scan(scan, borders):
+            print(f"Skipping hour {hour}, no X-nodes of {', '.join(borders)} in {os.path.basename(selected_ucte_path)}.")
+            return None
+        return hour, selected_ucte_path, pp.load(selected_ucte_path)
+
+    def solve(item):
+        hour, selected_ucte_path, network = item
+        if not solve_boundary_network(network, selected_ucte_path, store):
+            print(f'Skipping hour {hour}, the load flow diverged.')
+            return None
+        return hour, extract_border_nodes(network, hour, borders)
+
+    preload(pp, lf)
+    results, errors = Pipeline([Stage('read', read, readers), Stage('solve', solve, solvers)]).run(hours)
+    # Rows are returned in timestamp order whatever order the hours were solved in
+    return sorted(results, key=lambda result: hours.index(result[0])), sorted(failed_keys(errors), key=hours.index)
+
+def process_boundary_period(ucte_folder, output_folder, output_folder1, dates, File_type, country_code, format, numbers, hours=None,
+                            borders=None):
+    """
+    Stream several days through extract_border_nodes into per node aggregates (time of day profiles, min/max
+    envelopes, duration curves). Only one day of rows is held at a time. Saves the aggregates of every border to
+    <BORDER>_BOUNDARY_SUMMARY_<first>_<last>.xlsx (GREEK_... by default) and one chart per node.
+    A failed hour or day is logged and left out of the summary, the other days are still aggregated.
+    """
+    hours = hours or day_timestamps()
+    borders = borders or border_table(DEFAULT_BORDERS)
+    aggregators = {code: FlowAggregator(hours) for code in borders}
+    store = StrategyStore(os.path.join(output_folder, STRATEGY_FILE))
+    failed_days = []
+    try:
+        for Date in dates:
+            print(f'Processing {Date}')
+            try:
+                results, failed = solve_boundary_day(ucte_folder, Date, File_type, country_code, format, numbers, hours, store,
+                                                     borders=borders)
+            except Exception as e:
+                logging.exception(f"Boundary day {Date} failed")
+                print(f"Skipping {Date}, it failed: {e}")
+                failed_days.append(Date)
+                continue
+            if failed:
+                print(f"Hours {', '.join(failed)} of {Date} failed, the summary is built without them.")
+            for hour, border_nodes in results:
+                for code, filtered_data in border_nodes.items():
+                    aggregators[code].add_frame(filtered_data)
+    finally:
+        store.save()
+    if failed_days:
+        print(f"Days {', '.join(failed_days)} failed and are not in the summary.")
+
+    if not any(aggregator.nodes for aggregator in aggregators.values()):
+        print("No valid data was processed. No output generated.")
+        return
+    period = f'{dates[0]}_{dates[-1]}'
+    for code, aggregator in aggregators.items():
+        if not aggregator.nodes:
+            continue
+        output_file = os.path.join(output_folder, f"{borders[code]['name']}_BOUNDARY_SUMMARY_{period}.xlsx")
+        profiles = aggregator.profiles()
+        duration_curves = aggregator.duration_curves()
+        with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+            profiles.to_excel(writer, sheet_name='Profiles', index=False)
+            duration_curves.to_excel(writer, sheet_name='Duration Curves', index=False)
+        plot_period_summary(aggregator, profiles, duration_curves, output_folder1, period)
+        print(f"Summary of {len(dates) - len(failed_days)} days saved to {output_file}, charts saved to the diagrams folder.")
+
+def plot_period_summary(aggregator, profiles, duration_curves, output_folder, period):
+    """
+    One chart per node: for I, P and Q the mean profile over the time of day with its min/max envelope,
+    and the duration curve.
+    """
+    labels = {'I': 'Current (A)', 'P': 'Active Power (MW)', 'Q': 'Reactive Power (MVAr)'}
+    label_step = max(1, len(aggregator.timestamps) // 24)
+    for bus_breaker_id in aggregator.nodes:
+        fig, axes = plt.subplots(len(aggregator.quantities), 2, figsize=(14, 4 * len(aggregator.quantities)), squeeze=False)
+        for row, quantity in enumerate(aggregator.quantities):
+            profile = profiles[(profiles['bus_breaker_id'] == bus_breaker_id) & (profiles['Quantity'] == quantity)]
+            positions = range(len(profile))
+            ax = axes[row][0]
+            ax.fill_between(positions, profile['Min'], profile['Max'], color='lightgrey', label='Min/Max')
+            ax.plot(positions, profile['Mean'], color='black', marker='o', markersize=3, label='Mean')
+            ax.set_xticks(list(positions)[::label_step])
+            ax.set_xticklabels(list(profile['Timestamp'])[::label_step], rotation=90)
+            ax.set_ylabel(labels.get(quantity, quantity))
+            ax.set_title(f'{quantity} profile for {bus_breaker_id} ({period})')
+            ax.grid(True, zorder=0)
+            ax.axhline(y=0, color='black', linestyle='--', linewidth=1)
+            ax.legend()
+
+            curve = duration_curves[(duration_curves['bus_breaker_id'] == bus_breaker_id) & (duration_curves['Quantity'] == quantity)]
+            ax = axes[row][1]
+            ax.plot(curve['Exceedance (%)'], curve['Value'], color='black')
+            ax.set_xlabel('Time exceeded (%)')
+            ax.set_ylabel(labels.get(quantity, quantity))
+            ax.set_title(f'{quantity} duration curve for {bus_breaker_id}')
+            ax.grid(True, zorder=0)
+            ax.axhline(y=0, color='black', linestyle='--', linewidth=1)
+        fig.tight_layout()
+        boundary_line_id = aggregator.labels.get(bus_breaker_id, bus_breaker_id)
+        fig.savefig(os.path.join(output_folder, f'{bus_breaker_id}_{boundary_line_id}_{period}_summary.png'))
+        plt.close(fig)
+
+def find_highest_version_path(ucte_folder, Date, hour, File_type, country_code, format, numbers):
+    """
+    Path of the highest UCTE version of an hour, or None.
+    """
+    highest_number = -1
+    selected_ucte_path = None
+    #Iterate through numbers to check for highest UCTE version
+    for number in numbers:
+        # Construct the UCTE filename
+        ucte_filename = f'{Date}_{hour}_{File_type}_{country_code}{number}.{format}'
+        ucte_path = os.path.join(ucte_folder, ucte_filename)
+
+        if os.path.exists(ucte_path):
+            if number > highest_number:
+                highest_number = number
+                selected_ucte_path = ucte_path
+
+    if selected_ucte_path:
+        print(f'Highest number version was: {highest_number}')
+    return selected_ucte_path
+
+def update_boundary_hour(network, hour, output_folder, output_folder1, Date, hours, borders=None):
+    """
+    Replace the rows of one hour in the boundary nodes file of every border (Greek by default, {code: border} from
+    border_table) with the ones of a newly solved network and redraw the plots, as a batch run of the day writes them.
+    Returns the files that were written.
+    """
+    borders = borders or border_table(DEFAULT_BORDERS)
+    border_nodes = extract_border_nodes(network, hour, borders)
+    written = []
+    for code, border in borders.items():
+        output_file = os.path.join(output_folder, f"{border['name']}_BOUNDARY_NODES_{Date}.xlsx")
+        filtered_data = border_nodes.get(code, pd.DataFrame(columns=list(BOUNDARY_SCHEMA)))
+        if os.path.exists(output_file):
+            existing = pd.read_excel(output_file, dtype={'Timestamp': str})
+            existing = existing[existing['Timestamp'].str.zfill(4) != hour]
+            existing['Timestamp'] = existing['Timestamp'].astype(int)
+            combined = pd.concat([existing, filtered_data], ignore_index=True)
+        else:
+            combined = filtered_data
+        # A border without X-nodes in this hour and no file yet gets no file, as in a batch run
+        if combined.empty:
+            continue
+        save_combined_data(combined, output_file)
+        generate_plots(hours, output_file, output_folder1)
+        written.append(output_file)
+    return written
+
+# OpenLoadFlow settings of the boundary load flow, the solver profiles add regulation and iteration limits
+LOADFLOW_PROVIDER_PARAMETERS = {'lowImpedanceBranchMode': 'REPLACE_BY_MIN_IMPEDANCE_LINE'}
+
+def load_and_run_loadflow(selected_ucte_path, store=None):
         """
           Load the network from the UCTE file and run the AC load flow.
+          Returns None when no solver profile converges.
         """
         #Load the UCTE 
         network = pp.load(selected_ucte_path)
-        reporter = nf.Reporter()
-        #PERFORMING AC LOADFLOW, specifying the parameters
-        p = lf.Parameters(  
-                distributed_slack=False ,
-                transformer_voltage_control_on=False , 
-                phase_shifter_regulation_on=True ,
-                shunt_compensator_voltage_control_on=True ,
-                voltage_init_mode=None, 
-                use_reactive_limits=None,  
-                twt_split_shunt_admittance=None, 
-                read_slack_bus=None, 
-                write_slack_bus=None, 
-                balance_type=None, 
-                dc_use_transformer_ratio=None, 
-                countries_to_balance=None, 
-                connected_component_mode=None, 
-                dc_power_factor=None,
-                provider_parameters={
-            'maxOuterLoopIterations' : str(30) ,
-            'lowImpedanceBranchMode': 'REPLACE_BY_MIN_IMPEDANCE_LINE' 
-                })
-        lf.run_ac(network , parameters = p , reporter= reporter) # User can use report_node = reporter instead reporter = reporter. 
-        #Print the provider parameters
-        print(str(reporter))
+        if not solve_boundary_network(network, selected_ucte_path, store):
+            return None
 
         return network
+
+def solve_boundary_network(network, selected_ucte_path, store=None):
+        """
+          Run the AC load flow on a loaded network. Returns False when no solver profile converges.
+        """
+        report = SolverReport(selected_ucte_path, os.path.dirname(store.path) if store is not None else None)
+        #PERFORMING AC LOADFLOW, fast profile first and heavier ones only if it does not converge
+        profile = run_loadflow(network, selected_ucte_path, AC_PROFILES, LOADFLOW_PROVIDER_PARAMETERS, store, report=report)
+        #Log the warnings and summaries of the report, the full report only when it diverged
+        report.finish(profile)
+        if profile is None:
+            print(f'Load flow did not converge for {selected_ucte_path}.')
+            return False
+        return True
         
 
-def extract_boundary_nodes(network, hour):
+def extract_border_nodes(network, hour, borders):
     """
-    Extract X-Nodes (boundary nodes) from the network and filter Greek boundary nodes.
+    Extract the X-Nodes (boundary nodes) of every border from one solved network.
+    Returns {border: boundary nodes}, borders without X-nodes in the network are left out.
     """
-    #Get the X-nodes of the UCTE
-    X_nodes = network.get_dangling_lines(attributes = ['bus_breaker_bus_id' ,'i' , 'p' , 'q' ])  # TAKE ALL THE BOUNDARY LINES OF THE CGM 
-    X_nodes.reset_index(inplace=True)
-    X_nodes.rename(columns={'index': 'id'}, inplace=True)
+    #Get the X-nodes of the UCTE, each with the border of the node it is connected to
+    X_nodes = x_node_flows(network, borders)  # TAKE ALL THE BOUNDARY LINES OF THE CGM
     X_nodes['id'] = X_nodes['id'].astype(str).str.replace(' ', '_')
-    X_nodes.rename(columns={'i': 'I', 'p': 'P', 'q': 'Q' , 'bus_breaker_bus_id': 'bus_breaker_id' }, inplace=True)
-    # we study THE P , Q ,I FROM THE GREEK BOUNDARY NODES
-    filtered = X_nodes[X_nodes['bus_breaker_id'].str.startswith(('G')) ].copy() 
-    filtered.columns = filtered.columns.str.strip()
-    filtered['Timestamp'] = hour 
+    X_nodes['Timestamp'] = hour
     #Give prefix to current and numeric form
-    filtered = adjust_prefixes(filtered) 
-    filtered = convert_to_numeric(filtered)
-    return filtered
+    X_nodes = adjust_prefixes(X_nodes)
+    X_nodes = convert_to_numeric(X_nodes)
+    # we study THE P , Q ,I FROM THE BOUNDARY NODES of each border
+    return {code: filtered[list(BOUNDARY_SCHEMA)] for code, filtered in X_nodes.groupby('Border', sort=False)}
 
-def adjust_prefixes(df):
-    def has_minus(value):
-        return '-' in str(value)
+def extract_boundary_nodes(network, hour, border='GR'):
+    """
+    Extract X-Nodes (boundary nodes) from the network and filter the boundary nodes of one border (Greek by default).
+    """
+    border_nodes = extract_border_nodes(network, hour, border_table([border]))
+    return border_nodes.get(border, pd.DataFrame(columns=list(BOUNDARY_SCHEMA)))
 
-    df['P_minus'] = df['P'].apply(lambda x: '-' if has_minus(x) else '')
-    df['Q_minus'] = df['Q'].apply(lambda x: '-' if has_minus(x) else '')
-    
-    df['I'] = df.apply(
-        lambda row: f"{row['P_minus']}{row['I']}" if row['P'] != 0 and row['P_minus'] else 
-                    f"{row['Q_minus']}{row['I']}" if row['P'] == 0 and row['Q_minus'] else 
-                    row['I'],
-        axis=1
-    )
-    
-    df.drop(columns=['P_minus', 'Q_minus'], inplace=True)
+def adjust_prefixes(df):
+    # The current gets the sign of P, or of Q when P is 0 (a -0.0 counts as negative)
+    sign = df['P'].where(df['P'] != 0, df['Q']).to_numpy(dtype=float)
+    negative = np.signbit(sign) & ~np.isnan(sign)
+    df['I'] = df['I'].where(~negative, -df['I'])
     return df
 
 def convert_to_numeric(df):
@@ -151,7 +337,7 @@ def save_combined_data(combined, output_file):
     Save the combined DataFrame to an Excel file.
     """
     #Ensure timestamp is 4 digit
-    combined['Timestamp'] = combined['Timestamp'].apply(lambda x: f'{int(x):04d}')
+    combined['Timestamp'] = combined['Timestamp'].astype(int).apply(lambda x: f'{x:04d}')
     #Sort data and save to excel
     combined.sort_values(by=['bus_breaker_id', 'Timestamp'], inplace=True)
     combined.to_excel(output_file, index=False)       
@@ -221,7 +407,9 @@ def plot_data(filtered_df, combine, column, bus_breaker_id, ylabel, title, outpu
         plt.xlabel('Timestamp')
         plt.ylabel(ylabel)
         # Define the x-axis ticks as the mapped time points and rotate the labels for better visibility
-        plt.xticks(ticks=list(time_point_to_index.values()), labels=hours, rotation=90)
+        # With quarter-hour timestamps only every 4th label is written, the points keep their own position
+        label_step = max(1, len(hours) // 24)
+        plt.xticks(ticks=list(time_point_to_index.values())[::label_step], labels=hours[::label_step], rotation=90)
         # Set the y-axis limits and add ticks based on the calculated step size
         plt.ylim(min_limit, max_limit)
         plt.yticks(range(min_limit, max_limit+1, step))
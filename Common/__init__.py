@@ -0,0 +1,3 @@
+"""
+Shared helpers used by the Daily LoadFlow, Boundary Diagrams, Data Analysis and Monthly TCC scripts.
+"""
@@ -0,0 +1,187 @@
+from Common.lazy import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+"""
+Append-only column accumulator. Rows are copied once into chunked NumPy buffers instead of
+growing a DataFrame with pd.concat, so long monthly / multi-day runs stay linear in time and small in memory.
+"""
+
+CATEGORY = 'category'
+FLOAT = 'float'
+INT = 'int'
+OBJECT = 'object'
+
+
+class ColumnAccumulator:
+    """
+    Typed append-only table.
+
+    schema: dict column -> kind ('category', 'float', 'int', 'object'). If None, it is inferred from the
+            first appended frame (numeric columns become 'float'/'int', everything else 'category').
+    chunk_size: number of rows preallocated per buffer chunk.
+    float32: store float columns as float32 instead of float64 (halves the memory of I/P/Q/TCC values).
+    """
+
+    def __init__(self, schema=None, chunk_size=4096, float32=False):
+        if chunk_size <= 0:
+            raise ValueError("chunk_size should be greater than zero.")
+        self.chunk_size = chunk_size
+        self.float_dtype = np.float32 if float32 else np.float64
+        self.schema = None
+        self._chunks = []  # full chunks, list of dict column -> array
+        self._current = None
+        self._fill = 0
+        self._rows = 0
+        self._categories = {}  # column -> dict value -> code
+        if schema is not None:
+            self._set_schema(schema)
+
+    def __len__(self):
+        return self._rows
+
+    @property
+    def columns(self):
+        return list(self.schema) if self.schema else []
+
+    def _set_schema(self, schema):
+        for column, kind in schema.items():
+            if kind not in (CATEGORY, FLOAT, INT, OBJECT):
+                raise ValueError(f"Unknown kind '{kind}' for column '{column}'.")
+        self.schema = dict(schema)
+        self._categories = {column: {} for column, kind in self.schema.items() if kind == CATEGORY}
+        self._current = self._new_chunk()
+        self._fill = 0
+
+    def _infer_schema(self, df):
+        schema = {}
+        for column in df.columns:
+            if pd.api.types.is_bool_dtype(df[column]):
+                schema[column] = CATEGORY
+            elif pd.api.types.is_integer_dtype(df[column]):
+                schema[column] = INT
+            elif pd.api.types.is_float_dtype(df[column]):
+                schema[column] = FLOAT
+            else:
+                schema[column] = CATEGORY
+        return schema
+
+    def _new_chunk(self):
+        chunk = {}
+        for column, kind in self.schema.items():
+            if kind == CATEGORY:
+                chunk[column] = np.full(self.chunk_size, -1, dtype=np.int32)
+            elif kind == FLOAT:
+                chunk[column] = np.full(self.chunk_size, np.nan, dtype=self.float_dtype)
+            elif kind == INT:
+                chunk[column] = np.zeros(self.chunk_size, dtype=np.int64)
+            else:
+                chunk[column] = np.full(self.chunk_size, None, dtype=object)
+        return chunk
+
+    def _encode(self, column, values):
+        # Map values to global category codes, factorizing only the unique values of the batch
+        codes, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=True)
+        mapping = self._categories[column]
+        lookup = np.empty(len(uniques), dtype=np.int32)
+        for idx, value in enumerate(uniques):
+            code = mapping.get(value)
+            if code is None:
+                code = len(mapping)
+                mapping[value] = code
+            lookup[idx] = code
+        encoded = np.full(len(codes), -1, dtype=np.int32)
+        valid = codes >= 0
+        encoded[valid] = lookup[codes[valid]]
+        return encoded
+
+    def _convert(self, column, values):
+        kind = self.schema[column]
+        if kind == CATEGORY:
+            return self._encode(column, values)
+        if kind == FLOAT:
+            return pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=self.float_dtype, na_value=np.nan)
+        if kind == INT:
+            return np.asarray(values, dtype=np.int64)
+        return np.asarray(values, dtype=object)
+
+    def append(self, **row):
+        """
+        Append a single row given as keyword arguments. Missing columns are left empty.
+        """
+        if self.schema is None:
+            self._set_schema(self._infer_schema(pd.DataFrame({key: [value] for key, value in row.items()})))
+        unknown = set(row) - set(self.schema)
+        if unknown:
+            raise KeyError(f"Columns {sorted(unknown)} are not part of the accumulator schema.")
+        if self._fill == self.chunk_size:
+            self._flush()
+        for column, value in row.items():
+            self._current[column][self._fill] = self._convert(column, [value])[0]
+        self._fill += 1
+        self._rows += 1
+
+    def append_frame(self, df):
+        """
+        Append every row of a DataFrame. Extra columns raise, missing columns are left empty.
+        """
+        if df is None or df.empty:
+            return
+        if self.schema is None:
+            self._set_schema(self._infer_schema(df))
+        unknown = set(df.columns) - set(self.schema)
+        if unknown:
+            raise KeyError(f"Columns {sorted(unknown)} are not part of the accumulator schema.")
+
+        converted = {column: self._convert(column, df[column].to_numpy()) for column in df.columns}
+        n_rows = len(df)
+        start = 0
+        while start < n_rows:
+            if self._fill == self.chunk_size:
+                self._flush()
+            take = min(self.chunk_size - self._fill, n_rows - start)
+            for column, values in converted.items():
+                self._current[column][self._fill:self._fill + take] = values[start:start + take]
+            self._fill += take
+            start += take
+        self._rows += n_rows
+
+    def _flush(self):
+        self._chunks.append(self._current)
+        self._current = self._new_chunk()
+        self._fill = 0
+
+    def _column_values(self, column):
+        parts = [chunk[column] for chunk in self._chunks]
+        parts.append(self._current[column][:self._fill])
+        return np.concatenate(parts) if len(parts) > 1 else parts[0].copy()
+
+    def to_frame(self, categorical=True):
+        """
+        Build the accumulated DataFrame. Category columns come back as pd.Categorical with sorted
+        categories (so sorting behaves like on plain values) unless categorical=False.
+        """
+        if self.schema is None:
+            return pd.DataFrame()
+        data = {}
+        for column, kind in self.schema.items():
+            values = self._column_values(column)
+            if kind == CATEGORY:
+                categories = list(self._categories[column])
+                column_values = pd.Categorical.from_codes(values, categories=categories)
+                try:
+                    column_values = column_values.reorder_categories(sorted(categories))
+                except TypeError:
+                    pass  # Mixed types can not be sorted, keep order of appearance
+                data[column] = column_values if categorical else np.asarray(column_values, dtype=object)
+            else:
+                data[column] = values
+        return pd.DataFrame(data)
+
+    def memory_usage(self):
+        """
+        Bytes held by the column buffers (object columns count only their pointers).
+        """
+        chunks = self._chunks + ([self._current] if self._current is not None else [])
+        return sum(array.nbytes for chunk in chunks for array in chunk.values())
@@ -0,0 +1,114 @@
+import collections
+import os
+import shutil
+import tempfile
+
+from Common.lazy import lazy_import
+
+pa = lazy_import('pyarrow')
+
+"""
+Result tables of worker processes as Arrow files. Instead of pickling large DataFrames back to the parent, a worker
+writes each table as an uncompressed Arrow IPC file in a shared folder (in memory under /dev/shm when it has room)
+and returns only small handles. The parent memory-maps the files, concatenates the tables of all workers without
+copying and converts them to pandas once. Needs pyarrow.
+Only the comparison workers return tables. The daily load flow workers write their reports themselves and return
+whether the hour converged, and the TCC workers return a few floats per file, so those results are still pickled.
+"""
+
+# Path of an Arrow IPC file written by a worker, its number of rows and the DataFrame column labels.
+# The labels travel with the handle because the comparison sheets repeat names (I, P, Q of both sides)
+# which an Arrow schema does not accept; the file columns are named by position.
+TableHandle = collections.namedtuple('TableHandle', ['path', 'rows', 'columns'])
+
+# Folder of the table files when set, e.g. a local disk (batch setting comparison_tables_folder)
+FOLDER_VARIABLE = 'ARROW_TABLES_FOLDER'
+# /dev/shm is often small (64 MB in containers), it is only used with this much free space
+MIN_SHARED_MEMORY_FREE = 1024 ** 3
+
+
+def set_tables_folder(folder):
+    os.environ[FOLDER_VARIABLE] = folder or ''
+
+
+def default_folder():
+    # The configured folder, else RAM backed on Linux when it has room, else the temporary folder
+    if os.environ.get(FOLDER_VARIABLE):
+        return os.environ[FOLDER_VARIABLE]
+    shared_memory = '/dev/shm'
+    if (os.path.isdir(shared_memory) and os.access(shared_memory, os.W_OK)
+            and shutil.disk_usage(shared_memory).free >= MIN_SHARED_MEMORY_FREE):
+        return shared_memory
+    return tempfile.gettempdir()
+
+
+class TableTransport:
+    """
+    with TableTransport() as folder: ... a folder for the tables of one run, removed with everything in it at the end.
+    """
+
+    def __init__(self, parent_folder=None):
+        self.parent_folder = parent_folder or default_folder()
+        self.folder = None
+
+    def __enter__(self):
+        self.folder = tempfile.mkdtemp(prefix='tables_', dir=self.parent_folder)
+        return self.folder
+
+    def __exit__(self, *exc_info):
+        shutil.rmtree(self.folder, ignore_errors=True)
+        return False
+
+
+def put_tables(folder, name, frames):
+    """
+    Write {table name: DataFrame} as Arrow files named after name (e.g. the timestamp), returns {table name: TableHandle}.
+    """
+    handles = {}
+    for number, (table_name, frame) in enumerate(frames.items()):
+        path = os.path.join(folder, f'{name}_{number}.arrow')
+        columns = list(frame.columns)
+        table = pa.Table.from_pandas(frame.set_axis([str(number) for number in range(len(columns))], axis=1), preserve_index=False)
+        with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        handles[table_name] = TableHandle(path, table.num_rows, columns)
+    return handles
+
+
+def get_table(handle):
+    # Memory-mapped, the data stays in the file (page cache) until it is converted
+    return pa.ipc.open_file(pa.memory_map(handle.path, 'r')).read_all()
+
+
+def concat_frames(handles):
+    """
+    One DataFrame from the tables of many handles, in handle order. The tables are concatenated as chunks of the
+    memory-mapped files, so the only copy is the final conversion to pandas. Columns whose type differs between
+    tables (e.g. integers in one, floats in another) are promoted to a common type.
+    """
+    columns = handles[0].columns
+    if any(handle.columns != columns for handle in handles):
+        raise ValueError(f"Tables with different columns can not be concatenated: {handles[0].path}")
+    tables = [get_table(handle) for handle in handles]
+    frame = pa.concat_tables(tables, promote_options='permissive').to_pandas(split_blocks=True, self_destruct=True)
+    frame.columns = columns
+    return frame
+
+
+def _call(job):
+    # Worker process side: the script function writes its tables with put_tables and returns the handles
+    from Common.scripts import load_script
+
+    script, function_name, args = job
+    return getattr(load_script(script), function_name)(*args)
+
+
+def map_in_workers(script, function_name, arguments, workers):
+    """
+    [script.function_name(*args) for args in arguments] in spawned worker processes, results in argument order.
+    Scripts are resolved by name in the workers, as in Common.memory_scheduler.
+    """
+    from Common.memory_scheduler import SPAWN_CONTEXT
+
+    with SPAWN_CONTEXT.Pool(min(workers, len(arguments)) or 1) as pool:
+        return pool.map(_call, [(script, function_name, args) for args in arguments], chunksize=1)
@@ -0,0 +1,307 @@
+import datetime
+import json
+import os
+
+from Common.time_axis import DEFAULT_RESOLUTION, day_timestamps
+
+"""
+Expands a batch request (date range, countries, file types, folders) into the jobs of the four
+scripts and executes a single job without any console input.
+"""
+
+DEFAULT_HOURS = day_timestamps(DEFAULT_RESOLUTION)
+
+STAGES = ['daily_lf', 'n1', 'boundary', 'comparisons', 'tcc']
+
+# Values used when neither the config file nor the command line sets them
+DEFAULTS = {
+    'countries': ['GR'],
+    'file_types': ['FO3'],
+    'format': 'UCT',
+    'stages': ['daily_lf', 'comparisons'],
+    'hours': None,
+    'resolution': DEFAULT_RESOLUTION,
+    # Split the load flows of a day into jobs of this many timestamps (None: one job per day)
+    'hours_per_job': None,
+    # Run the load flows of a job in worker processes sized to this memory budget (None: in the job process)
+    'memory_budget_mb': None,
+    'recycle_after': 10,
+    # 'summary': only warnings and load flow summaries, full report of diverged files; 'full': full report of every file
+    'solver_report': 'summary',
+    'numbers': list(range(0, 10)),
+    'boundary_country': 'UX',
+    'boundary_numbers': list(range(0, 21)),
+    # 'daily': nodes file and plots per day, 'period': one summary (profiles, envelopes, duration curves) for all dates
+    'boundary_mode': 'daily',
+    'comparison_numbers': list(range(0, 15)),
+    # 'timestamp', 'cube', 'month' (the day cubes of a month in one job) or 'memory': the comparison job solves the
+    # UCTE files itself and compares the OPENLF sheets in memory, writing the OPENLF reports only when 'daily_lf' is also a stage
+    'comparison_mode': 'timestamp',
+    'comparison_output': 'full',
+    'comparison_sidecar': False,
+    'comparison_tolerances': None,
+    # Compare the timestamps (or read the reports of a day cube) in this many worker processes
+    'comparison_workers': 1,
+    # Folder of the Arrow tables the comparison workers return (None: /dev/shm with 1 GB free, else the temp folder)
+    'comparison_tables_folder': None,
+    'tcc_types': ['NGR Export', 'NGR Import', 'SRO Export', 'SRO Import'],
+    # Border codes of the boundary nodes (default GR) and of the extra TCC sheet, all from the same solves
+    'borders': None,
+    # Changes or additions to the border mapping table of Common/borders.py, {code: {name, prefix, ...}}
+    'border_table': None,
+}
+
+
+def load_config(config_path):
+    with open(config_path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def merge_settings(config, overrides):
+    """
+    Defaults < config file < command line arguments (None means 'not given').
+    """
+    settings = dict(DEFAULTS)
+    settings.update(config or {})
+    settings.update({key: value for key, value in overrides.items() if value is not None})
+    return settings
+
+
+def date_range(start_date, end_date=None):
+    """
+    All dates between start_date and end_date (both included) in YYYYMMDD format.
+    """
+    start = datetime.datetime.strptime(str(start_date), '%Y%m%d').date()
+    end = datetime.datetime.strptime(str(end_date), '%Y%m%d').date() if end_date else start
+    if end < start:
+        raise ValueError(f"End date {end_date} is before start date {start_date}.")
+    return [(start + datetime.timedelta(days=offset)).strftime('%Y%m%d') for offset in range((end - start).days + 1)]
+
+
+def _require(settings, stage, *keys):
+    missing = [key for key in keys if not settings.get(key)]
+    if missing:
+        raise ValueError(f"Stage '{stage}' needs the settings: {', '.join(missing)}")
+
+
+def chunks(items, size):
+    # Consecutive slices of at most size items, a single slice when size is not set
+    if not size:
+        return [list(items)]
+    return [list(items[start:start + size]) for start in range(0, len(items), size)]
+
+
+def months_of(dates):
+    # {YYYYMM: dates of that month}, in date order
+    months = {}
+    for date in dates:
+        months.setdefault(date[:6], []).append(date)
+    return months
+
+
+def comparison_params(settings, hours, country, file_type):
+    # UNICORN reports are expected next to the OPENLF reports unless told otherwise
+    reports_folder = settings.get('reports_folder') or settings.get('output_folder')
+    _require(dict(settings, reports_folder=reports_folder), 'comparisons', 'reports_folder', 'comparison_folder')
+    return {
+        'timestamps': hours, 'numbers': list(settings['comparison_numbers']),
+        'file_type': file_type, 'country_code': country,
+        'reports_folder': reports_folder, 'comparison_folder': settings['comparison_folder'],
+        'mode': settings['comparison_mode'], 'output_mode': settings['comparison_output'],
+        'sidecar': settings['comparison_sidecar'], 'tolerances': settings['comparison_tolerances'],
+        'workers': settings['comparison_workers'], 'tables_folder': settings['comparison_tables_folder'],
+    }
+
+
+def expand_jobs(settings):
+    """
+    Returns a list of (key, kind, params, depends_on_keys). Keys only identify jobs inside the batch,
+    so the comparison of a day can wait for the daily load flow of the same day.
+    """
+    dates = date_range(settings['start_date'], settings.get('end_date'))
+    stages = settings['stages']
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise ValueError(f"Unknown stages {sorted(unknown)}. Expected some of: {', '.join(STAGES)}")
+    hours = settings.get('hours') or day_timestamps(settings.get('resolution') or DEFAULT_RESOLUTION)
+    # 96 quarter-hour load flows of a day can be shared between workers
+    hour_chunks = chunks(hours, settings.get('hours_per_job'))
+
+    # In memory mode the comparison job runs the load flows of the day, there are no separate daily_lf jobs
+    in_memory = 'comparisons' in stages and settings['comparison_mode'] == 'memory'
+    # In month mode one comparison job per month waits for the load flows of all its days
+    by_month = 'comparisons' in stages and settings['comparison_mode'] == 'month'
+
+    jobs = []
+    daily_keys_of_day = {}
+    for date in dates:
+        for country in settings['countries']:
+            for file_type in settings['file_types']:
+                daily_keys = []
+                for index, chunk in enumerate(hour_chunks):
+                    if 'daily_lf' in stages and not in_memory:
+                        _require(settings, 'daily_lf', 'ucte_folder', 'output_folder')
+                        daily_keys.append(('daily_lf', date, country, file_type, index))
+                        jobs.append((daily_keys[-1], 'daily_lf', {
+                            'date': date, 'hours': chunk, 'numbers': list(settings['numbers']),
+                            'file_type': file_type, 'country_code': country, 'format': settings['format'],
+                            'ucte_folder': settings['ucte_folder'], 'output_folder': settings['output_folder'],
+                            'memory_budget_mb': settings['memory_budget_mb'], 'recycle_after': settings['recycle_after'],
+                            'solver_report': settings['solver_report'],
+                        }, []))
+                    if 'n1' in stages:
+                        _require(settings, 'n1', 'ucte_folder', 'output_folder')
+                        jobs.append((('n1', date, country, file_type, index), 'n1', {
+                            'date': date, 'hours': chunk, 'numbers': list(settings['numbers']),
+                            'file_type': file_type, 'country_code': country, 'format': settings['format'],
+                            'ucte_folder': settings['ucte_folder'], 'output_folder': settings['output_folder'],
+                        }, []))
+                daily_keys_of_day[(date, country, file_type)] = daily_keys
+                if 'comparisons' in stages and not by_month:
+                    jobs.append((('comparisons', date, country, file_type), 'comparisons',
+                                 dict(comparison_params(settings, hours, country, file_type), date=date), daily_keys))
+                    if in_memory:
+                        _require(settings, 'comparisons', 'ucte_folder')
+                        jobs[-1][2].update({
+                            'ucte_folder': settings['ucte_folder'], 'ucte_numbers': list(settings['numbers']),
+                            'format': settings['format'], 'solver_report': settings['solver_report'],
+                            'openlf_folder': settings['output_folder'] if 'daily_lf' in stages else None,
+                        })
+
+        if 'boundary' in stages and settings.get('boundary_mode', 'daily') == 'daily':
+            _require(settings, 'boundary', 'boundary_ucte_folder', 'boundary_folder', 'diagrams_folder')
+            for file_type in settings['file_types']:
+                jobs.append((('boundary', date, file_type), 'boundary', {
+                    'date': date, 'file_type': file_type, 'country_code': settings['boundary_country'],
+                    'format': settings['format'], 'numbers': list(settings['boundary_numbers']),
+                    'ucte_folder': settings['boundary_ucte_folder'], 'output_folder': settings['boundary_folder'],
+                    'diagrams_folder': settings['diagrams_folder'], 'hours': hours,
+                    'solver_report': settings['solver_report'], 'borders': settings['borders'],
+                    'border_table': settings['border_table'],
+                }, []))
+
+    if by_month:
+        for year_month, month_dates in months_of(dates).items():
+            for country in settings['countries']:
+                for file_type in settings['file_types']:
+                    depends_on = [key for date in month_dates for key in daily_keys_of_day[(date, country, file_type)]]
+                    jobs.append((('comparisons', year_month, country, file_type), 'comparisons',
+                                 dict(comparison_params(settings, hours, country, file_type), dates=month_dates), depends_on))
+
+    if 'boundary' in stages and settings.get('boundary_mode') == 'period':
+        _require(settings, 'boundary', 'boundary_ucte_folder', 'boundary_folder', 'diagrams_folder')
+        for file_type in settings['file_types']:
+            jobs.append((('boundary', dates[0], dates[-1], file_type), 'boundary', {
+                'dates': dates, 'file_type': file_type, 'country_code': settings['boundary_country'],
+                'format': settings['format'], 'numbers': list(settings['boundary_numbers']),
+                'ucte_folder': settings['boundary_ucte_folder'], 'output_folder': settings['boundary_folder'],
+                'diagrams_folder': settings['diagrams_folder'], 'hours': hours,
+                'solver_report': settings['solver_report'], 'borders': settings['borders'],
+                'border_table': settings['border_table'],
+            }, []))
+
+    if 'tcc' in stages:
+        _require(settings, 'tcc', 'tcc_folder', 'tcc_save_folder')
+        for year_month, month_dates in months_of(dates).items():
+            jobs.append((('tcc', year_month), 'tcc', {
+                'year_month': year_month, 'dates': month_dates, 'types': list(settings['tcc_types']),
+                'tcc_folder': settings['tcc_folder'], 'save_folder': settings['tcc_save_folder'],
+                'timestamps': hours, 'memory_budget_mb': settings['memory_budget_mb'],
+                'recycle_after': settings['recycle_after'], 'history_folder': settings.get('tcc_history_folder'),
+                'solver_report': settings['solver_report'], 'borders': settings['borders'],
+                'border_table': settings['border_table'],
+            }, []))
+    return jobs
+
+
+def enqueue_jobs(queue, jobs, max_attempts=3):
+    """
+    Put the expanded jobs in the work queue, translating batch keys into queue ids for dependencies.
+    """
+    ids = {}
+    for key, kind, params, depends_on in jobs:
+        ids[key] = queue.enqueue(kind, params, depends_on=[ids[dependency] for dependency in depends_on],
+                                 max_attempts=max_attempts)
+    return ids
+
+
+def job_borders(params):
+    # {code: border} of the borders listed in the job, None for the script defaults
+    from Common.borders import border_table
+
+    return border_table(params['borders'], params.get('border_table')) if params.get('borders') else None
+
+
+def execute_job(kind, params):
+    """
+    Run one job. The scripts are imported here so that enqueuing and status queries stay light.
+    """
+    from Common.scripts import load_script
+    from Common.solver_report import set_report_detail
+
+    # Also seen by the worker processes the job starts
+    set_report_detail(params.get('solver_report') == 'full')
+    if kind == 'daily_lf':
+        os.makedirs(params['output_folder'], exist_ok=True)
+        daily_lf = load_script('daily_lf')
+        arguments = (params['date'], params['hours'], params['numbers'], params['file_type'], params['country_code'],
+                     params['format'], params['ucte_folder'], params['output_folder'])
+        if params.get('memory_budget_mb'):
+            daily_lf.process_network_files_in_workers(*arguments, params['memory_budget_mb'], params.get('recycle_after', 10))
+        else:
+            daily_lf.process_network_files(*arguments)
+    elif kind == 'n1':
+        os.makedirs(params['output_folder'], exist_ok=True)
+        load_script('daily_lf').process_security_files(
+            params['date'], params['hours'], params['numbers'], params['file_type'], params['country_code'],
+            params['format'], params['ucte_folder'], params['output_folder'])
+    elif kind == 'boundary':
+        os.makedirs(params['output_folder'], exist_ok=True)
+        os.makedirs(params['diagrams_folder'], exist_ok=True)
+        boundary = load_script('boundary')
+        if params.get('dates'):
+            boundary.process_boundary_period(
+                params['ucte_folder'], params['output_folder'], params['diagrams_folder'], params['dates'],
+                params['file_type'], params['country_code'], params['format'], params['numbers'], params.get('hours'),
+                borders=job_borders(params))
+        else:
+            boundary.process_boundary_files(
+                params['ucte_folder'], params['output_folder'], params['diagrams_folder'], params['date'],
+                params['file_type'], params['country_code'], params['format'], params['numbers'], params.get('hours'),
+                borders=job_borders(params))
+    elif kind == 'comparisons':
+        from Common.arrow_transport import set_tables_folder
+
+        os.makedirs(params['comparison_folder'], exist_ok=True)
+        set_tables_folder(params.get('tables_folder'))
+        comparisons = load_script('comparisons')
+        # Tolerances come from JSON as lists, the comparison expects (absolute, percentage) tuples
+        tolerances = {quantity: tuple(values) for quantity, values in params['tolerances'].items()} if params.get('tolerances') else None
+        if params.get('mode') == 'memory':
+            if params.get('openlf_folder'):
+                os.makedirs(params['openlf_folder'], exist_ok=True)
+            comparisons.process_loadflow_and_compare(
+                params['timestamps'], params['numbers'], params['date'], params['file_type'], params['country_code'],
+                params['reports_folder'], params['comparison_folder'], params['ucte_folder'], params['ucte_numbers'],
+                params['format'], params.get('openlf_folder'), output_mode=params.get('output_mode', 'full'),
+                tolerances=tolerances, sidecar=params.get('sidecar', False))
+        elif params.get('mode') == 'month':
+            comparisons.process_month_cube(
+                params['dates'], params['timestamps'], params['numbers'], params['file_type'], params['country_code'],
+                params['reports_folder'], params['comparison_folder'], output_mode=params.get('output_mode', 'full'),
+                tolerances=tolerances, sidecar=params.get('sidecar', False), workers=params.get('workers', 1))
+        else:
+            # 'cube' compares all timestamps of the day in one pass and adds per element statistics
+            process = comparisons.process_day_cube if params.get('mode') == 'cube' else comparisons.process_files_and_accumulate_data
+            process(params['timestamps'], params['numbers'], params['date'], params['file_type'], params['country_code'],
+                    params['reports_folder'], params['comparison_folder'], output_mode=params.get('output_mode', 'full'),
+                    tolerances=tolerances, sidecar=params.get('sidecar', False), workers=params.get('workers', 1))
+    elif kind == 'tcc':
+        os.makedirs(params['save_folder'], exist_ok=True)
+        base_folder = os.path.join(params['tcc_folder'], params['year_month'])
+        load_script('tcc').process_all_data(base_folder, params['year_month'], params['types'],
+                                            params['save_folder'], params['dates'], params.get('timestamps'),
+                                            params.get('memory_budget_mb'), params.get('recycle_after', 10),
+                                            params.get('history_folder'), job_borders(params))
+    else:
+        raise ValueError(f"Unknown job kind '{kind}'.")
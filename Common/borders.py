@@ -0,0 +1,91 @@
+from Common.lazy import lazy_import
+from Common.ucte_scan import x_node_neighbours
+
+pd = lazy_import('pandas')
+
+"""
+Border mapping table and all-borders extraction of the X-node flows. A border is found by the country prefix of
+the nodes its X-nodes are connected to ('G' Greece, 'R' Romania); it can rename X-node buses and leave some of
+them out of its TCC sum. The X-nodes of a solved network are read once, each gets its border with one vectorized
+look-up and the sums are a groupby, so the boundary nodes and TCC of N borders cost one solve.
+"""
+
+# Border code -> name used in the output file names, country prefix of the connected nodes, TCC type prefix
+# ('NGR Export' -> GR), bus renames and buses left out of the TCC sum (renamed ids)
+BORDERS = {
+    'GR': {'name': 'GREEK', 'prefix': 'G', 'tcc_type': 'NGR', 'renames': {}, 'exclusions': ['GARACH1_0']},
+    'RO': {'name': 'ROMANIAN', 'prefix': 'R', 'tcc_type': 'SRO',
+           'renames': {'RIS1A41_0': 'RISAC41', 'RMED141_0': 'RMEDG41_0', 'RPDF241_0': 'RPDFE41',
+                       'RROS241_0': 'RROSI41', 'RTINTA1_0': 'RTINTB1'},
+           'exclusions': ['RISAC41', 'RARA4D1_0', 'RNADA_1_0', 'RROSI41']},
+}
+
+
+def border_table(codes=None, table=None):
+    """
+    {code: border} for the codes (all when None), from BORDERS updated with table, e.g. the 'border_table' of a
+    batch config: {"BG": {"name": "BULGARIAN", "prefix": "V"}}. Fields a new border does not set are empty.
+    """
+    borders = {code: dict(border) for code, border in BORDERS.items()}
+    for code, border in (table or {}).items():
+        defaults = borders.get(code, {'name': code, 'tcc_type': None, 'renames': {}, 'exclusions': []})
+        borders[code] = dict(defaults, **border)
+    codes = codes or list(borders)
+    unknown = [code for code in codes if code not in borders or not borders[code].get('prefix')]
+    if unknown:
+        raise ValueError(f"Unknown borders {unknown} (no country prefix). Known: {', '.join(borders)}")
+    return {code: borders[code] for code in codes}
+
+
+def type_border(Type, borders):
+    # Border of a TCC type ('NGR Export' -> 'GR'), None when no border has its prefix
+    for code, border in borders.items():
+        if border.get('tcc_type') and Type.startswith(border['tcc_type']):
+            return code
+    return None
+
+
+def borders_in_scan(scan, borders):
+    # Codes of the borders with X-nodes in a pre-scanned UCTE file
+    neighbours = x_node_neighbours(scan)
+    return [code for code, border in borders.items() if any(node.startswith(border['prefix']) for node in neighbours)]
+
+
+def assign_borders(ids, borders):
+    """
+    Border code of every id (node or bus), by its country prefix; None when it matches no border.
+    Longer prefixes win, every prefix length is one look-up over all ids.
+    """
+    ids = ids.astype(str)
+    by_length = {}
+    for code, border in borders.items():
+        by_length.setdefault(len(border['prefix']), {})[border['prefix']] = code
+    codes = pd.Series(None, index=ids.index, dtype=object)
+    for length in sorted(by_length, reverse=True):
+        codes = codes.fillna(ids.str[:length].map(by_length[length]))
+    return codes
+
+
+def x_node_flows(network, borders):
+    """
+    One row per X-node of the borders from a solved network: id, bus_id (renamed), bus_breaker_id, I, P, Q,
+    boundary_p and Border, found from the connected node. X-nodes of other countries are left out.
+    """
+    flows = network.get_dangling_lines(attributes=['bus_id', 'bus_breaker_bus_id', 'i', 'p', 'q', 'boundary_p'])
+    flows = flows.reset_index().rename(columns={'index': 'id', 'bus_breaker_bus_id': 'bus_breaker_id', 'i': 'I', 'p': 'P', 'q': 'Q'})
+    renames = {bus: new_bus for border in borders.values() for bus, new_bus in border['renames'].items()}
+    flows['bus_id'] = flows['bus_id'].replace(renames).astype(str)
+    flows['Border'] = assign_borders(flows['bus_breaker_id'], borders)
+    return flows.dropna(subset=['Border'])
+
+
+def tcc_sums(flows, borders):
+    """
+    {code: TCC} of every border: absolute sum of the boundary P of its X-nodes, by the bus they are connected
+    to (a disconnected X-node has none) and without its excluded buses. A border without X-nodes has 0.
+    """
+    border = assign_borders(flows['bus_id'], borders)
+    exclusions = {bus: code for code, settings in borders.items() for bus in settings['exclusions']}
+    kept = flows['bus_id'].map(exclusions) != border
+    sums = flows.loc[kept, 'boundary_p'].groupby(border[kept]).sum().abs()
+    return {code: float(sums.get(code, 0.0)) for code in borders}
@@ -0,0 +1,147 @@
+from Common.lazy import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+"""
+Streaming aggregates of boundary flows over many days. Per node and quantity only a profile over the
+time of day (count, sum, min, max) and a fixed size histogram for the duration curve are kept, so memory
+does not grow with the number of days and the raw rows of a day can be dropped once they are added.
+"""
+
+
+class StreamingHistogram:
+    """
+    Histogram with a fixed number of equal bins. When a value falls outside the covered range, the bin width
+    is doubled (adjacent bins merged) until it fits, so the resolution adapts to the data seen so far.
+    """
+
+    def __init__(self, bins=400):
+        if bins < 2 or bins % 2:
+            raise ValueError("bins should be an even number of at least 2.")
+        self.bins = bins
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.lower = None
+        self.width = None
+        self.minimum = np.inf
+        self.maximum = -np.inf
+
+    def __len__(self):
+        return int(self.counts.sum())
+
+    def _grow(self, low, high):
+        half = self.bins // 2
+        while low < self.lower or high >= self.lower + self.width * self.bins:
+            merged = self.counts.reshape(half, 2).sum(axis=1)
+            self.counts = np.zeros(self.bins, dtype=np.int64)
+            if low < self.lower:
+                # Old range becomes the upper half
+                self.counts[half:] = merged
+                self.lower -= self.width * self.bins
+            else:
+                self.counts[:half] = merged
+            self.width *= 2
+
+    def add(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return
+        low, high = values.min(), values.max()
+        if self.lower is None:
+            self.width = max((high - low) / self.bins * 1.01, 1e-6)
+            self.lower = low
+        self._grow(low, high)
+        self.minimum = min(self.minimum, low)
+        self.maximum = max(self.maximum, high)
+        index = np.clip(((values - self.lower) // self.width).astype(int), 0, self.bins - 1)
+        np.add.at(self.counts, index, 1)
+
+    def duration_curve(self, points=101):
+        """
+        (exceedance %, value) pairs: the value exceeded during that share of the time, from the maximum (0%)
+        to the minimum (100%). Values inside a bin are interpolated linearly.
+        """
+        total = len(self)
+        if not total:
+            return np.array([]), np.array([])
+        exceedance = np.linspace(0, 100, points)
+        # Cumulative counts from the top bin down
+        edges = self.lower + self.width * np.arange(self.bins + 1)
+        cumulative = np.concatenate([[0], np.cumsum(self.counts[::-1])]) / total * 100
+        values = np.interp(exceedance, cumulative, edges[::-1])
+        return exceedance, np.clip(values, self.minimum, self.maximum)
+
+
+class FlowAggregator:
+    """
+    FlowAggregator(timestamps).add_frame(rows) for every day or hour, then profiles() / duration_curves().
+    rows has one row per node and timestamp with the quantity columns (e.g. extract_boundary_nodes output).
+    The counts of profiles() give the number of days seen at every timestamp.
+    """
+
+    def __init__(self, timestamps, quantities=('I', 'P', 'Q'), node_column='bus_breaker_id', label_column='id', bins=400):
+        self.timestamps = list(timestamps)
+        self.position = {timestamp: index for index, timestamp in enumerate(self.timestamps)}
+        self.quantities = list(quantities)
+        self.node_column = node_column
+        self.label_column = label_column
+        self.bins = bins
+        self.labels = {}
+        self._profiles = {}  # (node, quantity) -> dict of arrays over the time of day
+        self._histograms = {}  # (node, quantity) -> StreamingHistogram
+
+    def _state(self, node, quantity):
+        key = (node, quantity)
+        if key not in self._profiles:
+            size = len(self.timestamps)
+            self._profiles[key] = {'count': np.zeros(size, dtype=np.int64), 'sum': np.zeros(size),
+                                   'min': np.full(size, np.inf), 'max': np.full(size, -np.inf)}
+            self._histograms[key] = StreamingHistogram(self.bins)
+        return self._profiles[key], self._histograms[key]
+
+    def add_frame(self, frame, timestamp_column='Timestamp'):
+        # Timestamps may be numeric (30, 130) as in extract_boundary_nodes or 'HHMM' strings
+        timestamps = frame[timestamp_column].map(lambda value: f'{int(value):04d}' if pd.notna(value) else None)
+        positions = timestamps.map(self.position)
+        frame = frame.assign(_position=positions).dropna(subset=['_position'])
+        for node, rows in frame.groupby(self.node_column, sort=False, observed=True):
+            if self.label_column in rows:
+                self.labels.setdefault(node, rows[self.label_column].iloc[0])
+            index = rows['_position'].to_numpy(dtype=int)
+            for quantity in self.quantities:
+                values = rows[quantity].to_numpy(dtype=float)
+                valid = np.isfinite(values)
+                profile, histogram = self._state(node, quantity)
+                np.add.at(profile['count'], index[valid], 1)
+                np.add.at(profile['sum'], index[valid], values[valid])
+                np.minimum.at(profile['min'], index[valid], values[valid])
+                np.maximum.at(profile['max'], index[valid], values[valid])
+                histogram.add(values[valid])
+
+    @property
+    def nodes(self):
+        return sorted({node for node, _ in self._profiles})
+
+    def profiles(self):
+        """
+        One row per node, quantity and timestamp with the count, mean, min and max over all days.
+        """
+        frames = []
+        for (node, quantity), profile in self._profiles.items():
+            count = profile['count']
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = np.where(count > 0, profile['sum'] / count, np.nan)
+            frames.append(pd.DataFrame({
+                self.node_column: node, 'Quantity': quantity, 'Timestamp': self.timestamps, 'Count': count,
+                'Mean': mean, 'Min': np.where(count > 0, profile['min'], np.nan),
+                'Max': np.where(count > 0, profile['max'], np.nan)}))
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def duration_curves(self, points=101):
+        frames = []
+        for (node, quantity), histogram in self._histograms.items():
+            exceedance, values = histogram.duration_curve(points)
+            frames.append(pd.DataFrame({self.node_column: node, 'Quantity': quantity,
+                                        'Exceedance (%)': exceedance, 'Value': values}))
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
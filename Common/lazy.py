@@ -0,0 +1,62 @@
+import importlib
+import sys
+import threading
+
+"""
+Deferred imports. pypowsybl starts its native runtime on import and pandas and matplotlib take a good part of a
+second each, which argument checks, listings, dry runs and cache hits do not need. A lazy module is imported the
+first time one of its attributes is used, so the scripts and the command line only pay for what a stage runs.
+"""
+
+# Modules every script imports, the startup check fails if any of them is imported by a plain 'import'
+HEAVY_MODULES = ('pypowsybl', 'pandas', 'numpy', 'matplotlib', 'openpyxl', 'pyarrow')
+
+
+class LazyModule:
+    """
+    Stand-in for a module that imports it on first attribute access: pp = lazy_import('pypowsybl.network').
+    """
+
+    def __init__(self, name):
+        self.__dict__['_lazy_name'] = name
+        self.__dict__['_lazy_module'] = None
+        self.__dict__['_lazy_lock'] = threading.Lock()
+
+    def _load(self):
+        # Pipeline stages run in threads, the lock makes the first use import the module once
+        with self._lazy_lock:
+            if self._lazy_module is None:
+                module = importlib.import_module(self._lazy_name)
+                # Copying the attributes makes later look-ups plain attribute access, without __getattr__
+                self.__dict__.update(module.__dict__)
+                self.__dict__['_lazy_module'] = module
+        return self._lazy_module
+
+    def __getattr__(self, attribute):
+        return getattr(self._lazy_module or self._load(), attribute)
+
+    def __setattr__(self, attribute, value):
+        setattr(self._lazy_module or self._load(), attribute, value)
+
+    def __dir__(self):
+        return dir(self._lazy_module or self._load())
+
+    def __repr__(self):
+        state = 'loaded' if self._lazy_module is not None else 'not loaded'
+        return f"<lazy module '{self._lazy_name}' ({state})>"
+
+
+def lazy_import(name):
+    """
+    A lazy stand-in for the module, or the module itself when it is already imported.
+    """
+    module = sys.modules.get(name)
+    return module if module is not None else LazyModule(name)
+
+
+def preload(*modules):
+    # pypowsybl has to be imported on the main thread: its native runtime aborts when the first
+    # import happens in a pipeline worker thread, so the scripts load it before starting the stages
+    for module in modules:
+        if isinstance(module, LazyModule):
+            module._load()
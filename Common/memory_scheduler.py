@@ -0,0 +1,158 @@
+import csv
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+try:
+    import psutil
+except ImportError:  # Optional, without it the peak RSS comes from the resource module (Linux/macOS only)
+    psutil = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+"""
+Memory-budgeted worker scheduler. A solved European CGM takes a lot of memory, so the number of worker
+processes is derived from a memory budget instead of the number of cores: the first jobs run alone to measure
+the peak RSS of one network, the pool is then sized to the budget, and workers are replaced after a number of
+networks to give the native memory back to the system. Every job reports its memory high-water mark.
+"""
+
+MB = 1024 * 1024
+
+# pypowsybl runs a native runtime with its own threads that does not survive a fork, so workers are always spawned
+SPAWN_CONTEXT = multiprocessing.get_context('spawn')
+
+
+def current_rss():
+    """
+    Resident set size of this process in bytes, or None when it can not be measured.
+    """
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    return None
+
+
+def process_peak_rss():
+    # Peak RSS of the whole process life (kilobytes on Linux, bytes on macOS)
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class PeakSampler:
+    """
+    Samples the RSS of the current process in a background thread and keeps the maximum.
+    """
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = current_rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True) if self.peak is not None else None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self):
+        if self._thread is not None:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self.peak = max(self.peak, current_rss())
+        else:
+            self.peak = process_peak_rss()
+        return False
+
+
+def run_job(job):
+    """
+    Runs one (index, script, function name, args, label) job in a worker process and returns its record.
+    Scripts are resolved by name in the worker, so this also works with the 'spawn' start method (Windows).
+    """
+    from Common.scripts import load_script
+
+    index, script, function_name, args, label = job
+    started = time.perf_counter()
+    result, error = None, None
+    with PeakSampler() as sampler:
+        try:
+            result = getattr(load_script(script), function_name)(*args)
+        except Exception as e:
+            logging.exception(f"Job {label} failed")
+            error = f'{type(e).__name__}: {e}'
+    return {'index': index, 'label': label, 'result': result, 'error': error, 'pid': os.getpid(),
+            'seconds': round(time.perf_counter() - started, 2),
+            'peak_rss_mb': round(sampler.peak / MB, 1) if sampler.peak is not None else None}
+
+
+def save_memory_report(records, report_path):
+    with open(report_path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(['Job', 'Peak RSS (MB)', 'Seconds', 'PID', 'Error'])
+        for record in sorted(records, key=lambda record: record['index']):
+            writer.writerow([record['label'], record['peak_rss_mb'], record['seconds'], record['pid'], record['error'] or ''])
+
+
+class MemoryScheduler:
+    """
+    MemoryScheduler(memory_budget_mb=16000).run([(script, function name, args, label), ...])
+    returns one record per job, in job order, with its result and memory high-water mark.
+    """
+
+    def __init__(self, memory_budget_mb, max_workers=None, recycle_after=10, sample_jobs=2, headroom=1.2):
+        self.memory_budget_mb = memory_budget_mb
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.recycle_after = recycle_after
+        self.sample_jobs = sample_jobs
+        self.headroom = headroom  # Margin on the sampled peak for networks larger than the sampled ones
+
+    def pool_size(self, peak_mb):
+        if not peak_mb:
+            logging.warning("Peak RSS can not be measured (install psutil), running on a single worker.")
+            return 1
+        return max(1, min(self.max_workers, int(self.memory_budget_mb // (peak_mb * self.headroom))))
+
+    def run(self, jobs, report_path=None, raise_errors=True):
+        jobs = [(index, *job) for index, job in enumerate(jobs)]
+        records = []
+
+        # Sampling: the first jobs run one at a time, each in a fresh process
+        with SPAWN_CONTEXT.Pool(1, maxtasksperchild=1) as pool:
+            records.extend(pool.map(run_job, jobs[:self.sample_jobs]))
+        peaks = [record['peak_rss_mb'] for record in records if record['peak_rss_mb'] is not None]
+        sampled_peak = max(peaks) if peaks else None
+
+        remaining = jobs[self.sample_jobs:]
+        if remaining:
+            workers = min(self.pool_size(sampled_peak), len(remaining))
+            logging.info(f"Sampled peak RSS {sampled_peak} MB per network, running {len(remaining)} jobs on "
+                         f"{workers} workers (budget {self.memory_budget_mb} MB, recycled every {self.recycle_after} jobs).")
+            with SPAWN_CONTEXT.Pool(workers, maxtasksperchild=self.recycle_after) as pool:
+                for record in pool.imap_unordered(run_job, remaining):
+                    records.append(record)
+                    if sampled_peak and record['peak_rss_mb'] and record['peak_rss_mb'] > sampled_peak * self.headroom:
+                        logging.warning(f"Job {record['label']} peaked at {record['peak_rss_mb']} MB, "
+                                        f"above the sampled {sampled_peak} MB used to size the pool.")
+
+        records.sort(key=lambda record: record['index'])
+        for record in records:
+            logging.info(f"Job {record['label']}: peak RSS {record['peak_rss_mb']} MB, {record['seconds']}s")
+        if report_path:
+            save_memory_report(records, report_path)
+
+        failed = [record for record in records if record['error']]
+        if failed and raise_errors:
+            raise RuntimeError(f"{len(failed)} of {len(records)} jobs failed, first {failed[0]['label']}: {failed[0]['error']}")
+        return records
@@ -0,0 +1,106 @@
+import logging
+import queue
+import threading
+import time
+
+"""
+Staged producer/consumer pipeline. Every stage has its own worker threads and a bounded input queue, so reading
+the next UCTE files, solving and writing reports overlap. pypowsybl and the file I/O release the GIL, which lets
+threads run the stages at the same time; the bounded queues limit how many networks are held in memory.
+"""
+
+# End of input marker passed from one stage to the next
+_DONE = object()
+
+
+class Stage:
+    """
+    One pipeline step. function(item) returns the item for the next stage, or None to drop it (e.g. a skipped hour).
+    """
+
+    def __init__(self, name, function, workers=1, queue_size=2):
+        self.name = name
+        self.function = function
+        self.workers = workers
+        self.queue_size = queue_size
+        self.busy_seconds = 0.0
+        self.processed = 0
+
+
+class Pipeline:
+    """
+    Pipeline([Stage('read', ...), Stage('solve', ...), Stage('write', ...)]).run(items)
+    returns the outputs of the last stage and the [(stage name, item, error)] of the failed items.
+    Failed items are logged and dropped, so one bad hour does not stop the rest of the day.
+    """
+
+    def __init__(self, stages):
+        self.stages = stages
+        self.errors = []
+        self._lock = threading.Lock()
+
+    def _work(self, stage, inbox, outbox, finished):
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                break
+            started = time.perf_counter()
+            try:
+                result = stage.function(item)
+            except Exception as e:
+                logging.exception(f"Pipeline stage '{stage.name}' failed for {item!r}")
+                with self._lock:
+                    self.errors.append((stage.name, item, e))
+                result = None
+            with self._lock:
+                stage.busy_seconds += time.perf_counter() - started
+                stage.processed += 1
+            if result is not None:
+                outbox.put(result)
+        finished()
+
+    def run(self, items):
+        started = time.perf_counter()
+        inboxes = [queue.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        results = queue.Queue()
+        outboxes = inboxes[1:] + [results]
+        threads = []
+
+        for index, stage in enumerate(self.stages):
+            remaining = [stage.workers]
+            next_workers = self.stages[index + 1].workers if index + 1 < len(self.stages) else 0
+
+            def finished(remaining=remaining, outbox=outboxes[index], next_workers=next_workers):
+                # The last worker of a stage tells every worker of the next stage that the input has ended
+                with self._lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    for _ in range(next_workers):
+                        outbox.put(_DONE)
+
+            for number in range(stage.workers):
+                thread = threading.Thread(target=self._work, args=(stage, inboxes[index], outboxes[index], finished),
+                                          name=f'{stage.name}-{number}', daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        for item in items:
+            inboxes[0].put(item)
+        for _ in range(self.stages[0].workers):
+            inboxes[0].put(_DONE)
+        for thread in threads:
+            thread.join()
+
+        elapsed = time.perf_counter() - started
+        busy = ', '.join(f'{stage.name} {stage.busy_seconds:.1f}s ({stage.processed})' for stage in self.stages)
+        logging.info(f"Pipeline finished in {elapsed:.1f}s, busy time per stage: {busy}")
+
+        if self.errors:
+            logging.warning(f"{len(self.errors)} pipeline item(s) failed")
+        return [results.get() for _ in range(results.qsize())], list(self.errors)
+
+
+def failed_keys(errors):
+    # Input key of every failed item: the item itself, or the first element of the tuple a later stage got
+    return [item[0] if isinstance(item, tuple) else item for _, item, _ in errors]
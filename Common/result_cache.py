@@ -0,0 +1,75 @@
+import hashlib
+import json
+import os
+import pickle
+
+"""
+File based result cache. An entry is valid only while the fingerprints (size, mtime, content hash)
+of its input files and the settings used to compute it stay the same.
+"""
+
+# Content hashes already computed in this process, keyed by (path, size, mtime)
+_hash_memo = {}
+
+
+def file_fingerprint(path):
+    """
+    (size, mtime_ns, sha256) of a file. The hash is only recomputed when size or mtime change.
+    """
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    digest = _hash_memo.get(memo_key)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                sha.update(block)
+        digest = sha.hexdigest()
+        _hash_memo[memo_key] = digest
+    return stat.st_size, stat.st_mtime_ns, digest
+
+
+def cache_key(input_paths, settings):
+    """
+    Key of a result computed from input_paths with the given settings (any JSON serializable dict).
+    Only the content hash is part of the key, so touching a file without changing it keeps the entry valid.
+    """
+    fingerprints = [file_fingerprint(path)[2] for path in input_paths]
+    payload = json.dumps({'inputs': fingerprints, 'settings': settings}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """
+    One pickle file per entry name (e.g. per timestamp). A newer key simply replaces the old entry.
+    """
+
+    def __init__(self, cache_folder):
+        self.cache_folder = cache_folder
+        os.makedirs(cache_folder, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, name):
+        return os.path.join(self.cache_folder, f'{name}.pkl')
+
+    def get(self, name, key):
+        path = self._path(name)
+        if os.path.exists(path):
+            try:
+                with open(path, 'rb') as file:
+                    entry = pickle.load(file)
+                if entry.get('key') == key:
+                    self.hits += 1
+                    return entry['result']
+            except Exception as e:
+                print(f"Ignoring unreadable cache entry {path}: {e}")
+        self.misses += 1
+        return None
+
+    def put(self, name, key, result):
+        path = self._path(name)
+        temporary_path = path + '.tmp'
+        with open(temporary_path, 'wb') as file:
+            pickle.dump({'key': key, 'result': result}, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, path)
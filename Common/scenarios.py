@@ -0,0 +1,216 @@
+import logging
+
+from Common.lazy import lazy_import
+
+pd = lazy_import('pandas')
+
+"""
+Scenario loading on network variants. The D/U scenario files of one TCC hour share their topology and parameters
+and differ in injections, tap positions and element statuses. The first file is loaded as the base network; for the
+others only the differing UCTE records are read and applied to a copy of the unsolved base, which gets the bus
+voltages of the base solution as the starting point of the load flow. Any other difference (new elements,
+impedances, limits, paired X-nodes...) makes the file fall back to a normal load.
+"""
+
+BASE_VARIANT = 'InitialState'
+# Copy of the base as loaded: a regulated solve of the base moves its taps and shunt sections, a scenario must not inherit them
+UNSOLVED_VARIANT = 'unsolved'
+SCENARIO_VARIANT = 'scenario'
+
+# Element statuses that stay in the same class (real, equivalent, busbar coupler) when switched on or off
+IN_OPERATION = {'0': '8', '1': '9', '2': '7'}
+OUT_OF_OPERATION = {value: key for key, value in IN_OPERATION.items()}
+
+
+def read_records(path):
+    """
+    The records of a UCTE file by block: nodes by code, lines, transformers and regulations by
+    'node1 node2 order', other blocks (except the comments) as a list of lines.
+    Returns None when a key appears twice, such a file is always loaded normally.
+    """
+    blocks = {'N': {}, 'L': {}, 'T': {}, 'R': {}, 'other': []}
+    block = None
+    with open(path, 'r', encoding='latin-1') as file:
+        for raw_line in file:
+            line = raw_line.rstrip('\r\n')
+            if line.startswith('##'):
+                block = 'TT' if line.startswith('##TT') else line[2:3]
+                if block != 'Z' and block not in blocks and block != 'C':
+                    blocks['other'].append(line)
+                continue
+            if block == 'C' or not line.strip():
+                continue
+            if block in ('N', 'Z'):
+                key, records = line[:8], blocks['N']
+            elif block in ('L', 'T', 'R'):
+                key, records = line[:19], blocks[block]
+            else:
+                blocks['other'].append(line)
+                continue
+            if key in records:
+                return None
+            records[key] = line.rstrip()
+    return blocks
+
+
+def _number(text):
+    text = text.strip()
+    return float(text) if text else 0.0
+
+
+def _node_changes(code, base, other, changes):
+    # Name, status and everything after the reactive generation (limits, ...) must be equal
+    if base[:23] != other[:23] or base[64:] != other[64:]:
+        return f'node {code} changed beyond its injections'
+    base_type, other_type = base[24:25], other[24:25]
+    if base_type != other_type and not {base_type, other_type} <= {'0', '2'}:
+        return f'node {code} type {base_type} -> {other_type}'
+    if base[26:32] != other[26:32] and not (base[26:32].strip() and other[26:32].strip()):
+        return f'node {code} voltage added or removed'
+
+    load = (_number(other[33:40]), _number(other[41:48]))
+    generation = (_number(other[49:56]), _number(other[57:64]))
+    if code.startswith('X'):
+        # X-node injections are the P0 / Q0 of the dangling line, their generation is kept apart by the importer
+        if base[49:64] != other[49:64]:
+            return f'X-node {code} generation changed'
+        changes['x_nodes'][code] = load
+        return None
+    if base[33:48] != other[33:48]:
+        changes['loads'][f'{code}_load'] = load
+    if base[24:25] + base[26:32] + base[49:64] != other[24:25] + other[26:32] + other[49:64]:
+        # UCTE generation is negative, pypowsybl target_p / target_q are produced powers
+        changes['generators'][f'{code}_generator'] = (-generation[0], -generation[1], _number(other[26:32]),
+                                                       other_type in ('2', '3'))
+    return None
+
+
+def _status_change(key, base, other, changes):
+    if base[:20] != other[:20] or base[21:] != other[21:]:
+        return f'element {key} changed beyond its status'
+    base_status, other_status = base[20:21], other[20:21]
+    if IN_OPERATION.get(base_status) == other_status:
+        changes['statuses'][key] = False
+    elif OUT_OF_OPERATION.get(base_status) == other_status:
+        changes['statuses'][key] = True
+    else:
+        return f'element {key} status {base_status} -> {other_status}'
+    return None
+
+
+def _tap_change(key, base, other, changes):
+    # Only the current tap of the phase (n' columns 30-32) and angle (columns 55-57) regulation may change
+    if base[:29] + base[32:54] + base[57:] != other[:29] + other[32:54] + other[57:]:
+        return f'regulation of {key} changed beyond its taps'
+    if base[29:32] != other[29:32]:
+        changes['ratio_taps'][key] = int(_number(other[29:32]))
+    if base[54:57] != other[54:57]:
+        changes['phase_taps'][key] = int(_number(other[54:57]))
+    return None
+
+
+def diff_records(base, other):
+    """
+    Changes that turn the base records into the other records, as (changes, None), or (None, reason)
+    when the difference can not be applied to a variant.
+    """
+    if base is None or other is None:
+        return None, 'duplicate element keys'
+    if base['other'] != other['other']:
+        return None, 'other blocks changed'
+    for block in ('N', 'L', 'T', 'R'):
+        if base[block].keys() != other[block].keys():
+            return None, f'elements added or removed in block ##{block}'
+
+    changes = {'loads': {}, 'generators': {}, 'x_nodes': {}, 'statuses': {}, 'ratio_taps': {}, 'phase_taps': {}}
+    for block, compare in (('N', _node_changes), ('L', _status_change), ('T', _status_change), ('R', _tap_change)):
+        for key, record in other[block].items():
+            if record != base[block][key]:
+                reason = compare(key, base[block][key], record, changes)
+                if reason:
+                    return None, reason
+    return changes, None
+
+
+def _frame(rows, columns):
+    return pd.DataFrame([values for values in rows.values()], index=list(rows), columns=columns)
+
+
+class ScenarioLoader:
+    """
+    loader = ScenarioLoader(network, base_path) with the base network before it is solved, then, once it is solved,
+    loader.apply(path) switches the network to a variant with the changes of path. apply returns the reason and leaves
+    the base variant active when the file has to be loaded normally. loader.reset() goes back to the base variant.
+    """
+
+    def __init__(self, network, base_path):
+        self.network = network
+        network.clone_variant(BASE_VARIANT, UNSOLVED_VARIANT, True)
+        self.records = read_records(base_path)
+        self.loads = set(network.get_loads(attributes=[]).index)
+        self.generators = set(network.get_generators(attributes=[]).index)
+        self.lines = set(network.get_lines(attributes=[]).index)
+        self.transformers = set(network.get_2_windings_transformers(attributes=[]).index)
+        self.switches = set(network.get_switches(attributes=[]).index)
+        self.ratio_tap_changers = set(network.get_ratio_tap_changers(attributes=[]).index)
+        self.phase_tap_changers = set(network.get_phase_tap_changers(attributes=[]).index)
+        dangling_lines = network.get_dangling_lines(attributes=['pairing_key', 'paired'])
+        # Only unpaired X-nodes are a single dangling line whose P0 / Q0 is the X-node injection
+        unpaired = dangling_lines[~dangling_lines['paired']]
+        self.x_nodes = dict(zip(unpaired['pairing_key'], unpaired.index))
+        self.dangling_lines = set(dangling_lines.index)
+
+    def _check(self, changes):
+        # Every changed element must exist in the base network, elements the importer did not create can not be updated
+        for name, known in (('loads', self.loads), ('generators', self.generators), ('x_nodes', self.x_nodes),
+                            ('ratio_taps', self.ratio_tap_changers), ('phase_taps', self.phase_tap_changers)):
+            missing = [key for key, values in changes[name].items() if key not in known]
+            if name == 'loads':
+                # A load added in the scenario does not exist in the base, a removed one is set to 0
+                missing = [key for key in missing if any(changes[name][key])]
+            if missing:
+                return f'{name} {missing[:3]} not in the base network'
+        elements = self.lines | self.transformers | self.switches | self.dangling_lines
+        missing = [key for key in changes['statuses'] if key not in elements]
+        return f'elements {missing[:3]} not in the base network' if missing else None
+
+    def apply(self, path):
+        changes, reason = diff_records(self.records, read_records(path))
+        if changes is not None:
+            reason = self._check(changes)
+        if reason:
+            logging.info(f"{path} is loaded normally: {reason}.")
+            return reason
+
+        network = self.network
+        # Only the voltages of the solved base are carried over, for the warm start
+        voltages = network.get_buses(attributes=['v_mag', 'v_angle']).dropna()
+        network.clone_variant(UNSOLVED_VARIANT, SCENARIO_VARIANT, True)
+        network.set_working_variant(SCENARIO_VARIANT)
+        if not voltages.empty:
+            network.update_buses(voltages)
+        loads = {key: values for key, values in changes['loads'].items() if key in self.loads}
+        if loads:
+            network.update_loads(_frame(loads, ['p0', 'q0']))
+        if changes['generators']:
+            network.update_generators(_frame(changes['generators'], ['target_p', 'target_q', 'target_v', 'voltage_regulator_on']))
+        if changes['x_nodes']:
+            network.update_dangling_lines(_frame({self.x_nodes[code]: values for code, values in changes['x_nodes'].items()},
+                                                 ['p0', 'q0']))
+        if changes['ratio_taps']:
+            network.update_ratio_tap_changers(_frame({key: [tap] for key, tap in changes['ratio_taps'].items()}, ['tap']))
+        if changes['phase_taps']:
+            network.update_phase_tap_changers(_frame({key: [tap] for key, tap in changes['phase_taps'].items()}, ['tap']))
+        for kind, update, columns in (('lines', network.update_lines, ['connected1', 'connected2']),
+                                      ('transformers', network.update_2_windings_transformers, ['connected1', 'connected2']),
+                                      ('dangling_lines', network.update_dangling_lines, ['connected']),
+                                      ('switches', network.update_switches, ['open'])):
+            known = getattr(self, kind)
+            statuses = {key: [not connected] if kind == 'switches' else [connected] * len(columns)
+                        for key, connected in changes['statuses'].items() if key in known}
+            if statuses:
+                update(_frame(statuses, columns))
+        return None
+
+    def reset(self):
+        self.network.set_working_variant(BASE_VARIANT)
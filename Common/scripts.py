@@ -0,0 +1,46 @@
+import importlib.util
+import os
+import sys
+
+"""
+Loads the four analysis scripts as modules. They live in separate folders and 'Monthly TCC.py'
+has a space in its name, so they can not be imported with a plain import statement.
+"""
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Script name -> (folder, file name)
+SCRIPTS = {
+    'daily_lf': ('PyPowSyBl_Daily_LoadFlow', 'DailyLoadFlow.py'),
+    'boundary': ('Boundary_Diagrams', 'Boundary_diagrams.py'),
+    'comparisons': ('Data_Analysis', 'Comparisons.py'),
+    'tcc': ('Monthly_Capacity_Calculations', 'Monthly TCC.py'),
+}
+
+
+def load_script(name):
+    """
+    Import one of the scripts by its short name ('daily_lf', 'boundary', 'comparisons', 'tcc').
+    The module is cached, so repeated calls are cheap.
+    """
+    if name not in SCRIPTS:
+        raise ValueError(f"Unknown script '{name}'. Expected one of: {', '.join(SCRIPTS)}")
+
+    module_name = f'powsybl_scripts_{name}'
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    folder, filename = SCRIPTS[name]
+    script_folder = os.path.join(REPO_ROOT, folder)
+    if script_folder not in sys.path:
+        sys.path.append(script_folder)
+
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(script_folder, filename))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    try:
+        spec.loader.exec_module(module)
+    except Exception:
+        del sys.modules[module_name]
+        raise
+    return module
@@ -0,0 +1,151 @@
+import json
+import logging
+import os
+import threading
+
+from Common.lazy import lazy_import
+from Common.result_cache import file_fingerprint
+
+lf = lazy_import('pypowsybl.loadflow')
+
+"""
+Solver strategy. A cheap load flow profile is tried first and heavier ones are used only when the main
+synchronous component does not converge. The profile that worked is remembered per UCTE file (content hash)
+so that a later run of the same file starts directly with it.
+"""
+
+# Load flow settings per profile, from the cheapest to the heaviest
+PROFILES = {
+    'fast': {'phase_shifter_regulation_on': False, 'shunt_compensator_voltage_control_on': False,
+             'outer_loops': 10},
+    'regulated': {'phase_shifter_regulation_on': True, 'shunt_compensator_voltage_control_on': True,
+                  'outer_loops': 30},
+    'robust': {'phase_shifter_regulation_on': True, 'shunt_compensator_voltage_control_on': True,
+               'outer_loops': 50, 'voltage_init_mode': 'DC_VALUES',
+               'provider_parameters': {'maxNewtonRaphsonIterations': '30'}},
+    'dc': {'dc': True},
+}
+
+# DC results have no currents, reactive powers or voltages, so reports that need them stop at 'robust'
+AC_PROFILES = ['fast', 'regulated', 'robust']
+ALL_PROFILES = AC_PROFILES + ['dc']
+
+STRATEGY_FILE = 'solver_strategies.jsonl'
+
+
+def build_parameters(profile, provider_parameters=None, voltage_init_mode=None):
+    """
+    lf.Parameters of a profile. provider_parameters holds the script specific OpenLoadFlow settings (e.g. slack bus),
+    voltage_init_mode ('PREVIOUS_VALUES' for a warm start) replaces the one of the profile.
+    """
+    settings = PROFILES[profile]
+    provider = {'maxOuterLoopIterations': str(settings.get('outer_loops', 30))}
+    provider.update(provider_parameters or {})
+    provider.update(settings.get('provider_parameters', {}))
+    return lf.Parameters(
+        distributed_slack=False,
+        transformer_voltage_control_on=False,
+        phase_shifter_regulation_on=settings.get('phase_shifter_regulation_on'),
+        shunt_compensator_voltage_control_on=settings.get('shunt_compensator_voltage_control_on'),
+        voltage_init_mode=getattr(lf.VoltageInitMode, voltage_init_mode or settings.get('voltage_init_mode', 'UNIFORM_VALUES')),
+        provider_parameters=provider)
+
+
+def main_component_converged(results):
+    # Small islands without generation may fail, only the main synchronous component decides
+    main = [result for result in results if result.connected_component_num == 0 and result.synchronous_component_num == 0]
+    return bool(main) and all(result.status == lf.ComponentStatus.CONVERGED for result in main)
+
+
+class StrategyStore:
+    """
+    JSON lines file with the profile that converged for each UCTE file, keyed by the file content hash.
+    New entries are appended every autosave updates and on save(); the last line of a key wins. Appends of
+    other processes need no merge, so concurrent workers do not lose each other's entries.
+    """
+
+    def __init__(self, path, autosave=25):
+        self.path = path
+        self.autosave = autosave
+        self.strategies = self._read()
+        self.pending = []
+        # Pipelines may solve several networks at once
+        self._lock = threading.RLock()
+
+    def _read(self):
+        strategies = {}
+        if not os.path.exists(self.path):
+            return strategies
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                        strategies[entry.pop('key')] = entry
+                    except (ValueError, KeyError, AttributeError):
+                        # A line cut short by a crashed writer
+                        logging.warning(f"Ignoring unreadable line in solver strategy file {self.path}")
+        except OSError as e:
+            logging.warning(f"Ignoring unreadable solver strategy file {self.path}: {e}")
+        return strategies
+
+    def get(self, ucte_path):
+        entry = self.strategies.get(file_fingerprint(ucte_path)[2])
+        return entry['profile'] if entry else None
+
+    def put(self, ucte_path, profile):
+        key = file_fingerprint(ucte_path)[2]
+        with self._lock:
+            if self.strategies.get(key, {}).get('profile') == profile:
+                return
+            entry = {'profile': profile, 'file': os.path.basename(ucte_path)}
+            self.strategies[key] = entry
+            self.pending.append(dict(entry, key=key))
+            if len(self.pending) >= self.autosave:
+                self.save()
+
+    def save(self):
+        with self._lock:
+            if not self.pending:
+                return
+            lines = ''.join(json.dumps(entry, sort_keys=True) + '\n' for entry in self.pending)
+            # One write call per batch, appended whole after the lines of other processes
+            with open(self.path, 'ab+') as file:
+                if file.seek(0, os.SEEK_END):
+                    file.seek(-1, os.SEEK_END)
+                    if file.read(1) != b'\n':
+                        # Do not continue the cut line of a crashed writer
+                        lines = '\n' + lines
+                file.write(lines.encode('utf-8'))
+            self.pending = []
+
+
+def run_loadflow(network, ucte_path=None, profiles=AC_PROFILES, provider_parameters=None, store=None, reporter=None,
+                 report=None, warm_start=False):
+    """
+    Run the profiles in order until the main component converges. A profile remembered for this file in the store
+    is tried first and the lighter profiles before it are skipped. Returns the profile name, or None if all failed.
+    With a SolverReport (Common.solver_report) its reporter is used and the results of every profile are recorded.
+    warm_start starts the first AC profile from the voltages in the network (e.g. a variant of a solved network);
+    the next profiles use their own initialization, as a failed run leaves no usable voltages.
+    """
+    if report is not None:
+        reporter = report.reporter
+    remembered = store.get(ucte_path) if store is not None and ucte_path else None
+    if remembered in profiles:
+        profiles = profiles[profiles.index(remembered):]
+
+    for attempt, profile in enumerate(profiles):
+        warm = warm_start and attempt == 0 and not PROFILES[profile].get('dc')
+        parameters = build_parameters(profile, provider_parameters, 'PREVIOUS_VALUES' if warm else None)
+        run = lf.run_dc if PROFILES[profile].get('dc') else lf.run_ac
+        results = run(network, parameters=parameters, reporter=reporter)
+        if report is not None:
+            report.add_results(profile, results)
+        if main_component_converged(results):
+            if store is not None and ucte_path:
+                store.put(ucte_path, profile)
+            return profile
+        statuses = ', '.join(f'{result.connected_component_num}: {result.status_text}' for result in results)
+        logging.warning(f"Load flow profile '{profile}' did not converge ({statuses}).")
+    return None
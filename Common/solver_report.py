@@ -0,0 +1,130 @@
+import json
+import logging
+import os
+import string
+import threading
+
+from Common.lazy import lazy_import
+
+nf = lazy_import('pypowsybl.report')
+
+"""
+Structured capture of the pypowsybl load flow report. Instead of printing the whole Reporter text after every
+solve, the report tree is walked into records and only warnings, errors and the load flow summaries are logged.
+The full report is written to disk when no profile converges or when detail is requested, and the key figures
+of every file (profile, status, iterations, slack mismatch) are appended to a metrics file next to the results.
+"""
+
+SEVERITIES = ['TRACE', 'DEBUG', 'INFO', 'WARN', 'ERROR']
+LOG_LEVELS = {'TRACE': logging.DEBUG, 'DEBUG': logging.DEBUG, 'INFO': logging.INFO, 'WARN': logging.WARNING,
+              'ERROR': logging.ERROR}
+
+# Records kept whatever their severity: the one line outcome of every AC / DC load flow
+SUMMARY_KEYS = ('acLfComplete', 'dcLfComplete')
+
+METRICS_FILE = 'solver_metrics.jsonl'
+REPORTS_FOLDER = 'solver_reports'
+
+# Set to 1 to write the full report of every file, not only of the diverged ones (inherited by worker processes)
+DETAIL_VARIABLE = 'SOLVER_REPORT_DETAIL'
+
+_metrics_lock = threading.Lock()
+
+
+def set_report_detail(full):
+    os.environ[DETAIL_VARIABLE] = '1' if full else '0'
+
+
+def report_records(reporter):
+    """
+    The report tree as a flat list of records in reading order: depth, key, severity (None for groups),
+    message (with its values filled in) and values.
+    """
+    data = json.loads(reporter.to_json())
+    templates = data.get('dictionaries', {}).get('default', {})
+    records = []
+    stack = [(child, 0) for child in reversed(data['reportRoot'].get('children', []))]
+    while stack:
+        node, depth = stack.pop()
+        values = {name: value.get('value') for name, value in node.get('values', {}).items()}
+        severity = values.pop('reportSeverity', None)
+        key = node.get('messageKey', '')
+        message = string.Template(templates.get(key, key)).safe_substitute(values)
+        records.append({'depth': depth, 'key': key, 'severity': severity, 'message': message, 'values': values})
+        stack.extend((child, depth + 1) for child in reversed(node.get('children', [])))
+    return records
+
+
+def filter_records(records, level='WARN', summary_keys=SUMMARY_KEYS):
+    # Records at or above the level, plus the summaries
+    minimum = SEVERITIES.index(level)
+    return [record for record in records
+            if record['key'] in summary_keys or (record['severity'] in SEVERITIES and SEVERITIES.index(record['severity']) >= minimum)]
+
+
+def format_records(records):
+    return '\n'.join('  ' * record['depth'] + record['message'] for record in records)
+
+
+def component_figures(results):
+    """
+    Status, iterations and slack bus mismatch (MW) of the main synchronous component of a load flow.
+    """
+    main = [result for result in results if result.connected_component_num == 0 and result.synchronous_component_num == 0]
+    if not main:
+        return {'status': 'NO_MAIN_COMPONENT', 'iterations': None, 'slack_mismatch_mw': None}
+    result = main[0]
+    mismatch = sum(slack.active_power_mismatch for slack in result.slack_bus_results)
+    return {'status': str(result.status).split('.')[-1], 'iterations': result.iteration_count,
+            'slack_mismatch_mw': round(mismatch, 3)}
+
+
+def append_metrics(path, metrics):
+    # One JSON line per file; appends of other processes do not need a header or a merge
+    with _metrics_lock, open(path, 'a', encoding='utf-8') as file:
+        file.write(json.dumps(metrics) + '\n')
+
+
+class SolverReport:
+    """
+    Reporter and results of the load flows of one file, see run_loadflow(..., report=SolverReport(path, folder)).
+    finish(profile) logs the kept records, writes the detail if needed and returns the metrics of the file.
+    Without a folder nothing is written to disk.
+    """
+
+    def __init__(self, ucte_path, folder=None, level='WARN', full_detail=None):
+        self.ucte_path = ucte_path
+        self.folder = folder
+        self.level = level
+        self.full_detail = os.environ.get(DETAIL_VARIABLE) == '1' if full_detail is None else full_detail
+        self.reporter = nf.Reporter()
+        self.attempts = []
+
+    def add_results(self, profile, results):
+        self.attempts.append(dict(component_figures(results), profile=profile))
+
+    def finish(self, profile):
+        name = os.path.basename(self.ucte_path) if self.ucte_path else 'network'
+        records = report_records(self.reporter)
+        kept = filter_records(records, self.level)
+        for record in kept:
+            logging.log(LOG_LEVELS.get(record['severity'], logging.INFO), f"{name}: {record['message']}")
+
+        detail_path = None
+        if self.folder and (profile is None or self.full_detail):
+            detail_path = os.path.join(self.folder, REPORTS_FOLDER, f'{os.path.splitext(name)[0]}.txt')
+            os.makedirs(os.path.dirname(detail_path), exist_ok=True)
+            with open(detail_path, 'w', encoding='utf-8') as file:
+                file.write(format_records(records) + '\n')
+
+        last = self.attempts[-1] if self.attempts else {}
+        metrics = {
+            'file': name, 'profile': profile, 'converged': profile is not None, 'attempts': len(self.attempts),
+            'status': last.get('status'), 'iterations': last.get('iterations'),
+            'slack_mismatch_mw': last.get('slack_mismatch_mw'),
+            'warnings': sum(1 for record in records if record['severity'] in ('WARN', 'ERROR')),
+            'detail': detail_path,
+        }
+        if self.folder:
+            append_metrics(os.path.join(self.folder, METRICS_FILE), metrics)
+        return metrics
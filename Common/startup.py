@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+
+from Common.lazy import HEAVY_MODULES
+
+"""
+Startup-time check. Every entry point is imported in a fresh interpreter with 'python -X importtime' and the
+import time is compared to a budget. The check also fails when a heavy module (pypowsybl, pandas, matplotlib...)
+is imported at startup, which is what makes argument errors, listings and dry runs slow.
+"""
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Entry point -> statement that imports it the way it is started
+ENTRY_POINTS = {
+    'cli': 'import cli',
+    'daily_lf': "from Common.scripts import load_script; load_script('daily_lf')",
+    'boundary': "from Common.scripts import load_script; load_script('boundary')",
+    'comparisons': "from Common.scripts import load_script; load_script('comparisons')",
+    'tcc': "from Common.scripts import load_script; load_script('tcc')",
+}
+
+DEFAULT_BUDGET_MS = 200
+
+
+def import_times(statement):
+    """
+    {module: (self ms, cumulative ms)} of the imports made by the statement, from 'python -X importtime'.
+    Also returns the total, the sum of the cumulative times of the top level imports.
+    """
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement], cwd=REPO_ROOT,
+                             capture_output=True, text=True)
+    if process.returncode:
+        raise RuntimeError(f"'{statement}' failed:\n{process.stderr[-2000:]}")
+
+    times, total_us = {}, 0
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or line.endswith('imported package'):
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # Nested imports are indented by two spaces per level
+        if not name.startswith('  '):
+            total_us += int(cumulative_us)
+        times[name.strip()] = (int(self_us) / 1000, int(cumulative_us) / 1000)
+    return times, total_us / 1000
+
+
+def check_startup(budget_ms=DEFAULT_BUDGET_MS, entry_points=None, slowest=5):
+    """
+    One row per entry point: import time, heavy modules imported and the slowest imports.
+    Every entry point passes when it stays within the budget and imports none of the heavy modules.
+    """
+    rows = []
+    for name in entry_points or ENTRY_POINTS:
+        times, total_ms = import_times(ENTRY_POINTS[name])
+        heavy = sorted({module.split('.')[0] for module in times if module.split('.')[0] in HEAVY_MODULES})
+        top = sorted(times.items(), key=lambda item: item[1][0], reverse=True)[:slowest]
+        rows.append({'entry_point': name, 'import_ms': round(total_ms, 1), 'heavy_modules': heavy,
+                     'slowest': [(module, round(self_ms, 1)) for module, (self_ms, _) in top],
+                     'passed': total_ms <= budget_ms and not heavy})
+    return rows
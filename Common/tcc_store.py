@@ -0,0 +1,93 @@
+import os
+
+from Common.lazy import lazy_import
+
+pd = lazy_import('pandas')
+
+"""
+TCC history store. Monthly TCC results are appended to Parquet files partitioned by year and month
+(<store>/year=2024/month=07/tcc.parquet), each sorted by (Date, Timestamp, Border & Direction).
+Queries only open the partitions of the requested period and read the needed borders, so a year of
+capacity data is answered without opening the monthly Excel files. Needs a Parquet engine (pyarrow).
+"""
+
+KEY = ['Date', 'Timestamp', 'Border & Direction']
+COLUMNS = KEY + ['TCC']
+PARTITION_FILE = 'tcc.parquet'
+
+
+def partition_path(store_folder, year, month):
+    return os.path.join(store_folder, f'year={int(year):04d}', f'month={int(month):02d}', PARTITION_FILE)
+
+
+def append_tcc(store_folder, data):
+    """
+    Add TCC rows (Date as YYYYMMDD) to the store. There is one row per UCTE file, so several rows share a key;
+    the stored rows of every (Date, Timestamp, Border & Direction) present in data are replaced, so rerunning a
+    month or a few hours does not duplicate them and keeps the other hours. Returns the number of rows written.
+    """
+    data = data[COLUMNS].copy()
+    for column in KEY:
+        data[column] = data[column].astype(str)
+    data['TCC'] = data['TCC'].astype(float)
+
+    months = data['Date'].str[:6]
+    for year_month, rows in data.groupby(months, sort=True):
+        path = partition_path(store_folder, year_month[:4], year_month[4:])
+        if os.path.exists(path):
+            stored = pd.read_parquet(path)
+            replaced = pd.MultiIndex.from_frame(stored[KEY]).isin(pd.MultiIndex.from_frame(rows[KEY]))
+            rows = pd.concat([stored[~replaced], rows], ignore_index=True)
+        # Stable sort keeps the file order of rows with the same key
+        rows = rows.sort_values(KEY, ignore_index=True, kind='stable')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary_path = path + '.tmp'
+        rows.to_parquet(temporary_path, index=False)
+        os.replace(temporary_path, path)
+    return len(data)
+
+
+def _partitions(store_folder, start=None, end=None):
+    # Partition files overlapping [start, end], found from the folder names only
+    first = str(start)[:6] if start else '000000'
+    last = str(end)[:6] if end else '999999'
+    paths = []
+    for year_folder in sorted(os.listdir(store_folder)) if os.path.isdir(store_folder) else []:
+        if not year_folder.startswith('year='):
+            continue
+        for month_folder in sorted(os.listdir(os.path.join(store_folder, year_folder))):
+            year_month = year_folder[5:] + month_folder[6:]
+            path = os.path.join(store_folder, year_folder, month_folder, PARTITION_FILE)
+            if month_folder.startswith('month=') and first <= year_month <= last and os.path.exists(path):
+                paths.append(path)
+    return paths
+
+
+def query_tcc(store_folder, start=None, end=None, borders=None, aggregate=None, percentile=95):
+    """
+    TCC rows with start <= Date <= end (YYYYMMDD, both optional) for the given borders (all if None).
+    aggregate='daily' or 'monthly' returns min, max, mean and the given percentile per period and border.
+    """
+    filters = []
+    if start:
+        filters.append(('Date', '>=', str(start)))
+    if end:
+        filters.append(('Date', '<=', str(end)))
+    if borders:
+        filters.append(('Border & Direction', 'in', list(borders)))
+
+    frames = [pd.read_parquet(path, filters=filters or None) for path in _partitions(store_folder, start, end)]
+    data = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=COLUMNS)
+    if not aggregate:
+        return data
+
+    if aggregate == 'daily':
+        period = data['Date']
+    elif aggregate == 'monthly':
+        period = data['Date'].str[:6].rename('Month')
+    else:
+        raise ValueError(f"Unknown aggregate '{aggregate}'. Expected 'daily' or 'monthly'.")
+    grouped = data.groupby([period, data['Border & Direction']], sort=True)['TCC']
+    summary = grouped.agg(['min', 'max', 'mean', 'count'])
+    summary[f'p{percentile:g}'] = grouped.quantile(percentile / 100)
+    return summary.rename(columns=str.capitalize).reset_index()
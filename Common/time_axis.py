@@ -0,0 +1,41 @@
+"""
+Time axis of a day. Hourly UCTE files are named by the middle of the hour (0030 ... 2330),
+quarter-hour files by the start of each market time unit (0000, 0015 ... 2345).
+"""
+
+# Supported resolutions in minutes
+RESOLUTIONS = (60, 30, 15)
+DEFAULT_RESOLUTION = 60
+
+
+def default_offset(resolution):
+    # Minutes after midnight of the first timestamp
+    return 30 if resolution == 60 else 0
+
+
+def day_timestamps(resolution=DEFAULT_RESOLUTION, offset=None):
+    """
+    All 'HHMM' timestamps of a day: 24 for hourly, 96 for quarter-hour resolution.
+    """
+    resolution = int(resolution)
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Unsupported resolution {resolution} minutes. Expected one of: {', '.join(map(str, RESOLUTIONS))}")
+    offset = default_offset(resolution) if offset is None else int(offset)
+    return [f'{minutes // 60:02d}{minutes % 60:02d}' for minutes in range(offset, 24 * 60, resolution)]
+
+
+def parse_resolution(value):
+    # Console input, blank means hourly
+    return int(value) if value and value.strip() else DEFAULT_RESOLUTION
+
+
+def parse_timestamps(value, resolution=DEFAULT_RESOLUTION):
+    # Comma separated console input, blank means the whole day at the given resolution
+    if value and value.strip():
+        return [timestamp.strip() for timestamp in value.split(',') if timestamp.strip()]
+    return day_timestamps(resolution)
+
+
+def colon_format(timestamp):
+    # '0030' -> '00:30' as used in the TCC output
+    return f'{timestamp[:2]}:{timestamp[2:]}'
@@ -0,0 +1,125 @@
+import glob
+import os
+import time
+
+"""
+Lightweight UCTE pre-scan. Reads the node and line blocks as plain text, without pypowsybl, to find the
+countries, the X-nodes and the nodes they connect to, the element counts and obvious format problems
+(empty or truncated files, lines referring to unknown nodes). A scan takes milliseconds, so files can be
+validated, filtered and grouped before anything is loaded or solved.
+"""
+
+# Shortest valid record per block: nodes up to the active generation, lines and transformers up to the reactance
+MIN_RECORD_LENGTH = {'N': 56, 'L': 35, 'T': 53}
+# Unknown node references reported per file, the rest are only counted as invalid
+MAX_ERRORS = 10
+
+
+def scan_ucte(path):
+    """
+    Returns a dict with the metadata of one UCTE file:
+    valid, errors, countries, nodes, lines, transformers, x_nodes ({X-node: [connected nodes]}), scan_ms.
+    """
+    started = time.perf_counter()
+    scan = {'path': path, 'valid': True, 'errors': [], 'countries': [], 'nodes': 0, 'lines': 0,
+            'transformers': 0, 'x_nodes': {}, 'scan_ms': 0.0}
+    node_codes = set()
+    blocks = set()
+    block = None
+    last_record = None
+
+    try:
+        if os.path.getsize(path) == 0:
+            scan['errors'].append('empty file')
+        else:
+            with open(path, 'r', encoding='latin-1') as file:
+                for raw_line in file:
+                    line = raw_line.rstrip('\r\n')
+                    if line.startswith('##'):
+                        # ##TT (transformer special descriptions) is a block of its own, not ##T
+                        tag = 'TT' if line.startswith('##TT') else line[2:3]
+                        if tag == 'Z':
+                            scan['countries'].append(line[3:].strip())
+                        else:
+                            block = tag
+                            blocks.add(block)
+                        continue
+                    if not line.strip() or block not in MIN_RECORD_LENGTH:
+                        continue
+
+                    last_record = (block, line)
+                    if block == 'N':
+                        node_codes.add(line[:8])
+                        scan['nodes'] += 1
+                        if line.startswith('X'):
+                            scan['x_nodes'].setdefault(line[:8], [])
+                    elif block == 'L':
+                        scan['lines'] += 1
+                        node1, node2 = line[:8], line[9:17]
+                        for node, other in ((node1, node2), (node2, node1)):
+                            if node.startswith('X'):
+                                scan['x_nodes'].setdefault(node, []).append(other)
+                            elif node not in node_codes and len(scan['errors']) < MAX_ERRORS:
+                                scan['errors'].append(f'line {line[:19]!r} refers to unknown node {node!r}')
+                    elif block == 'T':
+                        scan['transformers'] += 1
+    except OSError as e:
+        scan['errors'].append(str(e))
+
+    if not scan['errors']:
+        missing = [tag for tag in ('N', 'L') if tag not in blocks]
+        if missing:
+            scan['errors'].append(f"missing block(s) {', '.join('##' + tag for tag in missing)}")
+        elif last_record and len(last_record[1]) < MIN_RECORD_LENGTH[last_record[0]]:
+            scan['errors'].append(f'truncated record {last_record[1]!r}')
+
+    scan['valid'] = not scan['errors']
+    scan['scan_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    return scan
+
+
+def x_node_neighbours(scan, prefixes=None):
+    """
+    The nodes connected to X-nodes, optionally only those starting with one of the prefixes (e.g. 'G', 'R').
+    """
+    neighbours = {node for nodes in scan['x_nodes'].values() for node in nodes}
+    if prefixes:
+        neighbours = {node for node in neighbours if node.startswith(tuple(prefixes))}
+    return sorted(neighbours)
+
+
+def is_relevant(scan, prefixes):
+    # A valid file with at least one X-node connected to a node of the given countries
+    return scan['valid'] and bool(x_node_neighbours(scan, prefixes))
+
+
+def list_ucte_files(paths):
+    # Files and folders (all *.uct files inside, any case) given on the command line
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(name for name in glob.glob(os.path.join(path, '*')) if name.lower().endswith('.uct')))
+        else:
+            files.append(path)
+    return files
+
+
+def scan_files(paths, prefixes=None):
+    """
+    Scan many files into a pandas DataFrame, one row per file, for validation, filtering and grouping
+    (e.g. frame.groupby('countries')).
+    """
+    import pandas as pd
+
+    rows = []
+    for path in paths:
+        scan = scan_ucte(path)
+        rows.append({
+            'file': os.path.basename(path), 'valid': scan['valid'], 'errors': '; '.join(scan['errors']),
+            'countries': ','.join(sorted(set(scan['countries']))), 'nodes': scan['nodes'], 'lines': scan['lines'],
+            'transformers': scan['transformers'], 'x_nodes': len(scan['x_nodes']),
+            'x_node_neighbours': ','.join(x_node_neighbours(scan, prefixes)),
+            'relevant': is_relevant(scan, prefixes) if prefixes else scan['valid'],
+            'scan_ms': scan['scan_ms'], 'path': path,
+        })
+    return pd.DataFrame(rows)
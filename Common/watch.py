@@ -0,0 +1,133 @@
+import datetime
+import json
+import logging
+import os
+import time
+
+"""
+Watch mode. Polls the UCTE folder, keeps a manifest with the version processed for every hour and,
+when a higher version appears (..._GR0.UCT -> ..._GR1.UCT), re-solves and re-exports only that hour.
+The comparison and boundary outputs of the same timestamp are then refreshed as well.
+"""
+
+
+def manifest_path(output_folder, date, file_type, country_code):
+    return os.path.join(output_folder, f'watch_manifest_{date}_{file_type}_{country_code}.json')
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save_manifest(path, manifest):
+    # Write to a temporary file first so a crash never leaves a half written manifest
+    temporary_path = path + '.tmp'
+    with open(temporary_path, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    os.replace(temporary_path, path)
+
+
+def find_new_versions(daily_lf, manifest, date, hours, numbers, file_type, country_code, format, ucte_folder):
+    """
+    Returns {hour: (version, path)} for the hours whose highest UCTE version is newer than the manifest.
+    """
+    new_versions = {}
+    for hour in hours:
+        highest_number, selected_ucte_path = daily_lf.find_highest_version_file(
+            date, hour, numbers, file_type, country_code, format, ucte_folder)
+        if selected_ucte_path and highest_number > manifest.get(hour, {}).get('version', -1):
+            new_versions[hour] = (highest_number, selected_ucte_path)
+    return new_versions
+
+
+def update_comparison(comparisons, settings, date, hour):
+    """
+    Rewrite the daily comparison file after a new OPENLF report of one hour. The other hours come from
+    the comparison result cache, so only the changed timestamp is recomputed.
+    """
+    reports_folder = settings.get('reports_folder') or settings['output_folder']
+    comparisons.process_files_and_accumulate_data(settings['hours'], settings['comparison_numbers'], date, settings['file_type'],
+                                                  settings['country_code'], reports_folder, settings['comparison_folder'])
+    logging.info(f"Comparison updated for {hour}.")
+
+
+def update_boundary(boundary, settings, date, hour):
+    """
+    The boundary nodes files are built from the CGM files, not from the watched IGM: re-solve the highest CGM
+    version of the hour from boundary_ucte_folder and replace the rows of the hour with its X-nodes, in the file
+    of every border of the settings (the Greek one when no borders are given).
+    """
+    from Common.borders import border_table
+    from Common.solver import STRATEGY_FILE, StrategyStore
+
+    cgm_path = boundary.find_highest_version_path(settings['boundary_ucte_folder'], date, hour, settings['file_type'],
+                                                  settings['boundary_country'], settings['format'], settings['numbers'])
+    if not cgm_path:
+        logging.warning(f"No CGM file for {hour} in {settings['boundary_ucte_folder']}, boundary nodes are not refreshed.")
+        return
+    store = StrategyStore(os.path.join(settings['boundary_folder'], STRATEGY_FILE))
+    try:
+        network = boundary.load_and_run_loadflow(cgm_path, store)
+    finally:
+        store.save()
+    if network is None:
+        logging.error(f"CGM {os.path.basename(cgm_path)} of {hour} did not converge, boundary nodes are not refreshed.")
+        return
+    borders = border_table(settings['borders'], settings.get('border_table')) if settings.get('borders') else None
+    boundary.update_boundary_hour(network, hour, settings['boundary_folder'], settings['diagrams_folder'], date, settings['hours'],
+                                  borders)
+    logging.info(f"Boundary nodes and plots updated for {hour} from {os.path.basename(cgm_path)}.")
+
+
+def poll_once(settings, date):
+    """
+    One pass over the UCTE folder. Returns the hours that were (re)processed.
+    """
+    from Common.scripts import load_script
+
+    daily_lf = load_script('daily_lf')
+    path = manifest_path(settings['output_folder'], date, settings['file_type'], settings['country_code'])
+    manifest = load_manifest(path)
+    new_versions = find_new_versions(daily_lf, manifest, date, settings['hours'], settings['numbers'], settings['file_type'],
+                                     settings['country_code'], settings['format'], settings['ucte_folder'])
+
+    for hour, (version, ucte_path) in sorted(new_versions.items()):
+        logging.info(f"New version {version} for {hour} (previous: {manifest.get(hour, {}).get('version')}).")
+        network = daily_lf.process_and_save_network(ucte_path, date, hour, settings['file_type'],
+                                                    settings['country_code'], settings['output_folder'])
+        if network is None:
+            # Diverged with every solver profile: recorded so the same version is not solved again on every poll
+            logging.error(f"Version {version} of {hour} did not converge, outputs of this hour are not refreshed.")
+        else:
+            if settings.get('comparison_folder'):
+                update_comparison(load_script('comparisons'), settings, date, hour)
+            if settings.get('boundary_folder') and settings.get('diagrams_folder') and settings.get('boundary_ucte_folder'):
+                update_boundary(load_script('boundary'), settings, date, hour)
+
+        # Only record the hour once every export of it has succeeded
+        manifest[hour] = {'version': version, 'path': ucte_path, 'converged': network is not None,
+                          'processed_at': datetime.datetime.now().isoformat(timespec='seconds')}
+        save_manifest(path, manifest)
+    return sorted(new_versions)
+
+
+def watch(settings, poll_interval=60, once=False):
+    """
+    Poll until interrupted. Without a fixed date the current day is watched and the date rolls over at midnight.
+    """
+    while True:
+        date = settings.get('date') or datetime.date.today().strftime('%Y%m%d')
+        try:
+            processed = poll_once(settings, date)
+            if processed:
+                logging.info(f"Processed hours {', '.join(processed)} for {date}.")
+        except Exception as e:
+            logging.error(f"Watch pass for {date} failed: {e}")
+            if once:
+                raise
+        if once:
+            return
+        time.sleep(poll_interval)
@@ -0,0 +1,277 @@
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+
+"""
+SQLite backed work queue. Several worker processes (also on different machines that share the
+folder of the queue file) claim jobs, run them and report done/failed. Failed jobs are retried
+until max_attempts, and jobs can depend on other jobs (e.g. comparisons after the daily load flow).
+"""
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    worker TEXT,
+    created_at REAL,
+    claimed_at REAL,
+    finished_at REAL,
+    error TEXT,
+    UNIQUE (kind, params)
+);
+CREATE TABLE IF NOT EXISTS dependencies (
+    job_id INTEGER NOT NULL,
+    depends_on INTEGER NOT NULL,
+    PRIMARY KEY (job_id, depends_on)
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+"""
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+class WorkQueue:
+    """
+    queue_path: path of the SQLite file (created if missing).
+    lease_seconds: a running job whose worker has not renewed it (heartbeat) for this time is considered
+                   lost (crashed process or machine) and is given back to the queue, or failed when it
+                   has no attempts left.
+    """
+
+    def __init__(self, queue_path, lease_seconds=15 * 60, timeout=60):
+        self.queue_path = queue_path
+        self.lease_seconds = lease_seconds
+        # isolation_level=None: transactions are opened explicitly with BEGIN IMMEDIATE
+        self.connection = sqlite3.connect(queue_path, timeout=timeout, isolation_level=None)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _transaction(self):
+        return _Transaction(self.connection)
+
+    def enqueue(self, kind, params, depends_on=(), max_attempts=3):
+        """
+        Add a job and return its id. Enqueuing the same kind/params again returns the existing job.
+        """
+        params_json = json.dumps(params, sort_keys=True)
+        with self._transaction() as cursor:
+            cursor.execute('INSERT OR IGNORE INTO jobs (kind, params, max_attempts, created_at) VALUES (?, ?, ?, ?)',
+                           (kind, params_json, max_attempts, time.time()))
+            job_id = cursor.execute('SELECT id FROM jobs WHERE kind = ? AND params = ?', (kind, params_json)).fetchone()['id']
+            for dependency in depends_on:
+                cursor.execute('INSERT OR IGNORE INTO dependencies (job_id, depends_on) VALUES (?, ?)', (job_id, dependency))
+        return job_id
+
+    def claim(self, worker=None):
+        """
+        Atomically take the oldest pending job whose dependencies are done.
+        Returns (id, kind, params) or None if nothing can run right now.
+        """
+        worker = worker or worker_name()
+        now = time.time()
+        with self._transaction() as cursor:
+            # Give back jobs of workers that died while running them, a job without attempts left fails
+            expired = cursor.execute('SELECT id, attempts, max_attempts, worker FROM jobs WHERE status = ? AND claimed_at < ?',
+                                     (RUNNING, now - self.lease_seconds)).fetchall()
+            for job in expired:
+                error = f"Lease of worker {job['worker']} expired"
+                if job['attempts'] < job['max_attempts']:
+                    cursor.execute('UPDATE jobs SET status = ?, worker = NULL, error = ? WHERE id = ?', (PENDING, error, job['id']))
+                else:
+                    _fail_with_dependants(cursor, job['id'], error)
+            row = cursor.execute("""
+                SELECT id, kind, params FROM jobs
+                WHERE status = ? AND NOT EXISTS (
+                    SELECT 1 FROM dependencies d JOIN jobs j ON j.id = d.depends_on
+                    WHERE d.job_id = jobs.id AND j.status != ?)
+                ORDER BY id LIMIT 1""", (PENDING, DONE)).fetchone()
+            if row is None:
+                return None
+            cursor.execute('UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, claimed_at = ? WHERE id = ?',
+                           (RUNNING, worker, now, row['id']))
+        return row['id'], row['kind'], json.loads(row['params'])
+
+    def heartbeat(self, job_id, worker=None):
+        """
+        Renew the lease of a running job. Returns False when the worker no longer owns the job.
+        """
+        worker = worker or worker_name()
+        with self._transaction() as cursor:
+            return cursor.execute('UPDATE jobs SET claimed_at = ? WHERE id = ? AND worker = ? AND status = ?',
+                                  (time.time(), job_id, worker, RUNNING)).rowcount > 0
+
+    def complete(self, job_id, worker=None):
+        """
+        Mark a job done. Returns False (and changes nothing) when the worker no longer owns the job,
+        e.g. its lease expired and another worker claimed it.
+        """
+        worker = worker or worker_name()
+        with self._transaction() as cursor:
+            updated = cursor.execute('UPDATE jobs SET status = ?, finished_at = ?, error = NULL '
+                                     'WHERE id = ? AND worker = ? AND status = ?', (DONE, time.time(), job_id, worker, RUNNING))
+        if not updated.rowcount:
+            logging.warning(f"Worker {worker} no longer owns job {job_id}, its result is not recorded.")
+        return updated.rowcount > 0
+
+    def fail(self, job_id, error, worker=None):
+        """
+        Record a failure. The job goes back to pending while it has attempts left, otherwise it is
+        marked failed together with every job that (transitively) depends on it.
+        Returns False (and changes nothing) when the worker no longer owns the job.
+        """
+        worker = worker or worker_name()
+        with self._transaction() as cursor:
+            row = cursor.execute('SELECT attempts, max_attempts FROM jobs WHERE id = ? AND worker = ? AND status = ?',
+                                 (job_id, worker, RUNNING)).fetchone()
+            if row is None:
+                logging.warning(f"Worker {worker} no longer owns job {job_id}, its failure is not recorded.")
+                return False
+            if row['attempts'] < row['max_attempts']:
+                cursor.execute('UPDATE jobs SET status = ?, worker = NULL, error = ? WHERE id = ?', (PENDING, error, job_id))
+                return True
+            _fail_with_dependants(cursor, job_id, error)
+        return True
+
+    def retry_failed(self):
+        """
+        Put all failed jobs back to pending with a fresh attempt budget. Returns the number of jobs reset.
+        """
+        with self._transaction() as cursor:
+            return cursor.execute('UPDATE jobs SET status = ?, attempts = 0, worker = NULL, error = NULL WHERE status = ?',
+                                  (PENDING, FAILED)).rowcount
+
+    def has_open_jobs(self):
+        row = self.connection.execute('SELECT COUNT(*) AS n FROM jobs WHERE status IN (?, ?)', (PENDING, RUNNING)).fetchone()
+        return row['n'] > 0
+
+    def status_counts(self):
+        rows = self.connection.execute('SELECT kind, status, COUNT(*) AS n FROM jobs GROUP BY kind, status ORDER BY kind, status')
+        return [(row['kind'], row['status'], row['n']) for row in rows]
+
+    def jobs(self, status=None):
+        query = 'SELECT id, kind, params, status, attempts, worker, error FROM jobs'
+        args = ()
+        if status:
+            query += ' WHERE status = ?'
+            args = (status,)
+        return [dict(row) for row in self.connection.execute(query + ' ORDER BY id', args)]
+
+
+def _fail_with_dependants(cursor, job_id, error):
+    # Mark a job failed together with every pending job that (transitively) depends on it
+    cursor.execute('UPDATE jobs SET status = ?, finished_at = ?, error = ? WHERE id = ?', (FAILED, time.time(), error, job_id))
+    blocked = [job_id]
+    while blocked:
+        dependants = [r['job_id'] for r in cursor.execute(
+            f"SELECT job_id FROM dependencies WHERE depends_on IN ({','.join('?' * len(blocked))})", blocked)]
+        blocked = []
+        for dependant in dependants:
+            updated = cursor.execute('UPDATE jobs SET status = ?, finished_at = ?, error = ? WHERE id = ? AND status = ?',
+                                     (FAILED, time.time(), f'Dependency {job_id} failed', dependant, PENDING))
+            if updated.rowcount:
+                blocked.append(dependant)
+
+
+class _Transaction:
+    # BEGIN IMMEDIATE takes the write lock up front, so two workers can never claim the same job
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.cursor = self.connection.cursor()
+        self.cursor.execute('BEGIN IMMEDIATE')
+        return self.cursor
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.connection.execute('COMMIT')
+        else:
+            self.connection.execute('ROLLBACK')
+        self.cursor.close()
+        return False
+
+
+class _Heartbeat:
+    # Renews the lease of a running job from a thread with its own connection, so a job can run longer than the lease
+    def __init__(self, queue_path, job_id, worker, interval):
+        self.queue_path = queue_path
+        self.job_id = job_id
+        self.worker = worker
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=f'heartbeat-{job_id}', daemon=True)
+
+    def _run(self):
+        with WorkQueue(self.queue_path) as queue:
+            while not self.stopped.wait(self.interval):
+                try:
+                    if not queue.heartbeat(self.job_id, self.worker):
+                        logging.warning(f"Worker {self.worker}: lost the lease of job {self.job_id}.")
+                        return
+                except sqlite3.Error as e:
+                    # A busy or unreachable queue file: try again at the next beat
+                    logging.warning(f"Worker {self.worker}: heartbeat of job {self.job_id} failed: {e}")
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+        return False
+
+
+def run_worker(queue_path, execute, poll_interval=10, stop_when_empty=True):
+    """
+    Claim and execute jobs until the queue is empty. execute(kind, params) does the actual work,
+    any exception it raises is recorded as a failed attempt. The lease of the job is renewed while it runs.
+    """
+    worker = worker_name()
+    with WorkQueue(queue_path) as queue:
+        while True:
+            job = queue.claim(worker)
+            if job is None:
+                if stop_when_empty and not queue.has_open_jobs():
+                    logging.info(f"Worker {worker}: queue is empty, stopping.")
+                    return
+                time.sleep(poll_interval)
+                continue
+
+            job_id, kind, params = job
+            logging.info(f"Worker {worker}: running job {job_id} ({kind}) {params}")
+            try:
+                with _Heartbeat(queue_path, job_id, worker, queue.lease_seconds / 5):
+                    execute(kind, params)
+            except Exception:
+                error = traceback.format_exc()
+                logging.error(f"Worker {worker}: job {job_id} failed:\n{error}")
+                queue.fail(job_id, error, worker)
+            else:
+                if queue.complete(job_id, worker):
+                    logging.info(f"Worker {worker}: job {job_id} done.")
@@ -1,7 +1,16 @@
-import pandas as pd
-import numpy as np
-from openpyxl import load_workbook
 import os  
+import sys
+
+# Shared helpers live in the repository level Common folder
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Common.lazy import lazy_import
+# Imported on first use, so cache hits do not load pandas or openpyxl
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+openpyxl = lazy_import('openpyxl')
+from Common.arrow_transport import TableTransport, concat_frames, map_in_workers, put_tables
+from Common.result_cache import ResultCache, cache_key
+from Common.time_axis import parse_resolution, parse_timestamps
 
 """
 SPECIFIC IGM COMPARISON OF I,P,Q IN X-LINES/LINES OF OPENLF/UNICORN and v, theta for NODES/X-Nodes 
@@ -12,12 +21,9 @@ def get_user_inputs():
     Function to get user inputs for the comparison process.
     """
     # Prompt user to enter the necessary details
-    timestamps = input("Enter the hours (comma-separated ex. 0030,0130 ... , or leave blank for default 0030-2330): ")
-    if not timestamps:
-        timestamps = ['0030', '0130', '0230', '0330', '0430', '0530', '0630', '0730', '0830', '0930', '1030', '1130',
-                 '1230', '1330', '1430', '1530', '1630', '1730', '1830', '1930', '2030', '2130', '2230', '2330']
-    else:
-        timestamps = timestamps.split(',')
+    resolution = parse_resolution(input("Enter the time resolution in minutes (60 or 15, leave blank for 60): "))
+    timestamps = input("Enter the hours (comma-separated ex. 0030,0130 ... , or leave blank for the whole day, 0030-2330 when hourly): ")
+    timestamps = parse_timestamps(timestamps, resolution)
 
     destination_folder = input("Enter the base folder path where the load flows are located: ")
     destination_folder_1 = input("Enter the folder path where comparison results will be saved: ")
@@ -29,13 +35,18 @@ def get_user_inputs():
     
     return destination_folder, destination_folder_1, Date, File_type, country_code, numbers , timestamps
 
-def calculate_line_differencies(merged_df):
+# I, P, Q values below this are considered zero
+ZERO_THRESHOLD = 1e-2
+# Increase when the comparison logic changes, so cached results are recomputed
+COMPARISON_VERSION = 1
+
+def calculate_line_differencies(merged_df, threshold=ZERO_THRESHOLD):
     """
     Calculate the differences and percentage differences for line data (current, active power, reactive power) and cleans unnecessary data. 
     """
-    #Clean data from near to zero values.
-    threshold = 1e-2
-    merged_df[['I_UNICORN', 'I_OPENLF', 'P_UNICORN', 'P_OPENLF', 'Q_UNICORN', 'Q_OPENLF']] = merged_df[['I_UNICORN', 'I_OPENLF', 'P_UNICORN', 'P_OPENLF', 'Q_UNICORN', 'Q_OPENLF']].applymap(lambda x: 0 if abs(x) < threshold else x)
+    #Clean data from near to zero values (vectorized, NaN values are kept as they are).
+    value_columns = ['I_UNICORN', 'I_OPENLF', 'P_UNICORN', 'P_OPENLF', 'Q_UNICORN', 'Q_OPENLF']
+    merged_df[value_columns] = merged_df[value_columns].mask(merged_df[value_columns].abs() < threshold, 0)
 
     merged_df['I_diff'] = merged_df['I_UNICORN'] - merged_df['I_OPENLF']
     merged_df['P_diff'] = merged_df['P_UNICORN'] - merged_df['P_OPENLF']
@@ -95,44 +106,95 @@ def load_data(filepath, sheet_name):
         print(f"Error loading {sheet_name} from {filepath}: {e}")
         return None
 
+# Canonical ids: how element names of UNICORN and OPENLF reports are cut so both sides match
+def canonical_line_ids(values):
+    return pd.Series(values).astype(str).str[:19]
+
+def canonical_bus_ids(values):
+    return pd.Series(values).astype(str).str[:8]
+
+def canonical_x_node_ids(values):
+    # X-node id at the start of the name, or embedded at position 9 of a boundary line id
+    ids = pd.Series(values).astype(str)
+    x_first = ids.str.startswith('X')
+    x_at_9 = (ids.str.len() > 9) & (ids.str[9:10] == 'X')
+    return pd.Series(np.where(x_first, ids.str[:8], np.where(x_at_9, ids.str[9:17], ids)), index=ids.index)
+
+CANONICAL_ID_FUNCTIONS = {'line': canonical_line_ids, 'bus': canonical_bus_ids, 'x_node': canonical_x_node_ids}
+
+class ElementIdIndex:
+    """
+    Integer keys for the canonical element ids of a day or run. Raw names are cut only the first time they are seen,
+    so with an unchanged topology every further timestamp is a hash lookup instead of string slicing.
+    """
+    def __init__(self):
+        self.canonical_index = pd.Index([], dtype=object)  # position = integer key
+        self.raw = {kind: (pd.Index([], dtype=object), np.empty(0, dtype=np.int64)) for kind in CANONICAL_ID_FUNCTIONS}
+
+    def keys_for_ids(self, canonical):
+        new_ids = pd.Index(pd.unique(canonical)).difference(self.canonical_index)
+        if len(new_ids):
+            self.canonical_index = self.canonical_index.append(new_ids)
+        return self.canonical_index.get_indexer(canonical)
+
+    def keys(self, kind, values):
+        """
+        Integer key of every raw name, canonicalized with the rule of 'kind' ('line', 'bus', 'x_node').
+        """
+        values = pd.Series(values).astype(str)
+        raw_index, raw_keys = self.raw[kind]
+        positions = raw_index.get_indexer(values)
+        if (positions < 0).any():
+            new_raw = pd.Index(pd.unique(values[positions < 0]))
+            new_keys = self.keys_for_ids(CANONICAL_ID_FUNCTIONS[kind](pd.Series(new_raw)).to_numpy())
+            raw_index = raw_index.append(new_raw)
+            raw_keys = np.concatenate([raw_keys, new_keys])
+            self.raw[kind] = (raw_index, raw_keys)
+            positions = raw_index.get_indexer(values)
+        return raw_keys[positions]
+
+    def canonical(self, kind, values):
+        """
+        Canonical ids of raw names, same result as CANONICAL_ID_FUNCTIONS[kind] but served from the index.
+        """
+        keys = self.keys(kind, values)
+        return pd.Series(self.canonical_index.to_numpy()[keys], index=pd.Series(values).index)
+
+def canonical_ids(values, kind, index=None):
+    if index is None:
+        return CANONICAL_ID_FUNCTIONS[kind](values)
+    return index.canonical(kind, values)
+
 #Renames columns and cuts id strings in both company's loadflow reports
-def rename_lines_data(df1 , df2):
+def rename_lines_data(df1 , df2, index=None):
     df1.rename(columns={'Name (mrid)': 'id'}, inplace=True)
     df1.rename(columns={'Terminal number': 'side'}, inplace=True)
     df2.rename(columns={'side_x': 'side'}, inplace=True)
-    df1['id'] = df1['id'].astype(str).str[:19]
-    df2['id'] = df2['id'].astype(str).str[:19]  
+    df1['id'] = canonical_ids(df1['id'], 'line', index)
+    df2['id'] = canonical_ids(df2['id'], 'line', index)
 
     return df1, df2
 
-def rename_X_lines_data(df1, df2):
+def rename_X_lines_data(df1, df2, index=None):
     df2.rename(columns={'BUS' : 'Bus' }, inplace=True)
     df1.columns = df1.columns.str.strip()
     df1.rename(columns={'Name (mrid)': 'id'}, inplace=True)
-    df1['id'] = df1['id'].astype(str).str[:19]
-    df1['Bus'] = df1['Bus'].astype(str).str[:8]
+    df1['id'] = canonical_ids(df1['id'], 'line', index)
+    df1['Bus'] = canonical_ids(df1['Bus'], 'bus', index)
 
     return df1,df2 
 
-def rename_X_Nodes_data(df1 , df2):
-    def process_id(id_str):
-                id_str = str(id_str) 
-                if id_str.startswith('X'):
-                    return id_str[:8] 
-                elif len(id_str) > 9 and id_str[9] == 'X':  
-                    return id_str[9:17]  
-                return id_str 
-            
-    df1['Name (mrid)'] = df1['Name (mrid)'].astype(str).str[:8]
+def rename_X_Nodes_data(df1 , df2, index=None):
+    df1['Name (mrid)'] = canonical_ids(df1['Name (mrid)'], 'bus', index)
     df1.rename(columns={'Name (mrid)': 'id'}, inplace=True)
     df2.rename(columns={'boundary_v_mag': 'U', 'boundary_v_angle': 'theta'}, inplace=True) 
-    df2['id'] = df2['id'].apply(process_id)
+    df2['id'] = canonical_ids(df2['id'], 'x_node', index)
     
     return df1, df2
 
 
-def rename_Nodes_data(df1, df2):
-    df1['Name (mrid)'] = df1['Name (mrid)'].astype(str).str[:8]
+def rename_Nodes_data(df1, df2, index=None):
+    df1['Name (mrid)'] = canonical_ids(df1['Name (mrid)'], 'bus', index)
     df1.rename(columns={'Name (mrid)': 'Bus'}, inplace=True)
     df2.rename(columns={ 'BUS' : 'Bus', 'v_mag': 'U', 'v_angle': 'theta'}, inplace=True)
 
@@ -142,10 +204,6 @@ def merge_common_data(df1, df2, merge_columns, sort_columns = None):
     """
     Merge two DataFrames on common columns and sort them by columns provided.
     """
-    common_ids = set(df1[merge_columns[0]]).intersection(set(df2[merge_columns[0]]))
-    df1 = df1[df1[merge_columns[0]].isin(common_ids)]
-    df2 = df2[df2[merge_columns[0]].isin(common_ids)]
-    
     merged_df = pd.merge(df1, df2, on=merge_columns, suffixes=('_UNICORN', '_OPENLF'))
     if sort_columns:
         merged_df.sort_values(by=sort_columns, ascending=[True] * len(sort_columns), inplace=True)
@@ -195,7 +253,7 @@ def make_adjustements_lines_to_excel(output_path, sheet_name):
     ]
     
     # Open the workbook and the relevant sheet
-    wb = load_workbook(output_path)
+    wb = openpyxl.load_workbook(output_path)
     ws = wb[sheet_name]
     
     # Insert custom headers
@@ -209,7 +267,7 @@ def make_adjustements_lines_to_excel(output_path, sheet_name):
 def make_adjustements_nodes_to_excel(output_path, sheet_name):
     header_titles = ['ID', 'UNICORN', 'UNICORN', 'OPENLF', 'OPENLF', 'ABSOLUTE DIFFERENCES', 'ABSOLUTE DIFFERENCES', 'PERCENTAGE DIFFERENCES' , 'PERCENTAGE DIFFERENCES'  , 'TIMESTAMP']
     # Open the workbook and the relevant sheet
-    wb = load_workbook(output_path)
+    wb = openpyxl.load_workbook(output_path)
     ws = wb[sheet_name]
    
     ws.insert_rows(1)
@@ -219,10 +277,13 @@ def make_adjustements_nodes_to_excel(output_path, sheet_name):
     wb.save(output_path)
 
 
+def unicorn_report_path(timestamp, number, Date, File_type, country_code, destination_folder):
+    return os.path.join(destination_folder, f'{Date}_{timestamp}_{File_type}_{country_code}_{number}_igmLfReport.xlsx') ####sos USER HAS TO FILL THE RIGHT NAME STRUCTURE OF UNICORN'S LOAD FLOW REPORTS (IGMS)
+    # return os.path.join(destination_folder, f'LfReport_{Date}_{timestamp}_{File_type}_{country_code}{number}.xlsx') # FOR CGMS 
+
 def generate_file_paths(timestamp, number, Date, File_type, country_code, destination_folder):
     # Define the paths for the input files
-    df1_path = os.path.join(destination_folder, f'{Date}_{timestamp}_{File_type}_{country_code}_{number}_igmLfReport.xlsx') ####sos USER HAS TO FILL THE RIGHT NAME STRUCTURE OF UNICORN'S LOAD FLOW REPORTS (IGMS)
-    # df1_path = os.path.join(destination_folder, f'LfReport_{Date}_{timestamp}_{File_type}_{country_code}{number}.xlsx') # FOR CGMS 
+    df1_path = unicorn_report_path(timestamp, number, Date, File_type, country_code, destination_folder)
     df2_path = os.path.join(destination_folder, f'{Date}_{timestamp}_{File_type}_{country_code}_0_OPENLF_REPORT.xlsx') ###sos USER HAS TO FILL THE RIGHT NAME STRUCTURE OF OPENLF'S LOAD FLOW REPORTS
     print(f"Generated df1_path: {df1_path}")
     print(f"Generated df2_path: {df2_path}")
@@ -247,7 +308,7 @@ def find_highest_version_number(Date, timestamp, numbers, File_type, country_cod
     highest_number = -1
 
     for number in numbers:
-        report_filename = os.path.join(destination_folder, f'{Date}_{timestamp}_{File_type}_{country_code}_{number}_igmLfReport.xlsx')
+        report_filename = unicorn_report_path(timestamp, number, Date, File_type, country_code, destination_folder)
 
         if os.path.exists(report_filename):
             if number > highest_number:
@@ -255,103 +316,451 @@ def find_highest_version_number(Date, timestamp, numbers, File_type, country_cod
                
     return highest_number
 
-def process_files_and_accumulate_data(timestamps, numbers, Date, File_type, country_code, destination_folder, destination_folder_1):
-    # Use a single output Excel file for all timestamps
-    combined_output_path = os.path.join(destination_folder_1, f'combined_results_OpenLF_Unicorn_{Date}.xlsx')
-    # Create dictionaries to store data for each category across all timestamps
-    all_sheets_data = {'Lines': [], 'X-lines': [], 'Nodes': [], 'X-Nodes': []}
-    
-    for timestamp in timestamps:
-        number = find_highest_version_number(Date, timestamp, numbers, File_type, country_code, destination_folder)
-        # Generate file paths
-        df1_path, df2_path = generate_file_paths(timestamp, number, Date, File_type, country_code, destination_folder)
-            # Check if the paths exist, continue to the next iteration if they don't
-        if df1_path and df2_path and os.path.exists(df1_path) and os.path.exists(df2_path):
-             
-                #Lines
-                df1 = load_data(df1_path , 'Line')
-                df2 = load_data(df2_path , 'Line')
-                df1, df2 = rename_lines_data(df1, df2)
-                merged_df = merge_common_data(df1, df2, merge_columns=['id', 'side'], sort_columns=['id', 'side'])
-                merged_df = calculate_line_differencies(merged_df)
-                columns_to_drop = ['Terminal number', 'Bus ' ,'BUS', 'v_mag', 'v_angle', 'I_limit' , 'Area' ,  'Island number' , 'U' ,'theta',  'Base Voltage' , 'U' ,'theta', 'Bus',   'Imax' , 'loading' , 'Eq. type' , 'State' , 'r' , 'x' , 'side_x' , 'element_type' , 'side_y' , 'name' , 'type' , 'value' , 'acceptable_duration' , 'I_diff' , 'P_diff' , 'Q_diff']   
-                merged_df.drop(columns=[col for col in columns_to_drop if col in merged_df.columns] , inplace= True)
-                final_df, timestamp = final_columns_rename_lines(merged_df, timestamp)
-                # Drop rows where all columns except 'Timestamp' , 'Bus' , 'id' contain zeros
-                columns_to_check = final_df.columns.difference(['Timestamp', 'side', 'id'])
-                final_df = final_df.loc[~(final_df[columns_to_check] == 0).all(axis=1)]
-                all_sheets_data['Lines'].append(final_df)
-                
-                
-                #X-lines
-                df1 = load_data(df1_path, 'Line')
-                df2 = load_data(df2_path, 'X-Nodes')
-                df1, df2 = rename_X_lines_data(df1, df2)
-                merged_df = merge_common_data(df1, df2, merge_columns=['id', 'Bus'] , sort_columns=['id', 'Bus'])
-                merged_df = calculate_line_differencies(merged_df)
-                columns_to_drop = ['Area' , 'Terminal number' , 'v_angle' , 'I_limit' ,'Island number' , 'U' , 'v_mag' , 'v_angle' 'theta' , 'Base Voltage' , 'U' ,'theta',   'side_x' , 'Imax' , 'Unnamed: 0','loading' , 'Eq. type' , 'State' , 'r' , 'x'  , 'element_type' , 'side_y' , 'name' , 'type' , 'value' , 'acceptable_duration' , 'I_diff' , 'P_diff' , 'Q_diff', 'boundary_v_mag' , 'boundary_v_angle' , 'boundary_p' , 'boundary_q']   
-                merged_df.drop(columns=[col for col in columns_to_drop if col in merged_df.columns] , inplace= True)
-                final_df, timestamp = final_columns_rename_lines(merged_df, timestamp)
-                # Drop rows where all columns except 'Timestamp' , 'Bus' , 'id' contain zeros
-                columns_to_check = final_df.columns.difference(['Timestamp', 'Bus', 'id'])
-                final_df = final_df.loc[~(final_df[columns_to_check] == 0).all(axis=1)]
-                all_sheets_data['X-lines'].append(final_df)
-                
+# Sheets, id rules and columns of every comparison category
+COMPARISON_CATEGORIES = {
+    'Lines': {'sheets': ('Line', 'Line'), 'rename': rename_lines_data, 'keys': ['id', 'side'], 'sort': True, 'kind': 'lines',
+              'columns_to_drop': ['Terminal number', 'Bus ' ,'BUS', 'v_mag', 'v_angle', 'I_limit' , 'Area' ,  'Island number' , 'U' ,'theta',  'Base Voltage' , 'U' ,'theta', 'Bus',   'Imax' , 'loading' , 'Eq. type' , 'State' , 'r' , 'x' , 'side_x' , 'element_type' , 'side_y' , 'name' , 'type' , 'value' , 'acceptable_duration' , 'I_diff' , 'P_diff' , 'Q_diff']},
+    'X-lines': {'sheets': ('Line', 'X-Nodes'), 'rename': rename_X_lines_data, 'keys': ['id', 'Bus'], 'sort': True, 'kind': 'lines',
+                'columns_to_drop': ['Area' , 'Terminal number' , 'v_angle' , 'I_limit' ,'Island number' , 'U' , 'v_mag' , 'v_angle' 'theta' , 'Base Voltage' , 'U' ,'theta',   'side_x' , 'Imax' , 'Unnamed: 0','loading' , 'Eq. type' , 'State' , 'r' , 'x'  , 'element_type' , 'side_y' , 'name' , 'type' , 'value' , 'acceptable_duration' , 'I_diff' , 'P_diff' , 'Q_diff', 'boundary_v_mag' , 'boundary_v_angle' , 'boundary_p' , 'boundary_q']},
+    'Nodes': {'sheets': ('Bus', 'Bus'), 'rename': rename_Nodes_data, 'keys': ['Bus'], 'sort': False, 'kind': 'nodes',
+              'columns_to_drop': ['Bus type', 'Reference voltage_UNICORN', 'Pgen_UNICORN' , 'Reference Voltage' ,'Qgen_UNICORN', 'Pload_UNICORN', 'Qload_UNICORN', 'Reference voltage_OPENLF', 'Pgen_OPENLF', 'Qgen_OPENLF', 'voltage_regulator_on','Pload_OPENLF', 'Qload_OPENLF' ,'Area', 'Final bus type', 'Island number' ,  'Base Voltage' , 'Reference voltage' , 'target_v.1', 'max_q', 'min_q' , 'Pgen' , 'Qgen' , 'Pload' , 'Qload' , 'Eq. type' , 'Eq. type' , 'connected_component' , 'synchronous_component' , 'id_gen' , 'target_v' , 'p' , 'q' , 'p_load' , 'q_load' , 'U_diff' , 'theta_diff' , 'State']},
+    'X-Nodes': {'sheets': ('Bus', 'X-Nodes'), 'rename': rename_X_Nodes_data, 'keys': ['id'], 'sort': False, 'kind': 'nodes',
+                'columns_to_drop': ['Bus type', 'Area', 'BUS' , 'boundary_p' , 'boundary_q' , 'v_mag' , 'v_angle' , 'I_limit'  ,'Final bus type', 'Island number' ,  'Base Voltage' , 'Reference voltage' , 'Pgen' , 'Qgen' , 'Pload' , 'Qload' , 'Eq. type' , 'Eq. type' , 'bus_id' , 'I' , 'P' , 'Q', 'boundary_p' , 'boundary_q' , 'connected_component' , 'synchronous_component' , 'id_gen' , 'target_v' , 'p' , 'q' , 'p_load' , 'q_load' , 'U_diff' , 'theta_diff' , 'State' ]},
+}
+UNICORN_SHEETS = ['Line', 'Bus']
+OPENLF_SHEETS = ['Line', 'X-Nodes', 'Bus']
+
+def compare_category(category, df1, df2, threshold=ZERO_THRESHOLD, index=None, stacked=False):
+    """
+    Rename, merge, compute the differences and drop the unneeded columns and all-zero rows of one category.
+    stacked: df1/df2 hold several timestamps with 'Timestamp' and '_ts_order' columns (day-cube mode).
+    """
+    settings = COMPARISON_CATEGORIES[category]
+    df1, df2 = settings['rename'](df1, df2, index)
+    merge_columns = list(settings['keys'])
+    sort_columns = list(settings['keys']) if settings['sort'] else None
+    if stacked:
+        # Timestamps are matched through their position, the text column is kept only on the UNICORN side
+        df2 = df2.drop(columns=['Timestamp'])
+        merge_columns.append('_ts_order')
+        sort_columns = ['_ts_order'] + sort_columns if sort_columns else None
+    merged_df = merge_common_data(df1, df2, merge_columns=merge_columns, sort_columns=sort_columns)
+    if settings['kind'] == 'lines':
+        merged_df = calculate_line_differencies(merged_df, threshold)
+    else:
+        merged_df = calculate_Nodes_differencies(merged_df)
+    merged_df = merged_df.drop(columns=[col for col in settings['columns_to_drop'] if col in merged_df.columns])
+    # Drop rows where all columns except the ids and 'Timestamp' contain zeros
+    columns_to_check = merged_df.columns.difference(['Timestamp', '_ts_order'] + settings['keys'])
+    return merged_df.loc[~(merged_df[columns_to_check] == 0).all(axis=1)]
+
+def final_columns_rename(category, merged_df, timestamp):
+    if COMPARISON_CATEGORIES[category]['kind'] == 'lines':
+        final_df, timestamp = final_columns_rename_lines(merged_df, timestamp)
+    else:
+        final_df, timestamp = final_columns_rename_buses(merged_df, timestamp)
+    return final_df
 
-                #Nodes
-                df1 = load_data(df1_path , 'Bus')
-                df2 = load_data(df2_path, 'Bus')
-                df1, df2 = rename_Nodes_data(df1, df2)
-                merged_df = merge_common_data(df1, df2, merge_columns=['Bus'])
-                merged_df = calculate_Nodes_differencies(merged_df)
-                columns_to_drop = ['Bus type', 'Reference voltage_UNICORN', 'Pgen_UNICORN' , 'Reference Voltage' ,'Qgen_UNICORN', 'Pload_UNICORN', 'Qload_UNICORN', 'Reference voltage_OPENLF', 'Pgen_OPENLF', 'Qgen_OPENLF', 'voltage_regulator_on','Pload_OPENLF', 'Qload_OPENLF' ,'Area', 'Final bus type', 'Island number' ,  'Base Voltage' , 'Reference voltage' , 'target_v.1', 'max_q', 'min_q' , 'Pgen' , 'Qgen' , 'Pload' , 'Qload' , 'Eq. type' , 'Eq. type' , 'connected_component' , 'synchronous_component' , 'id_gen' , 'target_v' , 'p' , 'q' , 'p_load' , 'q_load' , 'U_diff' , 'theta_diff' , 'State']
-                merged_df.drop(columns=[col for col in columns_to_drop if col in merged_df.columns], inplace = True)
-                final_df, timestamp = final_columns_rename_buses(merged_df, timestamp)
-                # Drop rows where all columns except 'Timestamp' and 'Bus' contain zeros
-                columns_to_check = final_df.columns.difference(['Timestamp', 'Bus'])
-                final_df = final_df.loc[~(final_df[columns_to_check] == 0).all(axis=1)]
-                all_sheets_data['Nodes'].append(final_df)
-                
-                    
-                #X-Nodes
-                df1 = load_data(df1_path, 'Bus')
-                df2 = load_data(df2_path, 'X-Nodes')    
-                df1, df2 = rename_X_Nodes_data(df1, df2)
-                merged_df = merge_common_data(df1, df2, merge_columns=['id'])
-                merged_df = calculate_Nodes_differencies(merged_df)
-                columns_to_drop = ['Bus type', 'Area', 'BUS' , 'boundary_p' , 'boundary_q' , 'v_mag' , 'v_angle' , 'I_limit'  ,'Final bus type', 'Island number' ,  'Base Voltage' , 'Reference voltage' , 'Pgen' , 'Qgen' , 'Pload' , 'Qload' , 'Eq. type' , 'Eq. type' , 'bus_id' , 'I' , 'P' , 'Q', 'boundary_p' , 'boundary_q' , 'connected_component' , 'synchronous_component' , 'id_gen' , 'target_v' , 'p' , 'q' , 'p_load' , 'q_load' , 'U_diff' , 'theta_diff' , 'State' ]     
-                merged_df = merged_df.drop(columns=[col for col in columns_to_drop if col in merged_df.columns])
-                final_df, timestamp = final_columns_rename_buses(merged_df, timestamp)
-                #DROP ROWS WITH ZERO COLUMNS
-                columns_to_check = final_df.columns.difference(['Timestamp', 'id'])
-                final_df = final_df.loc[~(final_df[columns_to_check] == 0).all(axis=1)]
-                all_sheets_data['X-Nodes'].append(final_df)                           
-        else:
-            
-            continue  # Continue to the next loop iteration
+def compare_timestamp(df1_path, df2_path, timestamp, threshold=ZERO_THRESHOLD, index=None):
+    """
+    Compare the UNICORN (df1_path) and OPENLF (df2_path) reports of one timestamp.
+    Returns a dictionary with the final dataframe of every sheet (Lines, X-lines, Nodes, X-Nodes).
+    index: ElementIdIndex shared by all timestamps of the day.
+    """
+    # Every workbook is read once
+    unicorn = load_data(df1_path, UNICORN_SHEETS)
+    openlf = load_data(df2_path, OPENLF_SHEETS)
+    return compare_sheets(unicorn, openlf, timestamp, threshold, index)
+
+def compare_sheets(unicorn, openlf, timestamp, threshold=ZERO_THRESHOLD, index=None):
+    """
+    Compare the UNICORN and OPENLF sheets ({sheet name: DataFrame}) of one timestamp, read from the reports
+    or, for OPENLF, taken from DailyLoadFlow in memory. Returns the final dataframe of every sheet.
+    """
+    # The sheets are copied because the rename functions work in place
+    sheets_data = {}
+    for category, settings in COMPARISON_CATEGORIES.items():
+        unicorn_sheet, openlf_sheet = settings['sheets']
+        merged_df = compare_category(category, unicorn[unicorn_sheet].copy(), openlf[openlf_sheet].copy(), threshold, index)
+        sheets_data[category] = final_columns_rename(category, merged_df, timestamp)
+
+    return sheets_data
 
+def write_combined_results(combined_output_path, all_sheets_data, extra_sheets=None):
+    """
+    Write the dataframes collected for every sheet into a single Excel file and add the header rows.
+    extra_sheets: optional dictionary sheet name -> dataframe written as is (statistics, summaries).
+    """
     # Once all data is collected, save it to the Excel file in different sheets
+    written_sheets = []
     with pd.ExcelWriter(combined_output_path, engine='openpyxl') as writer:
         for sheet_name, dataframes in all_sheets_data.items():
             if dataframes:
                 consolidated_df = pd.concat(dataframes, ignore_index=True)
                 if not consolidated_df.empty:
                     consolidated_df.to_excel(writer, sheet_name=sheet_name, index=False)
+                    written_sheets.append(sheet_name)
                 else:
                    print(f"Sheet {sheet_name} has no data. Skipping sheet.")
             else:
                    print(f"No data for sheet {sheet_name}.")
+        for sheet_name, extra_df in (extra_sheets or {}).items():
+            if not extra_df.empty:
+                extra_df.to_excel(writer, sheet_name=sheet_name, index=False)
                 
 
-    for sheet in all_sheets_data.keys():
+    for sheet in written_sheets:
         if sheet in ['Lines', 'X-lines']:
             # Use the function for lines
             make_adjustements_lines_to_excel(combined_output_path, sheet)
         elif sheet in ['Nodes', 'X-Nodes']:
             # Use the function for nodes
             make_adjustements_nodes_to_excel(combined_output_path, sheet)
+
+
+# Exceptions only output: (absolute, percentage) tolerance per quantity. A row is an exception when a quantity
+# exceeds both of its tolerances (None disables that side of the check). A zero UNICORN value has its percentage
+# written as 0, so such rows are checked on the absolute tolerance alone.
+DEFAULT_TOLERANCES = {
+    'I': (5.0, 2.0),
+    'P': (1.0, 2.0),
+    'Q': (1.0, 5.0),
+    'U': (0.5, 0.5),
+    'theta': (0.1, 5.0),
+}
+
+def unicorn_values(final_df, quantity):
+    # After the final rename UNICORN and OPENLF values share the column name, the UNICORN one comes first
+    positions = [position for position, column in enumerate(final_df.columns) if column == quantity]
+    return final_df.iloc[:, positions[0]] if positions else None
+
+def exceptions_mask(final_df, tolerances=None):
+    """
+    Boolean mask of the rows where at least one quantity exceeds its tolerances, and the mask of every quantity.
+    """
+    tolerances = tolerances or DEFAULT_TOLERANCES
+    quantity_masks = {}
+    for quantity, (abs_tolerance, pct_tolerance) in tolerances.items():
+        abs_column, pct_column = f'{quantity}_diff_abs', f'{quantity}_diff_pct'
+        if abs_column not in final_df.columns:
+            continue
+        exceeded = pd.Series(True, index=final_df.index)
+        if abs_tolerance is not None:
+            exceeded &= final_df[abs_column] > abs_tolerance
+        if pct_tolerance is not None:
+            pct_exceeded = final_df[pct_column] > pct_tolerance
+            base_values = unicorn_values(final_df, quantity)
+            if base_values is not None:
+                pct_exceeded |= base_values.fillna(0) == 0
+            exceeded &= pct_exceeded
+        quantity_masks[quantity] = exceeded
+    mask = pd.concat(quantity_masks, axis=1).any(axis=1) if quantity_masks else pd.Series(False, index=final_df.index)
+    return mask, quantity_masks
+
+def exceptions_summary(category, final_df, mask, quantity_masks):
+    """
+    Per timestamp count of compared elements and of exceptions (in total and per quantity) of one category.
+    """
+    counts = pd.DataFrame({'Compared': 1, 'Exceptions': mask.astype(int)}, index=final_df.index)
+    for quantity, quantity_mask in quantity_masks.items():
+        counts[f'{quantity} exceptions'] = quantity_mask.astype(int)
+    counts['Timestamp'] = final_df['Timestamp']
+    summary = counts.groupby('Timestamp', sort=False).sum().reset_index()
+    summary.insert(0, 'Category', category)
+    return summary
+
+def unique_columns(df):
+    # Final sheets repeat I/P/Q/U/theta for UNICORN and OPENLF, columnar formats need unique names
+    duplicated = set(df.columns[df.columns.duplicated()])
+    seen = {}
+    columns = []
+    for column in df.columns:
+        count = seen.get(column, 0)
+        seen[column] = count + 1
+        columns.append(f"{column}_{'UNICORN' if count == 0 else 'OPENLF'}" if column in duplicated else column)
+    renamed = df.copy()
+    renamed.columns = columns
+    return renamed
+
+def write_detail_sidecar(sidecar_folder, all_sheets_data):
+    """
+    Full comparison detail as one Parquet file per category (compressed CSV if no Parquet engine is installed).
+    """
+    os.makedirs(sidecar_folder, exist_ok=True)
+    for sheet_name, dataframes in all_sheets_data.items():
+        if not dataframes:
+            continue
+        detail_df = unique_columns(pd.concat(dataframes, ignore_index=True))
+        detail_df['Timestamp'] = detail_df['Timestamp'].astype(str)
+        try:
+            detail_df.to_parquet(os.path.join(sidecar_folder, f'{sheet_name}.parquet'), index=False)
+        except ImportError:
+            print("No Parquet engine (pyarrow) installed, writing the detail as compressed CSV.")
+            detail_df.to_csv(os.path.join(sidecar_folder, f'{sheet_name}.csv.gz'), index=False)
+
+def write_exceptions_results(exceptions_output_path, all_sheets_data, tolerances=None, extra_sheets=None):
+    """
+    Write only the rows exceeding the tolerances plus a 'Summary' sheet with the per timestamp counts.
+    """
+    exceptions_data = {}
+    summaries = []
+    for sheet_name, dataframes in all_sheets_data.items():
+        if not dataframes:
+            continue
+        final_df = pd.concat(dataframes, ignore_index=True)
+        mask, quantity_masks = exceptions_mask(final_df, tolerances)
+        summaries.append(exceptions_summary(sheet_name, final_df, mask, quantity_masks))
+        exceptions_data[sheet_name] = [final_df.loc[mask]]
+    extra_sheets = dict(extra_sheets or {})
+    if summaries:
+        extra_sheets['Summary'] = pd.concat(summaries, ignore_index=True).fillna(0)
+    write_combined_results(exceptions_output_path, exceptions_data, extra_sheets)
+
+def write_comparison_output(destination_folder_1, Date, all_sheets_data, statistics=None, output_mode='full', tolerances=None, sidecar=False):
+    """
+    output_mode 'full' writes every matched element, 'exceptions' only the ones exceeding the tolerances.
+    sidecar: also write the full detail to a columnar folder next to the Excel file.
+    """
+    extra_sheets = {f'{category} statistics': statistics_df for category, statistics_df in (statistics or {}).items()}
+    if output_mode == 'exceptions':
+        output_path = os.path.join(destination_folder_1, f'exceptions_OpenLF_Unicorn_{Date}.xlsx')
+        write_exceptions_results(output_path, all_sheets_data, tolerances, extra_sheets)
+    elif output_mode == 'full':
+        output_path = os.path.join(destination_folder_1, f'combined_results_OpenLF_Unicorn_{Date}.xlsx')
+        write_combined_results(output_path, all_sheets_data, extra_sheets)
+    else:
+        raise ValueError(f"Unknown output mode '{output_mode}'. Expected 'full' or 'exceptions'.")
+    if sidecar:
+        write_detail_sidecar(os.path.join(destination_folder_1, f'detail_OpenLF_Unicorn_{Date}'), all_sheets_data)
+
+def compare_timestamp_cached(cache, df1_path, df2_path, timestamp, threshold=ZERO_THRESHOLD, index=None):
+    """
+    compare_timestamp through the result cache: recomputed only when one of the two reports or the settings changed.
+    """
+    if cache is None:
+        return compare_timestamp(df1_path, df2_path, timestamp, threshold, index)
+    key = cache_key([df1_path, df2_path], {'threshold': threshold, 'timestamp': timestamp, 'version': COMPARISON_VERSION})
+    sheets_data = cache.get(timestamp, key)
+    if sheets_data is None:
+        sheets_data = compare_timestamp(df1_path, df2_path, timestamp, threshold, index)
+        cache.put(timestamp, key, sheets_data)
+    return sheets_data
+
+# Element id index of a worker process, reused by every timestamp it compares (workers are spawned for each run)
+_worker_index = None
+
+def worker_index():
+    global _worker_index
+    if _worker_index is None:
+        _worker_index = ElementIdIndex()
+    return _worker_index
+
+def compare_timestamp_to_tables(df1_path, df2_path, timestamp, threshold, cache_folder, tables_folder):
+    # Worker process entry point: the sheets go back to the parent as Arrow files, only their handles are pickled
+    cache = ResultCache(cache_folder) if cache_folder else None
+    sheets_data = compare_timestamp_cached(cache, df1_path, df2_path, timestamp, threshold, worker_index())
+    return put_tables(tables_folder, timestamp, sheets_data), ((cache.hits, cache.misses) if cache is not None else (0, 0))
+
+def compare_timestamps_in_workers(pairs, threshold, cache_folder, workers):
+    """
+    Compare the (df1_path, df2_path, timestamp) pairs in worker processes. Returns the sheets of all timestamps,
+    one DataFrame per sheet assembled from the Arrow tables of the workers, and the cache (hits, misses).
+    """
+    with TableTransport() as tables_folder:
+        results = map_in_workers('comparisons', 'compare_timestamp_to_tables',
+                                 [(*pair, threshold, cache_folder, tables_folder) for pair in pairs], workers)
+        all_sheets_data = {'Lines': [], 'X-lines': [], 'Nodes': [], 'X-Nodes': []}
+        for sheet_name in all_sheets_data:
+            handles = [sheet_handles[sheet_name] for sheet_handles, _ in results if sheet_name in sheet_handles]
+            if handles:
+                all_sheets_data[sheet_name].append(concat_frames(handles))
+    hits = sum(counts[0] for _, counts in results)
+    misses = sum(counts[1] for _, counts in results)
+    return all_sheets_data, (hits, misses)
+
+def process_files_and_accumulate_data(timestamps, numbers, Date, File_type, country_code, destination_folder, destination_folder_1,
+                                      threshold=ZERO_THRESHOLD, use_cache=True, output_mode='full', tolerances=None, sidecar=False,
+                                      workers=1):
+    # Element ids of the day, cut once and reused by every timestamp
+    index = ElementIdIndex()
+    # Per timestamp results of previous runs, reused while the input reports are unchanged
+    cache_folder = os.path.join(destination_folder_1, 'comparison_cache', f'{Date}_{File_type}_{country_code}')
+    cache = ResultCache(cache_folder) if use_cache else None
+    # Create dictionaries to store data for each category across all timestamps
+    all_sheets_data = {'Lines': [], 'X-lines': [], 'Nodes': [], 'X-Nodes': []}
+
+    # Reports of every timestamp that has both of them
+    pairs = []
+    for timestamp in timestamps:
+        number = find_highest_version_number(Date, timestamp, numbers, File_type, country_code, destination_folder)
+        # Generate file paths
+        df1_path, df2_path = generate_file_paths(timestamp, number, Date, File_type, country_code, destination_folder)
+        if df1_path and df2_path and os.path.exists(df1_path) and os.path.exists(df2_path):
+            pairs.append((df1_path, df2_path, timestamp))
+
+    if workers > 1 and pairs:
+        # Timestamps compared in parallel worker processes, their sheets come back through shared memory
+        all_sheets_data, (hits, misses) = compare_timestamps_in_workers(pairs, threshold, cache_folder if use_cache else None, workers)
+        if cache is not None:
+            cache.hits, cache.misses = hits, misses
+    else:
+        for df1_path, df2_path, timestamp in pairs:
+            sheets_data = compare_timestamp_cached(cache, df1_path, df2_path, timestamp, threshold, index)
+            for sheet_name, final_df in sheets_data.items():
+                all_sheets_data[sheet_name].append(final_df)
+
+    if cache is not None:
+        print(f"Comparison cache: {cache.hits} timestamps reused, {cache.misses} recomputed.")
+    write_comparison_output(destination_folder_1, Date, all_sheets_data, None, output_mode, tolerances, sidecar)
             
 
+def read_timestamp_reports(df1_path, df2_path, timestamp, order):
+    # Both reports of one timestamp, {('UNICORN' or 'OPENLF', sheet): dataframe} with the timestamp key columns
+    sheets = {}
+    for side, path, sheet_names in (('UNICORN', df1_path, UNICORN_SHEETS), ('OPENLF', df2_path, OPENLF_SHEETS)):
+        for sheet, df in load_data(path, sheet_names).items():
+            df['Timestamp'] = timestamp
+            df['_ts_order'] = order
+            sheets[(side, sheet)] = df
+    return sheets
+
+def read_reports_to_tables(df1_path, df2_path, timestamp, order, tables_folder):
+    # Worker process entry point: the sheets go back to the parent as Arrow files, only their handles are pickled
+    return put_tables(tables_folder, timestamp, read_timestamp_reports(df1_path, df2_path, timestamp, order))
+
+def load_day_reports(timestamps, numbers, Date, File_type, country_code, destination_folder, workers=1):
+    """
+    Read the UNICORN and OPENLF reports of every timestamp of a day and stack them per sheet.
+    Each row gets the 'Timestamp' text and its position '_ts_order' as key columns.
+    Returns (unicorn, openlf) dictionaries sheet -> stacked dataframe, or (None, None) when no timestamp has both reports.
+    workers > 1 reads the Excel files in worker processes and stacks their Arrow tables without pickling the sheets.
+    """
+    unicorn = {sheet: [] for sheet in UNICORN_SHEETS}
+    openlf = {sheet: [] for sheet in OPENLF_SHEETS}
+    reports = []
+    for order, timestamp in enumerate(timestamps):
+        number = find_highest_version_number(Date, timestamp, numbers, File_type, country_code, destination_folder)
+        df1_path, df2_path = generate_file_paths(timestamp, number, Date, File_type, country_code, destination_folder)
+        if df1_path and df2_path:
+            reports.append((df1_path, df2_path, timestamp, order))
+    if not reports:
+        return None, None
+
+    if workers > 1:
+        with TableTransport() as tables_folder:
+            results = map_in_workers('comparisons', 'read_reports_to_tables',
+                                     [(*report, tables_folder) for report in reports], workers)
+            for side, stacked in (('UNICORN', unicorn), ('OPENLF', openlf)):
+                for sheet in stacked:
+                    handles = [sheets[(side, sheet)] for sheets in results if (side, sheet) in sheets]
+                    if handles:
+                        stacked[sheet].append(concat_frames(handles))
+    else:
+        for report in reports:
+            for (side, sheet), df in read_timestamp_reports(*report).items():
+                (unicorn if side == 'UNICORN' else openlf)[sheet].append(df)
+    return ({sheet: pd.concat(frames, ignore_index=True) for sheet, frames in unicorn.items()},
+            {sheet: pd.concat(frames, ignore_index=True) for sheet, frames in openlf.items()})
+
+def day_statistics(merged_df, keys):
+    """
+    Per element max, mean and 95th percentile of the absolute and percentage differences over all timestamps of the day.
+    """
+    value_columns = [col for col in merged_df.columns if col.endswith('_diff_abs') or col.endswith('_diff_pct')]
+    grouped = merged_df.groupby(keys, sort=True)[value_columns]
+    statistics = pd.concat({'max': grouped.max(), 'mean': grouped.mean(), 'p95': grouped.quantile(0.95)}, axis=1)
+    statistics = statistics[[(stat, col) for col in value_columns for stat in ('max', 'mean', 'p95')]]
+    statistics.columns = [f'{col}_{stat}' for stat, col in statistics.columns]
+    statistics.insert(0, 'Timestamps', merged_df.groupby(keys, sort=True).size())
+    return statistics.reset_index()
+
+def compare_day_cube(timestamps, numbers, Date, File_type, country_code, destination_folder, threshold=ZERO_THRESHOLD, index=None,
+                     workers=1):
+    """
+    Day-cube mode: all timestamps of a day are matched and compared in one vectorized pass per category.
+    Returns (sheets_data, statistics), sheets_data has the same rows as the per timestamp comparison.
+    """
+    unicorn, openlf = load_day_reports(timestamps, numbers, Date, File_type, country_code, destination_folder, workers)
+    if unicorn is None:
+        return {}, {}
+    index = index if index is not None else ElementIdIndex()
+    sheets_data = {}
+    statistics = {}
+    for category, settings in COMPARISON_CATEGORIES.items():
+        unicorn_sheet, openlf_sheet = settings['sheets']
+        merged_df = compare_category(category, unicorn[unicorn_sheet].copy(), openlf[openlf_sheet].copy(), threshold, index, stacked=True)
+        statistics[category] = day_statistics(merged_df, settings['keys'])
+        # Timestamp goes back to the last column, as in the per timestamp output
+        timestamp_column = merged_df.pop('Timestamp')
+        sheets_data[category] = final_columns_rename(category, merged_df.drop(columns=['_ts_order']), timestamp_column)
+    return sheets_data, statistics
+
+def process_day_cube(timestamps, numbers, Date, File_type, country_code, destination_folder, destination_folder_1,
+                     threshold=ZERO_THRESHOLD, index=None, output_mode='full', tolerances=None, sidecar=False, workers=1):
+    """
+    Day-cube version of process_files_and_accumulate_data. The combined file also gets per element statistics sheets.
+    """
+    sheets_data, statistics = compare_day_cube(timestamps, numbers, Date, File_type, country_code, destination_folder, threshold, index,
+                                               workers)
+    if not sheets_data:
+        print(f"No timestamp of {Date} has both reports. Nothing to compare.")
+        return
+    all_sheets_data = {sheet_name: [final_df] for sheet_name, final_df in sheets_data.items()}
+    write_comparison_output(destination_folder_1, Date, all_sheets_data, statistics, output_mode, tolerances, sidecar)
+
+def process_loadflow_and_compare(timestamps, numbers, Date, File_type, country_code, destination_folder, destination_folder_1,
+                                 ucte_folder, ucte_numbers, format='UCT', output_folder=None, threshold=ZERO_THRESHOLD,
+                                 output_mode='full', tolerances=None, sidecar=False):
+    """
+    In-memory mode: solve the UCTE files of the day with DailyLoadFlow and compare the OPENLF sheets with the
+    UNICORN reports of destination_folder as each hour is solved, without writing and reading back the OPENLF
+    reports. With output_folder the OPENLF reports are also written there, otherwise they are not written at all.
+    """
+    from Common.scripts import load_script
+
+    index = ElementIdIndex()
+    sheets_by_hour = {}
+
+    def compare(hour, openlf):
+        # Runs in the single write stage thread, so the id index is never used by two hours at once
+        number = find_highest_version_number(Date, hour, numbers, File_type, country_code, destination_folder)
+        df1_path = unicorn_report_path(hour, number, Date, File_type, country_code, destination_folder)
+        if not os.path.exists(df1_path):
+            print(f"Warning: No UNICORN report for {hour} in {destination_folder}. Skipping this timestamp.")
+            return
+        sheets_by_hour[hour] = compare_sheets(load_data(df1_path, UNICORN_SHEETS), openlf, hour, threshold, index)
+
+    # Solver strategies and metrics go next to the reports, or to the comparison folder when none are written
+    load_script('daily_lf').process_network_files(Date, timestamps, ucte_numbers, File_type, country_code, format, ucte_folder,
+                                                  output_folder or destination_folder_1, write_report=output_folder is not None,
+                                                  consumer=compare)
+    if not sheets_by_hour:
+        print(f"No timestamp of {Date} was solved with a UNICORN report. Nothing to compare.")
+        return
+    all_sheets_data = {'Lines': [], 'X-lines': [], 'Nodes': [], 'X-Nodes': []}
+    for timestamp in timestamps:
+        for sheet_name, final_df in sheets_by_hour.get(timestamp, {}).items():
+            all_sheets_data[sheet_name].append(final_df)
+    write_comparison_output(destination_folder_1, Date, all_sheets_data, None, output_mode, tolerances, sidecar)
+
+def process_month_cube(dates, timestamps, numbers, File_type, country_code, destination_folder, destination_folder_1, threshold=ZERO_THRESHOLD,
+                       output_mode='full', tolerances=None, sidecar=False, workers=1):
+    """
+    Run the day-cube comparison for many days in one process (batch comparison mode 'month'), sharing a single
+    element id index. A day that fails is skipped, the other days are still written and the failed ones are raised at the end.
+    """
+    index = ElementIdIndex()
+    failed = []
+    for Date in dates:
+        try:
+            process_day_cube(timestamps, numbers, Date, File_type, country_code, destination_folder, destination_folder_1, threshold, index,
+                             output_mode, tolerances, sidecar, workers)
+        except Exception as e:
+            print(f"Error comparing {Date}: {e}. Skipping this day.")
+            failed.append(Date)
+    if failed:
+        raise RuntimeError(f"Comparison of {', '.join(failed)} failed.")
+
 if __name__ == "__main__":
     # User inforamtion
     destination_folder, destination_folder_1, Date, File_type, country_code, numbers, timestamps = get_user_inputs() 
@@ -1,10 +1,23 @@
-import pandas as pd
 import os
-import pypowsybl.network as pp
-import pypowsybl.report as nf
-import pypowsybl.loadflow as lf
+import sys
 import logging 
 
+# Shared helpers live in the repository level Common folder
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Common.lazy import lazy_import
+# Imported on first use, so files skipped by the pre-scan do not start pypowsybl
+pd = lazy_import('pandas')
+pp = lazy_import('pypowsybl.network')
+from Common.accumulator import ColumnAccumulator
+from Common.borders import border_table, borders_in_scan, tcc_sums, type_border, x_node_flows
+from Common.memory_scheduler import MemoryScheduler
+from Common.scenarios import ScenarioLoader
+from Common.tcc_store import append_tcc
+from Common.solver import ALL_PROFILES, STRATEGY_FILE, StrategyStore, run_loadflow
+from Common.solver_report import SolverReport
+from Common.ucte_scan import scan_ucte
+from Common.time_axis import colon_format, day_timestamps, parse_resolution
+
 """
 Script that calculates TCC in Romanian/Greek nodes for monthly period of time (Hourly calculations)
 
@@ -15,6 +28,12 @@ logging.basicConfig(level=logging.INFO,
                     handlers=[logging.FileHandler("TCC_processing.log"),
                               logging.StreamHandler()])
 
+# Columns of the monthly TCC output
+TCC_SCHEMA = {'Date': 'category', 'Timestamp': 'category', 'Border & Direction': 'category', 'TCC': 'float'}
+
+# OpenLoadFlow settings of the TCC load flow. Only boundary P is needed, so DC is the last fallback
+LOADFLOW_PROVIDER_PARAMETERS = {'lowImpedanceBranchMode': 'REPLACE_BY_MIN_IMPEDANCE_LINE'}
+
 # Function to get user inputs from console
 def get_user_inputs():
    
@@ -23,6 +42,7 @@ def get_user_inputs():
     Year_Month = input("Enter Year_Month (e.g., '202402'): ")
     specific_dates_input = input("Enter specific dates separated by commas ex. 20240212,20240213... (leave blank for all dates): ")
     types = input("Enter types separated by commas (e.g., 'NGR Export,NGR Import,SRO Export,SRO Import'): ")
+    resolution = parse_resolution(input("Enter the time resolution in minutes (60 or 15, leave blank for 60): "))
     
     #Check if user has entered specific types
     if not types.strip():
@@ -37,7 +57,7 @@ def get_user_inputs():
         specific_dates = None
     
     base_folder = rf'{Path}\\{Year_Month}'
-    return types, Year_Month, Save_folder, base_folder, specific_dates
+    return types, Year_Month, Save_folder, base_folder, specific_dates, day_timestamps(resolution)
 
 
 # Function to get all dates from folder (by default specific dates = None) or use specific ones if provided
@@ -51,7 +71,7 @@ def get_dates_from_folders(base_folder, specific_dates=None):
     return all_dates
 
 # Function to process the UCTE file and run loadflow
-def process_ucte_file(ucte_file_path, Date, current_timestamp, Type):
+def process_ucte_file(ucte_file_path, Date, current_timestamp, Type, store=None, borders=None):
     try:
         if not os.path.isfile(ucte_file_path):
             print(f"File {ucte_file_path} does not exist. Skipping.")
@@ -59,80 +79,127 @@ def process_ucte_file(ucte_file_path, Date, current_timestamp, Type):
         
         #Loads specified UCTE file 
         network = pp.load(ucte_file_path)
-        reporter = nf.Reporter()
-
-        #Parameters specification for AC LoadFlow
-        p = lf.Parameters(
-            distributed_slack=False,    
-            transformer_voltage_control_on=False , 
-            phase_shifter_regulation_on=True ,
-            shunt_compensator_voltage_control_on=True ,
-            voltage_init_mode=None, 
-            use_reactive_limits=None,  
-            twt_split_shunt_admittance=None, 
-            read_slack_bus=None, 
-            write_slack_bus=None, 
-            balance_type=None, 
-            dc_use_transformer_ratio=None, 
-            countries_to_balance=None, 
-            connected_component_mode=None, 
-            dc_power_factor=None,
-            provider_parameters={
-                'maxOuterLoopIterations': str(30),
-                'lowImpedanceBranchMode': 'REPLACE_BY_MIN_IMPEDANCE_LINE',}
-        )
-        lf.run_ac(network, parameters=p, reporter=reporter) # You can use also report_node = reporter 
-        print(str(reporter))
-        
-        # Extract X-nodes and rename certain X-Nodes
-        X_nodes = network.get_dangling_lines(attributes=['bus_id', 'boundary_p'])
-        X_nodes['bus_id'] = X_nodes['bus_id'].replace({
-            'RIS1A41_0': 'RISAC41', 'RMED141_0': 'RMEDG41_0',
-            'RPDF241_0': 'RPDFE41', 'RROS241_0': 'RROSI41', 'RTINTA1_0': 'RTINTB1'
-        })
-        X_nodes['bus_id'] = X_nodes['bus_id'].astype(str)
-        X_nodes = X_nodes.dropna(subset=['bus_id'])
-        
-        # Filter based on the Type
-        if Type.startswith('NGR'):
-            filtered = X_nodes[X_nodes['bus_id'].str.startswith('G')]
-        elif Type.startswith('SRO'):
-            filtered = X_nodes[X_nodes['bus_id'].str.startswith('R')]
-        else:
-            print(f"Warning: Type {Type} does not match expected values for filtering.")
-            return None
-        
-        #Delete unnecessary X-Nodes
-        filtered = filtered[~filtered['bus_id'].isin([
-            'GARACH1_0', 'RISAC41', 'RARA4D1_0', 'RNADA_1_0', 'RROSI41'
-        ])]
-        columns_drop = ['id', 'bus_id'] # only p_boundary for TCC
-        filtered = filtered.drop(columns=columns_drop, errors='ignore')
-
-        ##Capacity calculation
-        tcc_sum = abs(filtered['boundary_p'].sum())
-        
-        # Return certain dataframe structure 
-        return pd.DataFrame({
-            'Date': [Date],
-            'Timestamp': [current_timestamp],
-            'Border & Direction': [Type],
-            'TCC': [tcc_sum]
-        })
+        return solve_tcc(network, ucte_file_path, Type, store, borders=borders)
     
     except Exception as e:
         print(f"Error processing file {ucte_file_path}: {e}")
         return None
 
+# Function to run the loadflow on a loaded network (or scenario variant) and calculate the TCC of every border
+def solve_tcc(network, ucte_file_path, Type, store=None, warm_start=False, borders=None):
+    """
+    Returns {border: TCC} for the borders (all of Common/borders.py by default), None when it diverged.
+    """
+    borders = borders or border_table()
+    if type_border(Type, borders) is None:
+        print(f"Warning: Type {Type} does not match expected values for filtering.")
+        return None
+    report = SolverReport(ucte_file_path, os.path.dirname(store.path) if store is not None else None)
+
+    #AC LoadFlow, fast profile first and heavier ones (DC last) only if it does not converge
+    profile = run_loadflow(network, ucte_file_path, ALL_PROFILES, LOADFLOW_PROVIDER_PARAMETERS, store, report=report,
+                           warm_start=warm_start)
+    report.finish(profile)
+    if profile is None:
+        logging.error(f"Load flow did not converge for {ucte_file_path}. Skipping.")
+        return None
+    
+    # Extract X-nodes with their border, renamed and without the excluded X-Nodes of each border (Common/borders.py)
+    X_nodes = x_node_flows(network, borders)
+
+    ##Capacity calculation, the sums of all borders in one groupby
+    # Return only the TCC values, the caller appends them to the accumulator
+    return tcc_sums(X_nodes, borders)
+
+# Function to process the D/U scenario files of one hour (same date, timestamp and type)
+def process_hour_scenarios(files, store=None, borders=None):
+    """
+    Returns {file: {border: TCC}}. The first file is loaded and solved as the base network; the others are applied to a
+    variant of the unsolved base (only their changed injections, taps and statuses) and solved from its voltages.
+    Files that differ in more than that are loaded normally.
+    """
+    base_file = files[0]
+    results = {base_file: None}
+    try:
+        if os.path.isfile(base_file[0]):
+            network = pp.load(base_file[0])
+            # Keeps a copy of the base before the solve
+            loader = ScenarioLoader(network, base_file[0])
+            results[base_file] = solve_tcc(network, base_file[0], base_file[3], store, borders=borders)
+    except Exception as e:
+        print(f"Error processing file {base_file[0]}: {e}")
+
+    if results[base_file] is None:
+        # Without a solved base there is no solution to start from
+        results.update((file, process_ucte_file(*file, store, borders)) for file in files[1:])
+        return results
+
+    for file in files[1:]:
+        ucte_file_path, Date, current_timestamp, Type = file
+        try:
+            if loader.apply(ucte_file_path):
+                results[file] = process_ucte_file(*file, store, borders)
+            else:
+                results[file] = solve_tcc(network, ucte_file_path, Type, store, warm_start=True, borders=borders)
+        except Exception as e:
+            print(f"Error processing file {ucte_file_path}: {e}")
+            results[file] = None
+        finally:
+            loader.reset()
+    return results
+
+# Worker process entry point: the strategies and solver metrics of the worker go to the same Save_folder files
+def solve_hour_scenarios(files, Save_folder, borders=None):
+    store = StrategyStore(os.path.join(Save_folder, STRATEGY_FILE))
+    try:
+        return process_hour_scenarios(files, store, borders)
+    finally:
+        store.save()
+
+# Function to pre-scan the UCTE files before any load flow
+def prescan_files(files, borders, requested=()):
+    """
+    Returns the files to solve and {file: {border: TCC}} for the files whose TCC is known without a load flow:
+    valid files without X-nodes of their type's border (nor of the requested borders) have a TCC of 0.
+    Missing and invalid files are left out.
+    """
+    to_solve, known = [], {}
+    for file in files:
+        ucte_file_path, Date, current_timestamp, Type = file
+        if not os.path.isfile(ucte_file_path):
+            continue
+        scan = scan_ucte(ucte_file_path)
+        needed = {type_border(Type, borders), *requested} - {None}
+        if not scan['valid']:
+            logging.warning(f"Skipping invalid UCTE file {ucte_file_path}: {'; '.join(scan['errors'])}")
+        elif needed and not needed & set(borders_in_scan(scan, borders)):
+            known[file] = {code: 0.0 for code in borders}
+        else:
+            to_solve.append(file)
+    logging.info(f"Pre-scan: {len(to_solve)} files to solve, {len(known)} without X-nodes of their border.")
+    return to_solve, known
+
 # Main function to process all data
-def process_all_data(base_folder, Year_Month, types, Save_folder, specific_dates=None):
+def process_all_data(base_folder, Year_Month, types, Save_folder, specific_dates=None, timestamps=None,
+                     memory_budget_mb=None, recycle_after=10, history_folder=None, borders=None):
+    """
+    TCC of every UCTE file for the border of its type. With borders ({code: border} from border_table) the TCC of
+    those borders is also taken from the same solves and saved to an 'All borders' sheet.
+    """
+    #The types' borders are always solved, the requested ones are added or override them
+    requested = list(borders or {})
+    borders = dict(border_table(), **(borders or {}))
     #Takes dates of specified monthly folder
     dates = get_dates_from_folders(base_folder, specific_dates) 
+    #Timestamps of a day, hourly (0030 ... 2330) by default
+    timestamps = timestamps or day_timestamps()
 
-    #Creates an empty list for the final dataframe
-    data = []
+    #Creates the accumulator for the final dataframe (one row per UCTE file)
+    data = ColumnAccumulator(TCC_SCHEMA, chunk_size=8192)
+    store = StrategyStore(os.path.join(Save_folder, STRATEGY_FILE))
 
     #Iterates through each 'date' folder and through each type folder inside the predefined date folder 
+    files = []
     for Date in dates: 
         for Type in types:
             destination_folder = f'{base_folder}\\{Date}\\CGM\\{Type}'
@@ -140,28 +207,67 @@ def process_all_data(base_folder, Year_Month, types, Save_folder, specific_dates
             #Iterates through each UCTE FILE 
             for D in range(11):
                 for U in range(11):
-                    for i in range(24):
-                        time_value = i * 100 + 30
-                        base_ucte_filename = f'{Date}_{{:04d}}_2D{D}_UX{U}.uct'
-                        current_ucte_filename = base_ucte_filename.format(time_value)
-                        current_timestamp = f'{time_value // 100:02d}:30'
+                    for timestamp in timestamps:
+                        current_ucte_filename = f'{Date}_{timestamp}_2D{D}_UX{U}.uct'
+                        current_timestamp = colon_format(timestamp)
                         ucte_file_path = os.path.join(destination_folder, current_ucte_filename)
-                        
-                        #Saves the structured dataframe from TCC of UCTE file
-                        result = process_ucte_file(ucte_file_path, Date, current_timestamp, Type)
-                        if result is not None:
-                            data.append(result)
-
-    # Concatenate all dataframes and save to Excel
-    final = pd.concat(data, ignore_index=True) if data else pd.DataFrame()
+                        files.append((ucte_file_path, Date, current_timestamp, Type))
+
+    #Only valid files with X-nodes of their border are loaded and solved
+    to_solve, results = prescan_files(files, borders, requested)
+    #The D/U scenarios of an hour are solved together, as variants of the first one
+    hours = {}
+    for file in to_solve:
+        hours.setdefault((file[1], file[2], file[3]), []).append(file)
+    if memory_budget_mb:
+        # Parallel worker processes, as many as the sampled network size allows within the budget
+        jobs = [('tcc', 'solve_hour_scenarios', (hour_files, Save_folder, borders), f'{Date} {current_timestamp} {Type}')
+                for (Date, current_timestamp, Type), hour_files in hours.items()]
+        report = os.path.join(Save_folder, f'memory_report_{Year_Month}_TCC.csv')
+        # A failed hour is left out of the month instead of losing the TCC of every other hour
+        records = MemoryScheduler(memory_budget_mb, recycle_after=recycle_after).run(jobs, report_path=report, raise_errors=False)
+        for record in records:
+            if record['error']:
+                logging.error(f"TCC of {record['label']} failed: {record['error']}. Skipping.")
+            results.update(record['result'] or {})
+    else:
+        for hour_files in hours.values():
+            results.update(process_hour_scenarios(hour_files, store, borders))
+
+    #Saves the TCC of every UCTE file as a new row, and the TCC of the requested borders in the same order
+    border_schema = {column: kind for column, kind in TCC_SCHEMA.items() if column != 'TCC'}
+    all_borders = ColumnAccumulator(dict(border_schema, **{code: 'float' for code in requested}))
+    for file in files:
+        ucte_file_path, Date, current_timestamp, Type = file
+        file_tccs = results.get(file) or {}
+        tcc_sum = file_tccs.get(type_border(Type, borders))
+        if tcc_sum is not None:
+            row = {'Date': Date, 'Timestamp': current_timestamp, 'Border & Direction': Type}
+            data.append(**row, TCC=tcc_sum)
+            if requested:
+                all_borders.append(**row, **{code: file_tccs[code] for code in requested})
+
+    store.save()
+    # Build the final dataframe once and save to Excel
+    final = data.to_frame()
     output_file = os.path.join(Save_folder, f'{Year_Month}_TCCS.xlsx')
-    final.to_excel(output_file, index=False)
+    if requested:
+        with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+            final.to_excel(writer, index=False)
+            all_borders.to_frame().to_excel(writer, sheet_name='All borders', index=False)
+    else:
+        final.to_excel(output_file, index=False)
     print(f"Data saved to {output_file}")
 
+    # Also keep the results in the partitioned TCC history store for queries over many months
+    if history_folder and len(final):
+        rows = append_tcc(history_folder, final)
+        print(f"{rows} rows added to the TCC history in {history_folder}")
+
 
 # Main execution
 if __name__ == "__main__":
     # User inforamtion
-    types, Year_Month, Save_folder, base_folder, specific_dates = get_user_inputs() 
+    types, Year_Month, Save_folder, base_folder, specific_dates, timestamps = get_user_inputs() 
     #Processing User's info for TCC 
-    process_all_data(base_folder, Year_Month, types, Save_folder, specific_dates)
+    process_all_data(base_folder, Year_Month, types, Save_folder, specific_dates, timestamps)
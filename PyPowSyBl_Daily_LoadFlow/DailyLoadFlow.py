@@ -1,9 +1,20 @@
-import pypowsybl.network as pp
-import pypowsybl.loadflow as lf 
-import pandas as pd
 import os 
 import logging 
-import pypowsybl.report as nf
+import sys
+
+# Shared helpers live in the repository level Common folder
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Common.lazy import lazy_import, preload
+# Imported on first use, so runs with nothing to solve do not start pypowsybl
+pp = lazy_import('pypowsybl.network')
+lf = lazy_import('pypowsybl.loadflow')
+pd = lazy_import('pandas')
+sa = lazy_import('pypowsybl.security')
+from Common.memory_scheduler import MemoryScheduler
+from Common.pipeline import Pipeline, Stage, failed_keys
+from Common.solver import AC_PROFILES, STRATEGY_FILE, StrategyStore, build_parameters, run_loadflow
+from Common.solver_report import SolverReport
+from Common.time_axis import parse_resolution, parse_timestamps
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -20,12 +31,9 @@ def get_user_inputs():
     format = input("Enter the format (e.g., UCT): ")
 
     # Define hours or ask user for specific hours
-    hours = input("Enter the hours (comma-separated ex. 0030,0130 ... , or leave blank for default 0030-2330): ")
-    if not hours:
-        hours = ['0030', '0130', '0230', '0330', '0430', '0530', '0630', '0730', '0830', '0930', '1030', '1130',
-                 '1230', '1330', '1430', '1530', '1630', '1730', '1830', '1930', '2030', '2130', '2230', '2330']
-    else:
-        hours = hours.split(',')
+    resolution = parse_resolution(input("Enter the time resolution in minutes (60 or 15, leave blank for 60): "))
+    hours = input("Enter the hours (comma-separated ex. 0030,0130 ... , or leave blank for the whole day, 0030-2330 when hourly): ")
+    hours = parse_timestamps(hours, resolution)
 
     # Get the number range or use default
     numbers = input("Enter the version numbers (comma-separated ex. 0,8... , or leave blank for default 0-9): ")
@@ -72,17 +80,76 @@ def process_network_files_from_user_inputs():
     # Process network files using user-defined inputs
     process_network_files(date, hours, numbers, file_type, country_code, format, ucte_folder, output_folder)
 
-def process_network_files(date, hours, numbers, file_type, country_code, format, ucte_folder, output_folder):
-    #Loop through the hours and find for each hour highest version using find_highest_version_file
+    # Optional N-1 screening of the cross-border lines
+    if input("Run N-1 security analysis on the interconnectors? (y/N): ").strip().lower() == 'y':
+        process_security_files(date, hours, numbers, file_type, country_code, format, ucte_folder, output_folder)
+
+def process_network_files(date, hours, numbers, file_type, country_code, format, ucte_folder, output_folder,
+                          readers=1, solvers=1, writers=1, write_report=True, consumer=None):
+    """
+    Read, solve and write the hours in a pipeline: while one hour is solved the next UCTE files are
+    already parsed and the previous report is written to Excel.
+    consumer(hour, sheets) gets the report sheets of every solved hour ({sheet name: DataFrame}) in the write
+    stage, e.g. to compare them in memory; write_report=False then leaves out the Excel report.
+    Returns the hours that failed with an error, the reports of the other hours are still written.
+    """
+    store = StrategyStore(os.path.join(output_folder, STRATEGY_FILE))
+
+    def read(hour):
+        # Find for each hour highest version using find_highest_version_file and parse it
+        highest_number, selected_ucte_path = find_highest_version_file(date, hour, numbers, file_type, country_code, format, ucte_folder)
+        if not selected_ucte_path:
+            logging.warning(f"No valid UCTE file found for {hour}.")
+            return None
+        logging.info(f"Highest number version for {hour}: {highest_number}")
+        return hour, selected_ucte_path, pp.load(selected_ucte_path)
+
+    def solve(item):
+        hour, ucte_path, network = item
+        if not solve_network(network, ucte_path, hour, store):
+            return None
+        # Sheets are extracted here so the network is released before the write stage
+        return hour, extract_report_sheets(network)
+
+    def write(item):
+        hour, sheets = item
+        if write_report:
+            save_to_excel(report_path(output_folder, date, hour, file_type, country_code), *sheets)
+        if consumer is not None:
+            consumer(hour, report_sheets(*sheets))
+        return hour
+
+    preload(pp, lf)
+    try:
+        _, errors = Pipeline([Stage('read', read, readers), Stage('solve', solve, solvers), Stage('write', write, writers)]).run(hours)
+    finally:
+        store.save()
+    failed = sorted(failed_keys(errors), key=hours.index)
+    if failed:
+        logging.error(f"Hours {', '.join(failed)} of {date} failed, their reports were not written.")
+    return failed
+
+def process_network_files_in_workers(date, hours, numbers, file_type, country_code, format, ucte_folder, output_folder,
+                                     memory_budget_mb, recycle_after=10):
+    """
+    Solve the hours in parallel worker processes, as many as fit in memory_budget_mb.
+    The peak memory of every hour is written to memory_report_<date>_<type>_<country>.csv.
+    """
+    jobs = []
     for hour in hours:
         highest_number, selected_ucte_path = find_highest_version_file(date, hour, numbers, file_type, country_code, format, ucte_folder)
-        
         if selected_ucte_path:
             logging.info(f"Highest number version for {hour}: {highest_number}")
-            process_and_save_network(selected_ucte_path, date, hour, file_type, country_code, output_folder)
+            jobs.append(('daily_lf', 'save_network_report', (selected_ucte_path, date, hour, file_type, country_code, output_folder), hour))
         else:
             logging.warning(f"No valid UCTE file found for {hour}.")
 
+    report = os.path.join(output_folder, f'memory_report_{date}_{file_type}_{country_code}.csv')
+    MemoryScheduler(memory_budget_mb, recycle_after=recycle_after).run(jobs, report_path=report)
+
+def save_network_report(ucte_path, date, hour, file_type, country_code, output_folder):
+    # Worker process entry point: the solved network can not be sent back, only whether it converged
+    return process_and_save_network(ucte_path, date, hour, file_type, country_code, output_folder) is not None
 
 def find_highest_version_file(date, hour, numbers, file_type, country_code, format, ucte_folder):
     highest_number = -1
@@ -99,60 +166,69 @@ def find_highest_version_file(date, hour, numbers, file_type, country_code, form
         
     return highest_number, selected_ucte_path
 
-def process_and_save_network(ucte_path ,date, hour, file_type, country_code, output_folder):
-    # Load network
-    network = pp.load(ucte_path)
-    reporter = nf.Reporter()
+# OpenLoadFlow settings of the daily load flow, the solver profiles add regulation and iteration limits
+LOADFLOW_PROVIDER_PARAMETERS = {
+    'lowImpedanceBranchMode ': 'REPLACE_BY_MIN_IMPEDANCE_LINE' ,
+    'slackBusesIds'  : 'G5MEGA14' 
+}
 
+def get_loadflow_parameters(profile='regulated'):
     # Define load flow parameters
-    p = lf.Parameters(
-        distributed_slack=False ,
-        transformer_voltage_control_on=False , 
-        phase_shifter_regulation_on=True ,
-        shunt_compensator_voltage_control_on=True ,
-        voltage_init_mode=None, 
-        use_reactive_limits=None,  
-        twt_split_shunt_admittance=None, 
-        read_slack_bus=None, 
-        write_slack_bus=None, 
-        balance_type=None, 
-        dc_use_transformer_ratio=None, 
-        countries_to_balance=None, 
-        connected_component_mode=None, 
-        dc_power_factor=None,
-        provider_parameters={
-        'maxOuterLoopIterations' : str(30) ,
-        'lowImpedanceBranchMode ': 'REPLACE_BY_MIN_IMPEDANCE_LINE' ,
-        'slackBusesIds'  : 'G5MEGA14' 
-    }) 
-
-    # Run loadflow
-    lf.run_ac(network, parameters=p, reporter=reporter)
-    print(str(reporter))
-    logging.info(f"LoadFlow completed for {hour}.") 
-     
-    # Process DataFrames for different components
+    return build_parameters(profile, LOADFLOW_PROVIDER_PARAMETERS)
+
+def solve_network(network, ucte_path, hour, store):
+    # Warnings and summaries are logged, metrics (and the full report of a diverged hour) go next to the strategies
+    report = SolverReport(ucte_path, os.path.dirname(store.path) if store is not None else None)
+    # Run loadflow, starting with the fast profile (or the one that worked last time for this file)
+    profile = run_loadflow(network, ucte_path, AC_PROFILES, LOADFLOW_PROVIDER_PARAMETERS, store, report=report)
+    report.finish(profile)
+    if profile is None:
+        # A diverged hour is not exported
+        logging.error(f"LoadFlow did not converge for {hour} with any solver profile. Skipping export.")
+        return False
+    logging.info(f"LoadFlow completed for {hour} ({profile} profile).") 
+    return True
+
+def extract_report_sheets(network):
+    # Process DataFrames for different components, in the argument order of save_to_excel
     nodes = process_bus_sheet(network)
     current_limits = process_current_limits(network)
     lines_final = process_lines(network, nodes, current_limits)
     transformers = process_transformers(network, nodes, current_limits)
     x_nodes = process_x_nodes(network, nodes, current_limits)
     switches = process_switches(network)
+    return nodes, transformers, lines_final, x_nodes, switches
 
+def report_path(output_folder, date, hour, file_type, country_code):
     # Define output file name
     output_filename = f'{date}_{hour}_{file_type}_{country_code}_0_OPENLF_REPORT.xlsx'
-    output_path = os.path.join(output_folder, output_filename)
+    return os.path.join(output_folder, output_filename)
+
+def process_and_save_network(ucte_path ,date, hour, file_type, country_code, output_folder, store=None):
+    # Load network
+    network = pp.load(ucte_path)
+    if store is None:
+        store = StrategyStore(os.path.join(output_folder, STRATEGY_FILE))
+
+    converged = solve_network(network, ucte_path, hour, store)
+    store.save()
+    if not converged:
+        return None
 
     # Save to Excel
-    save_to_excel(output_path, nodes, transformers, lines_final, x_nodes, switches)
+    save_to_excel(report_path(output_folder, date, hour, file_type, country_code), *extract_report_sheets(network))
+
+    # Solved network is returned so callers (e.g. watch mode) can reuse it for other exports
+    return network
+
+def report_sheets(nodes, transformers, lines_final, x_nodes, switches):
+    # Sheets of the OPENLF report in their Excel order, as the comparison reads them
+    return {'Bus': nodes, 'Transformers': transformers, 'Line': lines_final, 'X-Nodes': x_nodes, 'Switches': switches}
 
 def save_to_excel(output_path, nodes, transformers, lines_final , x_nodes, switches):
     with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-        nodes.to_excel(writer, sheet_name='Bus', index=False)
-        transformers.to_excel(writer, sheet_name='Transformers', index=False)
-        lines_final.to_excel(writer, sheet_name='Line', index=False)
-        x_nodes.to_excel(writer, sheet_name='X-Nodes', index=False)
-        switches.to_excel(writer, sheet_name='Switches', index=False)
+        for sheet_name, df in report_sheets(nodes, transformers, lines_final, x_nodes, switches).items():
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
 
 
 def process_bus_sheet(network):
@@ -345,7 +421,137 @@ def process_switches(network):
     return switches
 
 
-if __name__ == "__main__":
-    process_network_files_from_user_inputs()
+# N-1 screening: country prefixes (first letter of UCTE node codes) whose interconnectors and X-node lines are tripped
+N1_COUNTRY_PREFIXES = ('G', 'R')
 
+def process_security_files(date, hours, numbers, file_type, country_code, format, ucte_folder, output_folder, prefixes=N1_COUNTRY_PREFIXES):
+    """
+    Same file selection as process_network_files, but every hour gets an N-1 security analysis.
+    Returns the hours that failed with an error, the reports of the other hours are still written.
+    """
+    failed = []
+    for hour in hours:
+        highest_number, selected_ucte_path = find_highest_version_file(date, hour, numbers, file_type, country_code, format, ucte_folder)
 
+        if selected_ucte_path:
+            logging.info(f"Highest number version for {hour}: {highest_number}")
+            try:
+                process_and_save_security_analysis(selected_ucte_path, date, hour, file_type, country_code, output_folder, prefixes)
+            except Exception:
+                logging.exception(f"N-1 security analysis failed for {hour}")
+                failed.append(hour)
+        else:
+            logging.warning(f"No valid UCTE file found for {hour}.")
+    if failed:
+        logging.error(f"N-1 security analysis of hours {', '.join(failed)} of {date} failed, their reports were not written.")
+    return failed
+
+def define_contingencies(network, prefixes=N1_COUNTRY_PREFIXES):
+    """
+    Cross-border lines, tie lines and unpaired X-node lines of the given countries.
+    Returns a dataframe with one row per contingency (the contingency id is the element id).
+    """
+    contingencies = []
+
+    # Interconnectors: lines whose two ends are in different countries, one of them being monitored
+    lines = network.get_lines(attributes=['bus_breaker_bus1_id', 'bus_breaker_bus2_id']).reset_index()
+    country1 = lines['bus_breaker_bus1_id'].astype(str).str[:1]
+    country2 = lines['bus_breaker_bus2_id'].astype(str).str[:1]
+    interconnectors = lines[(country1 != country2) & (country1.isin(prefixes) | country2.isin(prefixes))]
+    contingencies.append(pd.DataFrame({'element_id': interconnectors['id'], 'element_type': 'LINE'}))
+
+    # X-nodes: tie lines of a merged CGM and dangling lines that are not paired
+    dangling_lines = network.get_dangling_lines(attributes=['bus_breaker_bus_id', 'tie_line_id']).reset_index()
+    dangling_lines = dangling_lines[dangling_lines['bus_breaker_bus_id'].astype(str).str[:1].isin(prefixes)]
+    paired = dangling_lines['tie_line_id'].fillna('').astype(str) != ''
+    contingencies.append(pd.DataFrame({'element_id': dangling_lines.loc[paired, 'tie_line_id'].unique(), 'element_type': 'TIE_LINE'}))
+    contingencies.append(pd.DataFrame({'element_id': dangling_lines.loc[~paired, 'id'], 'element_type': 'DANGLING_LINE'}))
+
+    contingencies = pd.concat(contingencies, ignore_index=True).drop_duplicates(subset=['element_id'])
+    contingencies['contingency_id'] = contingencies['element_id']
+    return contingencies[['contingency_id', 'element_id', 'element_type']].reset_index(drop=True)
+
+def monitored_branches(network, prefixes=N1_COUNTRY_PREFIXES):
+    # Lines, transformers and tie lines with at least one end in the monitored countries
+    branch_ids = []
+    for branches in (network.get_lines(attributes=['bus_breaker_bus1_id', 'bus_breaker_bus2_id']),
+                     network.get_2_windings_transformers(attributes=['bus_breaker_bus1_id', 'bus_breaker_bus2_id'])):
+        touches = (branches['bus_breaker_bus1_id'].astype(str).str[:1].isin(prefixes) |
+                   branches['bus_breaker_bus2_id'].astype(str).str[:1].isin(prefixes))
+        branch_ids.extend(branches.index[touches])
+    dangling_lines = network.get_dangling_lines(attributes=['bus_breaker_bus_id', 'tie_line_id'])
+    tie_lines = dangling_lines.loc[dangling_lines['bus_breaker_bus_id'].astype(str).str[:1].isin(prefixes), 'tie_line_id']
+    branch_ids.extend(tie_lines[tie_lines.fillna('').astype(str) != ''].unique())
+    return list(dict.fromkeys(branch_ids))
+
+def process_security_results(result, contingencies, current_limits):
+    """
+    Post-contingency I of every monitored branch against its permanent current limit (both sides).
+    The base case is reported with contingency id 'BASE CASE'.
+    """
+    branches = result.branch_results.reset_index()
+    branches['contingency_id'] = branches['contingency_id'].replace('', 'BASE CASE')
+    branches = branches[['contingency_id', 'branch_id', 'p1', 'q1', 'i1', 'p2', 'q2', 'i2']]
+
+    permanent = current_limits[(current_limits['type'] == 'CURRENT') & (current_limits['acceptable_duration'] == -1)]
+    for side, suffix in (('ONE', '1'), ('TWO', '2')):
+        limits = permanent[permanent['side'] == side][['element_id', 'value']].drop_duplicates(subset=['element_id'])
+        limits = limits.rename(columns={'element_id': 'branch_id', 'value': f'I_limit{suffix}'})
+        branches = pd.merge(branches, limits, on='branch_id', how='left')
+
+    # Loading of the most loaded side, in % of its permanent limit
+    loading1 = branches['i1'].abs() / branches['I_limit1'] * 100
+    loading2 = branches['i2'].abs() / branches['I_limit2'] * 100
+    branches['loading'] = pd.concat([loading1, loading2], axis=1).max(axis=1)
+    branches['branch_id'] = branches['branch_id'].astype(str).str.replace(' ', '_')
+    branches.rename(columns={'i1': 'I1', 'p1': 'P1', 'q1': 'Q1', 'i2': 'I2', 'p2': 'P2', 'q2': 'Q2'}, inplace=True)
+    branches.sort_values(by=['contingency_id', 'loading'], ascending=[True, False], inplace=True)
+
+    # Status of the post-contingency load flow of every contingency
+    statuses = {contingency_id: str(post_result.status).split('.')[-1] for contingency_id, post_result in result.post_contingency_results.items()}
+    contingencies = contingencies.copy()
+    contingencies['status'] = contingencies['contingency_id'].map(statuses)
+    return branches, contingencies
+
+def process_and_save_security_analysis(ucte_path, date, hour, file_type, country_code, output_folder, prefixes=N1_COUNTRY_PREFIXES):
+    # Load network
+    network = pp.load(ucte_path)
+    # Warnings and summaries of the base case and contingency load flows are logged
+    report = SolverReport(ucte_path)
+
+    # All contingencies of the hour in one security analysis, the base case load flow is part of it
+    contingencies = define_contingencies(network, prefixes)
+    branch_ids = monitored_branches(network, prefixes)
+    analysis = sa.create_analysis()
+    for contingency_id, element_id in zip(contingencies['contingency_id'], contingencies['element_id']):
+        analysis.add_single_element_contingency(element_id, contingency_id)
+    analysis.add_monitored_elements(branch_ids=branch_ids)
+    # Same AC profile that converged for the base case of this file in the daily load flow, if known
+    profile = StrategyStore(os.path.join(output_folder, STRATEGY_FILE)).get(ucte_path)
+    profile = profile if profile in AC_PROFILES else 'regulated'
+    result = analysis.run_ac(network, parameters=sa.Parameters(load_flow_parameters=get_loadflow_parameters(profile)),
+                             reporter=report.reporter)
+    base_status = result.pre_contingency_result.status
+    converged = base_status == lf.ComponentStatus.CONVERGED
+    report.finish(profile if converged else None)
+    if not converged:
+        # Post-contingency flows of a diverged base case are meaningless
+        logging.error(f"Base case of the N-1 security analysis did not converge for {hour} ({base_status}). Skipping export.")
+        return False
+    logging.info(f"N-1 security analysis completed for {hour}: {len(contingencies)} contingencies, {len(branch_ids)} monitored branches.")
+
+    branches, contingencies = process_security_results(result, contingencies, process_current_limits(network))
+    violations = result.limit_violations.reset_index()
+
+    # Define output file name and save to Excel
+    output_filename = f'{date}_{hour}_{file_type}_{country_code}_0_OPENLF_N-1_REPORT.xlsx'
+    output_path = os.path.join(output_folder, output_filename)
+    with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+        branches.to_excel(writer, sheet_name='N-1 Branches', index=False)
+        contingencies.to_excel(writer, sheet_name='Contingencies', index=False)
+        violations.to_excel(writer, sheet_name='Limit Violations', index=False)
+    return True
+
+
+if __name__ == "__main__":
+    process_network_files_from_user_inputs()
@@ -0,0 +1,312 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import sys
+
+"""
+Non-interactive batch entry point for the Daily LoadFlow, Boundary Diagrams, Comparisons and Monthly TCC scripts.
+
+    python cli.py enqueue --queue jobs.sqlite --start 20240701 --end 20240731 --stages daily_lf,comparisons ...
+    python cli.py work --queue jobs.sqlite --processes 4
+    python cli.py status --queue jobs.sqlite
+    python cli.py run --start 20240701 --stages daily_lf,comparisons ... [--dry-run]
+    python cli.py watch --ucte-folder <UCTE folder> --output-folder <reports folder> --comparison-folder <results folder>
+
+Settings can also come from a JSON config file (--config), command line arguments override it.
+pypowsybl, pandas and matplotlib are only imported by the stages that use them ('python cli.py startup' checks it).
+"""
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def split_list(value):
+    return [item.strip() for item in value.split(',') if item.strip()] if value else None
+
+
+def split_numbers(value):
+    return [int(item) for item in split_list(value)] if value else None
+
+
+def add_batch_arguments(parser):
+    parser.add_argument('--config', help='JSON file with the batch settings')
+    parser.add_argument('--start', dest='start_date', help='First date (YYYYMMDD)')
+    parser.add_argument('--end', dest='end_date', help='Last date (YYYYMMDD), defaults to the start date')
+    parser.add_argument('--stages', type=split_list, help='Comma separated: daily_lf,n1,boundary,comparisons,tcc')
+    parser.add_argument('--countries', type=split_list, help='Comma separated country codes (e.g. GR)')
+    parser.add_argument('--file-types', dest='file_types', type=split_list, help='Comma separated file types (e.g. FO3)')
+    parser.add_argument('--format', help='UCTE file extension (e.g. UCT)')
+    parser.add_argument('--hours', type=split_list, help='Comma separated timestamps, default the whole day (0030-2330 when hourly)')
+    parser.add_argument('--resolution', type=int, choices=[60, 30, 15], help='Minutes between timestamps, default 60')
+    parser.add_argument('--hours-per-job', dest='hours_per_job', type=int,
+                        help='Split the load flows of a day into jobs of this many timestamps')
+    parser.add_argument('--numbers', type=split_numbers, help='Comma separated UCTE version numbers, default 0-9')
+    parser.add_argument('--memory-budget', dest='memory_budget_mb', type=int,
+                        help='MB of memory for the load flow worker processes of one job (daily_lf, tcc)')
+    parser.add_argument('--recycle-after', dest='recycle_after', type=int,
+                        help='Replace a load flow worker process after this many networks, default 10')
+    parser.add_argument('--solver-report', dest='solver_report', choices=['summary', 'full'],
+                        help="'full' writes the whole load flow report of every file, not only of the diverged ones")
+    parser.add_argument('--ucte-folder', dest='ucte_folder', help='Folder of the IGM UCTE files')
+    parser.add_argument('--output-folder', dest='output_folder', help='Folder of the OPENLF reports')
+    parser.add_argument('--reports-folder', dest='reports_folder', help='Folder of UNICORN/OPENLF reports (default: output folder)')
+    parser.add_argument('--comparison-folder', dest='comparison_folder', help='Folder of the comparison results')
+    parser.add_argument('--comparison-mode', dest='comparison_mode', choices=['timestamp', 'cube', 'month', 'memory'],
+                        help="'cube' compares a whole day in one pass and adds per element statistics; 'month' runs the day "
+                             "cubes of a month in one job; 'memory' solves the "
+                             "UCTE files and compares the OPENLF results without the Excel reports (written only with the daily_lf stage)")
+    parser.add_argument('--comparison-output', dest='comparison_output', choices=['full', 'exceptions'],
+                        help="'exceptions' writes only the elements exceeding the tolerances ('comparison_tolerances' in the config)")
+    parser.add_argument('--comparison-sidecar', dest='comparison_sidecar', action='store_true', default=None,
+                        help='Also write the full comparison detail as Parquet files')
+    parser.add_argument('--comparison-workers', dest='comparison_workers', type=int,
+                        help='Worker processes for the comparison of a day, default 1 (results come back as Arrow tables)')
+    parser.add_argument('--comparison-tables-folder', dest='comparison_tables_folder',
+                        help='Folder of the Arrow tables of the comparison workers (default /dev/shm when it has 1 GB free)')
+    parser.add_argument('--boundary-ucte-folder', dest='boundary_ucte_folder', help='Folder of the CGM UCTE files')
+    parser.add_argument('--boundary-country', dest='boundary_country', help='Country code of the CGM files (e.g. UX)')
+    parser.add_argument('--boundary-mode', dest='boundary_mode', choices=['daily', 'period'],
+                        help="'period' summarizes all dates in one job: profiles, envelopes and duration curves per node")
+    parser.add_argument('--boundary-folder', dest='boundary_folder', help='Folder of the boundary nodes Excel files')
+    parser.add_argument('--diagrams-folder', dest='diagrams_folder', help='Folder of the boundary diagrams')
+    parser.add_argument('--tcc-folder', dest='tcc_folder', help='Base folder for CGM TCC (contains YYYYMM folders)')
+    parser.add_argument('--tcc-save-folder', dest='tcc_save_folder', help='Folder of the monthly TCC results')
+    parser.add_argument('--tcc-types', dest='tcc_types', type=split_list, help='Comma separated TCC types')
+    parser.add_argument('--tcc-history-folder', dest='tcc_history_folder', help='Also append the TCC results to this history store')
+    parser.add_argument('--borders', type=split_list,
+                        help="Comma separated border codes (e.g. GR,RO): boundary nodes of each, and an 'All borders' TCC sheet, "
+                             "from one solve per file ('border_table' in the config adds borders)")
+
+
+def batch_settings(args):
+    from Common.batch import load_config, merge_settings
+
+    config = load_config(args.config) if args.config else {}
+    overrides = {key: getattr(args, key) for key in (
+        'start_date', 'end_date', 'stages', 'countries', 'file_types', 'format', 'hours', 'resolution',
+        'hours_per_job', 'numbers', 'memory_budget_mb', 'recycle_after', 'solver_report', 'ucte_folder',
+        'output_folder', 'reports_folder', 'comparison_folder', 'comparison_mode', 'comparison_output',
+        'comparison_sidecar', 'comparison_workers', 'comparison_tables_folder', 'boundary_ucte_folder', 'boundary_country',
+        'boundary_mode', 'boundary_folder', 'diagrams_folder', 'tcc_folder', 'tcc_save_folder', 'tcc_types', 'tcc_history_folder', 'borders')}
+    settings = merge_settings(config, overrides)
+    if not settings.get('start_date'):
+        raise SystemExit("A start date is needed (--start or 'start_date' in the config file).")
+    return settings
+
+
+def print_jobs(jobs):
+    for key, kind, params, depends_on in jobs:
+        print(f"{kind:<12} {' '.join(str(part) for part in key[1:])}" + (f"  (after {len(depends_on)} jobs)" if depends_on else ''))
+    print(f"{len(jobs)} jobs")
+
+
+def command_enqueue(args):
+    from Common.batch import enqueue_jobs, expand_jobs
+    from Common.work_queue import WorkQueue
+
+    jobs = expand_jobs(batch_settings(args))
+    if args.dry_run:
+        print_jobs(jobs)
+        return
+    with WorkQueue(args.queue) as queue:
+        ids = enqueue_jobs(queue, jobs, max_attempts=args.max_attempts)
+    print(f"{len(ids)} jobs in queue {args.queue}")
+
+
+def command_run(args):
+    from Common.batch import execute_job, expand_jobs
+
+    # Jobs come out of expand_jobs after the jobs they depend on, so running them in order needs no queue
+    jobs = expand_jobs(batch_settings(args))
+    if args.dry_run:
+        print_jobs(jobs)
+        return
+    for key, kind, params, depends_on in jobs:
+        logging.info(f"Running {kind} {' '.join(str(part) for part in key[1:])}")
+        execute_job(kind, params)
+
+
+def command_work(args):
+    from Common.batch import execute_job
+    from Common.work_queue import run_worker
+
+    if args.processes <= 1:
+        run_worker(args.queue, execute_job, poll_interval=args.poll, stop_when_empty=not args.keep_running)
+        return
+    workers = [multiprocessing.Process(target=run_worker, args=(args.queue, execute_job, args.poll, not args.keep_running))
+               for _ in range(args.processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+def command_status(args):
+    from Common.work_queue import WorkQueue
+
+    with WorkQueue(args.queue) as queue:
+        for kind, status, count in queue.status_counts():
+            print(f"{kind:<12} {status:<8} {count}")
+        if args.failed:
+            for job in queue.jobs('failed'):
+                print(f"\nJob {job['id']} ({job['kind']}) {job['params']}\n{job['error']}")
+
+
+def command_retry(args):
+    from Common.work_queue import WorkQueue
+
+    with WorkQueue(args.queue) as queue:
+        print(f"{queue.retry_failed()} failed jobs put back in the queue")
+
+
+def command_watch(args):
+    from Common.batch import DEFAULTS, load_config
+    from Common.time_axis import day_timestamps
+    from Common.watch import watch
+
+    settings = {
+        'date': args.date, 'hours': args.hours or day_timestamps(args.resolution), 'numbers': args.numbers or DEFAULTS['numbers'],
+        'file_type': args.file_type, 'country_code': args.country, 'format': args.format,
+        'ucte_folder': args.ucte_folder, 'output_folder': args.output_folder,
+        'reports_folder': args.reports_folder, 'comparison_folder': args.comparison_folder,
+        'comparison_numbers': DEFAULTS['comparison_numbers'],
+        'boundary_folder': args.boundary_folder, 'diagrams_folder': args.diagrams_folder,
+        'boundary_ucte_folder': args.boundary_ucte_folder, 'boundary_country': args.boundary_country,
+        'borders': args.borders, 'border_table': (load_config(args.config) if args.config else {}).get('border_table'),
+    }
+    watch(settings, poll_interval=args.poll, once=args.once)
+
+
+def command_scan(args):
+    import pandas as pd
+    from Common.ucte_scan import list_ucte_files, scan_files
+
+    scans = scan_files(list_ucte_files(args.paths), prefixes=args.prefixes)
+    if args.output:
+        scans.to_csv(args.output, index=False)
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(scans.drop(columns=['path', 'x_node_neighbours']).to_string(index=False))
+        print(f"\n{int(scans['valid'].sum()) if len(scans) else 0} valid, "
+              f"{int(scans['relevant'].sum()) if len(scans) else 0} relevant of {len(scans)} files, "
+              f"{scans['scan_ms'].sum() if len(scans) else 0:.1f} ms")
+        if len(scans):
+            print(scans.groupby('countries').size().rename('files').to_string())
+
+
+def command_tcc_query(args):
+    import pandas as pd
+    from Common.tcc_store import query_tcc
+
+    result = query_tcc(args.store, args.start, args.end, args.borders, args.aggregate, args.percentile)
+    if args.output:
+        if args.output.lower().endswith('.xlsx'):
+            result.to_excel(args.output, index=False)
+        else:
+            result.to_csv(args.output, index=False)
+        print(f"{len(result)} rows saved to {args.output}")
+    else:
+        with pd.option_context('display.max_rows', 200, 'display.width', 200):
+            print(result.to_string(index=False))
+
+
+def command_startup(args):
+    from Common.startup import check_startup
+
+    rows = check_startup(args.budget, args.entry_points)
+    for row in rows:
+        status = 'ok' if row['passed'] else 'FAILED'
+        heavy = f", imports {', '.join(row['heavy_modules'])}" if row['heavy_modules'] else ''
+        slowest = ', '.join(f'{module} {ms}ms' for module, ms in row['slowest'])
+        print(f"{row['entry_point']:<12} {row['import_ms']:>7.1f} ms  {status}{heavy}  (slowest: {slowest})")
+    if not all(row['passed'] for row in rows):
+        raise SystemExit(f"Startup over the {args.budget} ms budget or importing heavy modules.")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    enqueue = subparsers.add_parser('enqueue', help='Expand a date range into jobs and add them to the queue')
+    enqueue.add_argument('--queue', required=True, help='SQLite queue file')
+    enqueue.add_argument('--max-attempts', dest='max_attempts', type=int, default=3)
+    enqueue.add_argument('--dry-run', dest='dry_run', action='store_true', help='List the jobs without adding them')
+    add_batch_arguments(enqueue)
+    enqueue.set_defaults(func=command_enqueue)
+
+    run = subparsers.add_parser('run', help='Expand a date range into jobs and run them here, without a queue')
+    run.add_argument('--dry-run', dest='dry_run', action='store_true', help='List the jobs without running them')
+    add_batch_arguments(run)
+    run.set_defaults(func=command_run)
+
+    work = subparsers.add_parser('work', help='Claim and run queued jobs')
+    work.add_argument('--queue', required=True, help='SQLite queue file')
+    work.add_argument('--processes', type=int, default=1, help='Number of worker processes on this machine')
+    work.add_argument('--poll', type=float, default=10, help='Seconds between polls while jobs wait on others')
+    work.add_argument('--keep-running', dest='keep_running', action='store_true', help='Keep polling when the queue is empty')
+    work.set_defaults(func=command_work)
+
+    status = subparsers.add_parser('status', help='Show job counts per stage and status')
+    status.add_argument('--queue', required=True, help='SQLite queue file')
+    status.add_argument('--failed', action='store_true', help='Also print the errors of failed jobs')
+    status.set_defaults(func=command_status)
+
+    watch = subparsers.add_parser('watch', help='Reprocess only the hours whose UCTE version changed')
+    watch.add_argument('--date', help='Date to watch (YYYYMMDD), default is the current day')
+    watch.add_argument('--country', default='GR', help='Country code (e.g. GR)')
+    watch.add_argument('--file-type', dest='file_type', default='FO3', help='File type (e.g. FO3)')
+    watch.add_argument('--format', default='UCT', help='UCTE file extension (e.g. UCT)')
+    watch.add_argument('--hours', type=split_list, help='Comma separated timestamps, default the whole day (0030-2330 when hourly)')
+    watch.add_argument('--resolution', type=int, choices=[60, 30, 15], default=60, help='Minutes between timestamps')
+    watch.add_argument('--numbers', type=split_numbers, help='Comma separated UCTE version numbers, default 0-9')
+    watch.add_argument('--ucte-folder', dest='ucte_folder', required=True, help='Folder of the UCTE files')
+    watch.add_argument('--output-folder', dest='output_folder', required=True, help='Folder of the OPENLF reports')
+    watch.add_argument('--reports-folder', dest='reports_folder', help='Folder of the UNICORN reports (default: output folder)')
+    watch.add_argument('--comparison-folder', dest='comparison_folder', help='Refresh the comparison file in this folder')
+    watch.add_argument('--boundary-folder', dest='boundary_folder', help='Refresh the boundary nodes file in this folder')
+    watch.add_argument('--boundary-ucte-folder', dest='boundary_ucte_folder',
+                       help='Folder of the CGM UCTE files the boundary nodes are solved from')
+    watch.add_argument('--boundary-country', dest='boundary_country', default='UX', help='Country code of the CGM files (e.g. UX)')
+    watch.add_argument('--diagrams-folder', dest='diagrams_folder', help='Folder of the boundary diagrams')
+    watch.add_argument('--borders', type=split_list, help='Comma separated border codes (e.g. GR,RO) of the boundary nodes files')
+    watch.add_argument('--config', help="JSON batch config file, its 'border_table' changes or adds borders")
+    watch.add_argument('--poll', type=float, default=60, help='Seconds between two scans of the UCTE folder')
+    watch.add_argument('--once', action='store_true', help='Scan a single time and exit')
+    watch.set_defaults(func=command_watch)
+
+    scan = subparsers.add_parser('scan', help='Validate UCTE files and list their countries and X-nodes without loading them')
+    scan.add_argument('paths', nargs='+', help='UCTE files or folders')
+    scan.add_argument('--prefixes', type=split_list, help="Relevant only with X-nodes connected to these countries (e.g. G,R)")
+    scan.add_argument('--output', help='Also write the scan table to this CSV file')
+    scan.set_defaults(func=command_scan)
+
+    tcc_query = subparsers.add_parser('tcc-query', help='Query the TCC history store')
+    tcc_query.add_argument('--store', required=True, help='TCC history folder')
+    tcc_query.add_argument('--start', help='First date (YYYYMMDD)')
+    tcc_query.add_argument('--end', help='Last date (YYYYMMDD)')
+    tcc_query.add_argument('--borders', type=split_list, help="Comma separated types (e.g. 'NGR Export,SRO Import')")
+    tcc_query.add_argument('--aggregate', choices=['daily', 'monthly'], help='Min, max, mean and percentile per period')
+    tcc_query.add_argument('--percentile', type=float, default=95)
+    tcc_query.add_argument('--output', help='Write the result to a CSV or Excel (.xlsx) file instead of printing it')
+    tcc_query.set_defaults(func=command_tcc_query)
+
+    startup = subparsers.add_parser('startup', help='Check the import time of the entry points (python -X importtime)')
+    startup.add_argument('--budget', type=float, default=200, help='Import time budget per entry point in ms')
+    startup.add_argument('--entry-points', dest='entry_points', type=split_list,
+                         help='Comma separated: cli,daily_lf,boundary,comparisons,tcc (default all)')
+    startup.set_defaults(func=command_startup)
+
+    retry = subparsers.add_parser('retry', help='Put failed jobs back in the queue')
+    retry.add_argument('--queue', required=True, help='SQLite queue file')
+    retry.set_defaults(func=command_retry)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
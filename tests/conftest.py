@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+# The tests import the Common helpers and the scripts the same way cli.py does
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# Small handwritten UCTE networks, each described in the comment line of its ##C block
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+@pytest.fixture
+def fixture_path():
+    return lambda name: os.path.join(FIXTURES, name)
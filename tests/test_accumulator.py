@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from Common.accumulator import ColumnAccumulator
+
+
+def test_frames_across_chunks_match_concat():
+    frames = [pd.DataFrame({'Border': ['NGR Export', 'SRO Export', 'NGR Export'], 'Hour': [0, 1, 2],
+                            'TCC': [100.0 + day, np.nan, 120.5]}) for day in range(5)]
+    accumulator = ColumnAccumulator(chunk_size=4)
+    for frame in frames:
+        accumulator.append_frame(frame)
+    assert len(accumulator) == 15
+    pd.testing.assert_frame_equal(accumulator.to_frame(categorical=False).astype({'Border': str}),
+                                  pd.concat(frames, ignore_index=True))
+
+
+def test_single_rows_and_missing_columns():
+    accumulator = ColumnAccumulator({'id': 'category', 'I': 'float', 'side': 'int', 'note': 'object'}, chunk_size=2)
+    accumulator.append(id='L2', I=10.0, side=1)
+    accumulator.append(id='L1', side=2, note={'tap': 4})
+    accumulator.append_frame(pd.DataFrame({'id': ['L2'], 'I': ['not a number']}))
+    frame = accumulator.to_frame()
+    assert frame['id'].tolist() == ['L2', 'L1', 'L2']
+    # Categories are sorted, so sorting the frame sorts by value
+    assert list(frame['id'].cat.categories) == ['L1', 'L2']
+    assert frame['I'].isna().tolist() == [False, True, True]
+    assert frame['side'].tolist() == [1, 2, 0]
+    assert frame['note'].tolist() == [None, {'tap': 4}, None]
+
+
+def test_schema_errors():
+    with pytest.raises(ValueError):
+        ColumnAccumulator({'id': 'text'})
+    with pytest.raises(ValueError):
+        ColumnAccumulator(chunk_size=0)
+    accumulator = ColumnAccumulator({'id': 'category'})
+    with pytest.raises(KeyError):
+        accumulator.append(id='L1', I=1.0)
+    assert ColumnAccumulator().to_frame().empty
+
+
+def test_float32_halves_the_value_buffers():
+    wide = ColumnAccumulator({'TCC': 'float'}, chunk_size=1000)
+    narrow = ColumnAccumulator({'TCC': 'float'}, chunk_size=1000, float32=True)
+    assert narrow.memory_usage() * 2 == wide.memory_usage()
+    narrow.append_frame(pd.DataFrame({'TCC': [0.1]}))
+    assert narrow.to_frame()['TCC'].dtype == np.float32
@@ -0,0 +1,33 @@
+import os
+
+import pandas as pd
+import pytest
+
+from Common.arrow_transport import TableTransport, concat_frames, put_tables
+
+pytest.importorskip('pyarrow')
+
+
+def sheet(values, timestamp):
+    # Both sides of a comparison sheet use the same column names
+    return pd.DataFrame([['GNODE211 GNODE322 1', value, value + 1, timestamp] for value in values],
+                        columns=['id', 'I', 'I', 'Timestamp'])
+
+
+def test_tables_of_several_workers_are_concatenated_in_order(tmp_path):
+    with TableTransport(str(tmp_path)) as folder:
+        handles = [put_tables(folder, timestamp, {'Lines': sheet(values, timestamp)})['Lines']
+                   for timestamp, values in [('0030', [1, 2]), ('0130', [3.5])]]
+        assert [handle.rows for handle in handles] == [2, 1]
+        frame = concat_frames(handles)
+        expected = pd.concat([sheet([1, 2], '0030'), sheet([3.5], '0130')], ignore_index=True)
+        pd.testing.assert_frame_equal(frame, expected)
+    assert not os.path.exists(folder)
+
+
+def test_tables_with_other_columns_are_refused(tmp_path):
+    with TableTransport(str(tmp_path)) as folder:
+        lines = put_tables(folder, '0030', {'Lines': sheet([1], '0030')})['Lines']
+        nodes = put_tables(folder, '0130', {'Nodes': pd.DataFrame({'Bus': ['GNODE211'], 'U': [400.0]})})['Nodes']
+        with pytest.raises(ValueError):
+            concat_frames([lines, nodes])
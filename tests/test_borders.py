@@ -0,0 +1,72 @@
+import pandas as pd
+import pytest
+
+from Common.borders import BORDERS, assign_borders, border_table, tcc_sums, type_border, x_node_flows
+
+
+def filtered_tcc(X_nodes, Type):
+    # TCC of one type as Monthly TCC computed it before the border table (G/R prefix filter and fixed exclusions)
+    X_nodes = X_nodes.copy()
+    X_nodes['bus_id'] = X_nodes['bus_id'].replace({
+        'RIS1A41_0': 'RISAC41', 'RMED141_0': 'RMEDG41_0',
+        'RPDF241_0': 'RPDFE41', 'RROS241_0': 'RROSI41', 'RTINTA1_0': 'RTINTB1'
+    })
+    X_nodes['bus_id'] = X_nodes['bus_id'].astype(str)
+    if Type.startswith('NGR'):
+        filtered = X_nodes[X_nodes['bus_id'].str.startswith('G')]
+    else:
+        filtered = X_nodes[X_nodes['bus_id'].str.startswith('R')]
+    filtered = filtered[~filtered['bus_id'].isin(['GARACH1_0', 'RISAC41', 'RARA4D1_0', 'RNADA_1_0', 'RROSI41'])]
+    return abs(filtered['boundary_p'].sum())
+
+
+# X-node flows as get_dangling_lines returns them: renamed and excluded buses, a disconnected X-node and one of
+# another country
+FLOWS = pd.DataFrame({
+    'bus_id': ['GNODE21_0', 'GARACH1_0', 'GKARD21_0', 'RIS1A41_0', 'RTINTA1_0', 'RNODE21_0', 'RNADA_1_0', None, 'VNODE11_0'],
+    'boundary_p': [120.5, 40.0, -35.25, 18.0, -60.0, 75.5, 12.0, 99.0, 33.0],
+})
+
+
+def test_tcc_sums_match_the_type_filter():
+    borders = border_table()
+    flows = FLOWS.assign(bus_id=FLOWS['bus_id'].replace({
+        bus: new_bus for border in borders.values() for bus, new_bus in border['renames'].items()}).astype(str))
+    sums = tcc_sums(flows, borders)
+    assert sums['GR'] == pytest.approx(filtered_tcc(FLOWS, 'NGR Export'))
+    assert sums['RO'] == pytest.approx(filtered_tcc(FLOWS, 'SRO Export'))
+    assert sums == pytest.approx({'GR': 85.25, 'RO': 15.5})
+
+
+def test_border_without_x_nodes_sums_to_zero():
+    borders = border_table(table={'BG': {'name': 'BULGARIAN', 'prefix': 'V'}, 'AL': {'name': 'ALBANIAN', 'prefix': 'A'}})
+    sums = tcc_sums(FLOWS.astype({'bus_id': str}), borders)
+    assert sums['BG'] == pytest.approx(33.0)
+    assert sums['AL'] == 0.0
+
+
+def test_assign_borders_and_types():
+    borders = border_table(table={'XG': {'name': 'LONGER', 'prefix': 'GK'}})
+    codes = assign_borders(FLOWS['bus_id'].fillna(''), borders)
+    assert list(codes[:3]) == ['GR', 'GR', 'XG']
+    assert pd.isna(codes.iloc[8])
+    assert type_border('SRO Import', BORDERS) == 'RO'
+    assert type_border('NBG Export', BORDERS) is None
+    with pytest.raises(ValueError):
+        border_table(['BG'])
+
+
+def test_solved_network_matches_the_type_filter(fixture_path):
+    pp = pytest.importorskip('pypowsybl.network')
+    lf = pytest.importorskip('pypowsybl.loadflow')
+    network = pp.load(fixture_path('base.uct'))
+    lf.run_ac(network, lf.Parameters(distributed_slack=False))
+    borders = border_table()
+    flows = x_node_flows(network, borders)
+    assert dict(zip(flows['id'], flows['Border'])) == {'GNODE211 XGR_AL11 1': 'GR', 'RNODE211 XRO_RS11 1': 'RO'}
+
+    X_nodes = network.get_dangling_lines(attributes=['bus_id', 'boundary_p'])
+    sums = tcc_sums(flows, borders)
+    assert sums['GR'] == pytest.approx(filtered_tcc(X_nodes, 'NGR Export'))
+    assert sums['RO'] == pytest.approx(filtered_tcc(X_nodes, 'SRO Export'))
+    assert sums == pytest.approx({'GR': 100.0, 'RO': 50.0}, abs=1e-3)
@@ -0,0 +1,45 @@
+import shutil
+
+import pandas as pd
+import pytest
+
+from Common.borders import border_table
+from Common.scripts import load_script
+
+pp = pytest.importorskip('pypowsybl.network')
+boundary = load_script('boundary')
+
+
+def test_updated_hour_matches_the_batch_files(tmp_path, fixture_path):
+    borders = border_table(['GR', 'RO'])
+    ucte_folder, batch_folder, watch_folder, diagrams_folder = (tmp_path / name for name in ('ucte', 'batch', 'watch', 'diagrams'))
+    for folder in (ucte_folder, batch_folder, watch_folder, diagrams_folder):
+        folder.mkdir()
+    for hour in ('0030', '0130'):
+        shutil.copy(fixture_path('base.uct'), ucte_folder / f'20240717_{hour}_FO3_UX0.uct')
+    boundary.process_boundary_files(str(ucte_folder), str(batch_folder), str(diagrams_folder), '20240717', 'FO3', 'UX', 'uct',
+                                    [0], ['0030', '0130'], borders=borders)
+
+    # The first hour creates the file of every border, the second one is added to them, a repeated hour replaces its rows
+    for hour in ('0030', '0130', '0130'):
+        network = boundary.load_and_run_loadflow(str(ucte_folder / f'20240717_{hour}_FO3_UX0.uct'))
+        written = boundary.update_boundary_hour(network, hour, str(watch_folder), str(diagrams_folder), '20240717',
+                                                ['0030', '0130'], borders)
+    assert sorted(path.rsplit('/', 1)[-1] for path in written) == ['GREEK_BOUNDARY_NODES_20240717.xlsx',
+                                                                   'ROMANIAN_BOUNDARY_NODES_20240717.xlsx']
+    for path in written:
+        updated = pd.read_excel(path, dtype={'Timestamp': str})
+        assert updated['Timestamp'].value_counts().to_dict() == {'0030': 1, '0130': 1}
+        pd.testing.assert_frame_equal(updated, pd.read_excel(batch_folder / path.rsplit('/', 1)[-1], dtype={'Timestamp': str}))
+
+
+def test_watch_refreshes_the_borders_of_its_settings(tmp_path, fixture_path):
+    from Common.watch import update_boundary
+
+    shutil.copy(fixture_path('base.uct'), tmp_path / '20240717_0030_FO3_UX0.uct')
+    settings = {'boundary_ucte_folder': str(tmp_path), 'boundary_folder': str(tmp_path), 'diagrams_folder': str(tmp_path),
+                'file_type': 'FO3', 'boundary_country': 'UX', 'format': 'uct', 'numbers': [0], 'hours': ['0030'],
+                'borders': ['RO', 'AL'], 'border_table': {'AL': {'name': 'ALBANIAN', 'prefix': 'A'}}}
+    update_boundary(boundary, settings, '20240717', '0030')
+    # Albania has no X-nodes in the network and gets no file
+    assert sorted(path.name for path in tmp_path.glob('*_BOUNDARY_NODES_*')) == ['ROMANIAN_BOUNDARY_NODES_20240717.xlsx']
@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+from Common.scripts import load_script
+
+comparisons = load_script('comparisons')
+
+
+def compared(category, unicorn, openlf, timestamp='0030'):
+    # Final rows of one category as compare_sheets gives them, UNICORN and OPENLF values under the same column name
+    merged_df = comparisons.compare_category(category, unicorn, openlf)
+    return comparisons.final_columns_rename(category, merged_df, timestamp).reset_index(drop=True)
+
+
+def compared_lines(unicorn, openlf, timestamp='0030'):
+    # Line currents of both reports, P and Q are equal on both sides
+    ids = [f'GNODE21{number} GNODE32{number} 1' for number in range(len(unicorn))]
+    unicorn_sheet = pd.DataFrame({'Name (mrid)': ids, 'Terminal number': 1, 'I': unicorn, 'P': 100.0, 'Q': 10.0})
+    openlf_sheet = pd.DataFrame({'id': ids, 'side_x': 1, 'I': openlf, 'P': 100.0, 'Q': 10.0})
+    return compared('Lines', unicorn_sheet, openlf_sheet, timestamp)
+
+
+def compared_nodes(unicorn, openlf):
+    # (U, theta) of every node in both reports
+    buses = [f'GNODE21{number}' for number in range(len(unicorn))]
+    unicorn_sheet = pd.DataFrame({'Name (mrid)': buses, 'U': [u for u, _ in unicorn], 'theta': [theta for _, theta in unicorn]})
+    openlf_sheet = pd.DataFrame({'BUS': buses, 'v_mag': [u for u, _ in openlf], 'v_angle': [theta for _, theta in openlf]})
+    return compared('Nodes', unicorn_sheet, openlf_sheet)
+
+
+def test_exceptions_mask_checks_both_tolerances():
+    final_df = compared_lines([100.0, 100.0, 1000.0, 100.0], [101.0, 110.0, 1010.0, 104.0])
+    mask, quantity_masks = comparisons.exceptions_mask(final_df)
+    # I tolerances (5 A, 2 %): 1 A / 1 %, 10 A / 10 %, 10 A / 1 %, 4 A / 4 %
+    assert mask.tolist() == [False, True, False, False]
+    assert quantity_masks['I'].tolist() == [False, True, False, False]
+    assert not quantity_masks['P'].any()
+
+
+def test_exceptions_mask_zero_unicorn_value():
+    # The percentage of a zero UNICORN value is written as 0, the absolute tolerance decides
+    final_df = compared_lines([0.0, 0.0, 100.0], [500.0, 3.0, 100.0])
+    assert final_df['I_diff_pct'].tolist() == [0.0, 0.0, 0.0]
+    mask, _ = comparisons.exceptions_mask(final_df)
+    assert mask.tolist() == [True, False, False]
+
+    # The slack node has a zero UNICORN angle
+    final_df = compared_nodes([(400.0, 0.0), (400.0, -5.0)], [(400.0, 0.5), (400.0, -5.05)])
+    mask, quantity_masks = comparisons.exceptions_mask(final_df)
+    assert quantity_masks['theta'].tolist() == [True, False]
+    assert not quantity_masks['U'].any()
+
+
+def test_exceptions_mask_disabled_side_and_missing_quantities():
+    final_df = compared_nodes([(400.0, -5.0), (400.0, -5.0)], [(400.6, -5.0), (400.2, -5.0)])
+    mask, quantity_masks = comparisons.exceptions_mask(final_df, {'U': (0.5, None), 'I': (5.0, 2.0)})
+    assert mask.tolist() == [True, False]
+    assert list(quantity_masks) == ['U']
+
+    empty, _ = comparisons.exceptions_mask(final_df, {'I': (5.0, 2.0)})
+    assert not empty.any()
+
+
+def test_exceptions_summary_counts_per_timestamp():
+    final_df = pd.concat([compared_lines([100.0, 100.0], [110.0, 101.0], '0030'),
+                          compared_lines([100.0], [100.0], '0130')], ignore_index=True)
+    mask, quantity_masks = comparisons.exceptions_mask(final_df)
+    summary = comparisons.exceptions_summary('Lines', final_df, mask, quantity_masks)
+    assert summary[['Timestamp', 'Compared', 'Exceptions', 'I exceptions']].values.tolist() == [['0030', 2, 1, 1],
+                                                                                              ['0130', 1, 0, 0]]
+    assert np.issubdtype(summary['Exceptions'].dtype, np.integer)
+
+
+def write_reports(folder, date, timestamp, shift):
+    # UNICORN and OPENLF reports of one timestamp: a line and an X-node line, both nodes and the X-node
+    ids = ['GNODE211 GNODE322 1', 'GNODE211 XGR_AL11 1']
+    currents = [100.0 + shift, 50.0]
+    unicorn_lines = pd.DataFrame({'Name (mrid)': ids * 2, 'Terminal number': [1, 1, 2, 2],
+                                  'Bus': ['GNODE211', 'GNODE211', 'GNODE322', 'XGR_AL11'], 'I': currents * 2,
+                                  'P': [60.0, 30.0] * 2, 'Q': [5.0, 2.0] * 2})
+    unicorn_buses = pd.DataFrame({'Name (mrid)': ['GNODE211', 'GNODE322', 'XGR_AL11'], 'U': [400.0, 399.0, 398.0],
+                                  'theta': [0.0, -1.0, -2.0]})
+    with pd.ExcelWriter(folder / f'{date}_{timestamp}_FO3_GR_3_igmLfReport.xlsx') as writer:
+        unicorn_lines.to_excel(writer, sheet_name='Line', index=False)
+        unicorn_buses.to_excel(writer, sheet_name='Bus', index=False)
+    openlf_lines = unicorn_lines.rename(columns={'Name (mrid)': 'id', 'Terminal number': 'side_x', 'Bus': 'BUS'}).assign(I=[101.0 + shift, 50.0] * 2)
+    openlf_x_nodes = pd.DataFrame({'id': [ids[1]], 'BUS': ['GNODE211'], 'I': [50.0], 'P': [30.0], 'Q': [2.0],
+                                   'boundary_v_mag': [398.5], 'boundary_v_angle': [-2.0]})
+    openlf_buses = pd.DataFrame({'BUS': ['GNODE211', 'GNODE322'], 'v_mag': [400.0, 399.2], 'v_angle': [0.0, -1.0]})
+    with pd.ExcelWriter(folder / f'{date}_{timestamp}_FO3_GR_0_OPENLF_REPORT.xlsx') as writer:
+        openlf_buses.to_excel(writer, sheet_name='Bus', index=False)
+        openlf_lines.to_excel(writer, sheet_name='Line', index=False)
+        openlf_x_nodes.to_excel(writer, sheet_name='X-Nodes', index=False)
+
+
+def test_month_job_compares_every_day(tmp_path):
+    from Common.batch import execute_job, expand_jobs, merge_settings
+
+    reports, results = tmp_path / 'reports', tmp_path / 'results'
+    reports.mkdir()
+    for shift, date in enumerate(['20240730', '20240731']):
+        for timestamp in ['0030', '0130']:
+            write_reports(reports, date, timestamp, shift)
+    settings = merge_settings({}, {'start_date': '20240730', 'end_date': '20240801', 'stages': ['comparisons'],
+                                   'file_types': ['FO3'], 'hours': ['0030', '0130'], 'comparison_mode': 'month',
+                                   'reports_folder': str(reports), 'comparison_folder': str(results)})
+    jobs = expand_jobs(settings)
+    assert [(key, params['dates']) for key, _, params, _ in jobs] == [
+        (('comparisons', '202407', 'GR', 'FO3'), ['20240730', '20240731']), (('comparisons', '202408', 'GR', 'FO3'), ['20240801'])]
+
+    execute_job('comparisons', jobs[0][2])
+    for date in ['20240730', '20240731']:
+        path = results / f'combined_results_OpenLF_Unicorn_{date}.xlsx'
+        nodes = pd.read_excel(path, sheet_name='Nodes', header=1)
+        assert nodes['Timestamp'].tolist() == [30, 30, 130, 130]
+        # Day cube statistics of every element over both timestamps
+        statistics = pd.read_excel(path, sheet_name='Lines statistics')
+        assert statistics['Timestamps'].tolist() == [2, 2, 2, 2]
+        assert statistics.loc[statistics['id'] == 'GNODE211 GNODE322 1', 'I_diff_abs_max'].tolist() == [1.0, 1.0]
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from Common.flow_aggregates import FlowAggregator, StreamingHistogram
+
+
+def day_rows(day):
+    # Two nodes at 00:30 and 01:30, the P of the second node is missing on the first day
+    return pd.DataFrame({'bus_breaker_id': ['XGR_AL11', 'XGR_AL11', 'XGR_MK11', 'XGR_MK11'],
+                         'id': ['GNODE211 XGR_AL11 1'] * 2 + ['GNODE212 XGR_MK11 1'] * 2,
+                         'Timestamp': [30, 130, 30, 130],
+                         'P': [100.0 + day, 110.0 + day, np.nan if day == 0 else -20.0, -25.0]})
+
+
+def test_profiles_match_the_raw_rows():
+    aggregator = FlowAggregator(['0030', '0130'], quantities=['P'])
+    days = [day_rows(day) for day in range(3)]
+    for rows in days:
+        aggregator.add_frame(rows)
+    profiles = aggregator.profiles().set_index(['bus_breaker_id', 'Timestamp'])
+    raw = pd.concat(days).assign(Timestamp=lambda rows: rows['Timestamp'].map('{:04d}'.format))
+    expected = raw.groupby(['bus_breaker_id', 'Timestamp'])['P'].agg(['count', 'mean', 'min', 'max'])
+    assert profiles['Count'].tolist() == expected['count'].tolist()
+    np.testing.assert_allclose(profiles[['Mean', 'Min', 'Max']].to_numpy(), expected[['mean', 'min', 'max']].to_numpy())
+    assert aggregator.nodes == ['XGR_AL11', 'XGR_MK11']
+    assert aggregator.labels['XGR_MK11'] == 'GNODE212 XGR_MK11 1'
+
+
+def test_timestamps_outside_the_axis_are_ignored():
+    aggregator = FlowAggregator(['0030'], quantities=['P'])
+    aggregator.add_frame(day_rows(0).assign(Timestamp=['0030', '0230', '0030', None]))
+    assert aggregator.profiles()['Count'].tolist() == [1, 0]
+
+
+def test_histogram_grows_and_keeps_the_duration_curve():
+    rng = np.random.default_rng(1)
+    values = rng.normal(0, 100, 20000)
+    histogram = StreamingHistogram(bins=200)
+    histogram.add(values[:10])
+    for start in range(10, len(values), 1000):
+        histogram.add(values[start:start + 1000])
+    assert len(histogram) == len(values)
+    exceedance, curve = histogram.duration_curve(5)
+    assert curve[0] == values.max() and curve[-1] == values.min()
+    # Resolution follows the range seen so far
+    np.testing.assert_allclose(curve[1:4], np.percentile(values, [75, 50, 25]), atol=2 * histogram.width)
+    with pytest.raises(ValueError):
+        StreamingHistogram(bins=3)
@@ -0,0 +1,27 @@
+import csv
+
+import pytest
+
+from Common.memory_scheduler import MemoryScheduler
+
+# Light script functions run in the spawned workers, the second job raises a ValueError
+JOBS = [('boundary', 'calculate_step_size', (1000, 5), 'first'),
+        ('boundary', 'calculate_step_size', (1000, 0), 'no ticks'),
+        ('boundary', 'calculate_step_size', (2000, 10), 'third')]
+
+
+def test_failed_job_is_recorded(tmp_path):
+    report = tmp_path / 'memory_report.csv'
+    records = MemoryScheduler(1000, max_workers=2, sample_jobs=1).run(JOBS, report_path=str(report), raise_errors=False)
+    assert [record['label'] for record in records] == ['first', 'no ticks', 'third']
+    assert [record['result'] for record in records] == [200, None, 200]
+    assert records[1]['error'] == 'ValueError: Number of ticks should be greater than zero.'
+
+    with open(report, newline='', encoding='utf-8') as file:
+        rows = list(csv.DictReader(file))
+    assert [row['Error'] for row in rows] == ['', records[1]['error'], '']
+
+
+def test_failed_job_raises_by_default():
+    with pytest.raises(RuntimeError, match='1 of 3 jobs failed, first no ticks'):
+        MemoryScheduler(1000, max_workers=2, sample_jobs=1).run(JOBS)
@@ -0,0 +1,49 @@
+import threading
+
+from Common.pipeline import Pipeline, Stage, failed_keys
+
+
+def test_every_item_passes_all_stages():
+    pipeline = Pipeline([Stage('read', lambda hour: (hour, hour * 10), workers=2),
+                         Stage('solve', lambda item: (item[0], item[1] + 1), workers=3),
+                         Stage('write', lambda item: item[0])])
+    results, errors = pipeline.run(range(20))
+    assert sorted(results) == list(range(20))
+    assert errors == []
+    assert [stage.processed for stage in pipeline.stages] == [20, 20, 20]
+
+
+def solve(item):
+    hour, _ = item
+    if hour == 3:
+        raise RuntimeError('diverged')
+    return item
+
+
+def test_failed_and_dropped_items_do_not_stop_the_others():
+    pipeline = Pipeline([Stage('read', lambda hour: None if hour == 5 else (hour, 'network')),
+                         Stage('solve', solve, workers=2)])
+    results, errors = pipeline.run(range(8))
+    assert sorted(hour for hour, _ in results) == [0, 1, 2, 4, 6, 7]
+    assert [(stage, str(error)) for stage, _, error in errors] == [('solve', 'diverged')]
+    assert failed_keys(errors) == [3]
+
+
+def test_bounded_queues_limit_items_in_flight():
+    in_flight, peak, lock = [0], [0], threading.Lock()
+
+    def read(hour):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        return hour
+
+    def write(hour):
+        with lock:
+            in_flight[0] -= 1
+        return hour
+
+    results, _ = Pipeline([Stage('read', read), Stage('write', write, queue_size=1)]).run(range(50))
+    assert len(results) == 50
+    # One item in the queue, one being written and one waiting to be put
+    assert peak[0] <= 3
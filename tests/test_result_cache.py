@@ -0,0 +1,41 @@
+import os
+
+from Common.result_cache import ResultCache, cache_key, file_fingerprint
+
+
+def write(path, text, mtime_ns=None):
+    path.write_text(text)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return str(path)
+
+
+def test_key_follows_content_and_settings(tmp_path):
+    report = write(tmp_path / 'report.xlsx', 'hour 1', mtime_ns=10 ** 18)
+    key = cache_key([report], {'threshold': 0.001})
+    # Touching the file keeps the key, changing its content or the settings does not
+    write(tmp_path / 'report.xlsx', 'hour 1', mtime_ns=2 * 10 ** 18)
+    assert cache_key([report], {'threshold': 0.001}) == key
+    assert cache_key([report], {'threshold': 0.01}) != key
+    write(tmp_path / 'report.xlsx', 'hour 2', mtime_ns=3 * 10 ** 18)
+    assert cache_key([report], {'threshold': 0.001}) != key
+    assert file_fingerprint(report)[:2] == (6, 3 * 10 ** 18)
+
+
+def test_hit_miss_and_replaced_entry(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    assert cache.get('0030', 'a') is None
+    cache.put('0030', 'a', {'Lines': [1, 2]})
+    assert cache.get('0030', 'a') == {'Lines': [1, 2]}
+    assert cache.get('0030', 'b') is None
+    cache.put('0030', 'b', {'Lines': [3]})
+    assert cache.get('0030', 'a') is None and cache.get('0030', 'b') == {'Lines': [3]}
+    assert (cache.hits, cache.misses) == (2, 3)
+    assert os.listdir(cache.cache_folder) == ['0030.pkl']
+
+
+def test_unreadable_entry_is_a_miss(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    (tmp_path / '0030.pkl').write_bytes(b'not a pickle')
+    assert cache.get('0030', 'a') is None
+    assert cache.misses == 1
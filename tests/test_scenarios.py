@@ -0,0 +1,68 @@
+import pytest
+
+from Common.scenarios import BASE_VARIANT, ScenarioLoader, diff_records, read_records
+
+# Element state a scenario variant sets, compared with a fresh load of the scenario file
+STATE = [
+    ('get_loads', ['p0', 'q0']),
+    ('get_generators', ['target_p', 'target_q', 'target_v', 'voltage_regulator_on']),
+    ('get_dangling_lines', ['p0', 'q0', 'connected']),
+    ('get_lines', ['connected1', 'connected2']),
+    ('get_2_windings_transformers', ['connected1', 'connected2']),
+    ('get_ratio_tap_changers', ['tap']),
+]
+
+
+def test_diff_records(fixture_path):
+    base = read_records(fixture_path('base.uct'))
+    changes, reason = diff_records(base, read_records(fixture_path('scenario.uct')))
+    assert reason is None
+    assert changes == {'loads': {'GNODE211_load': (320.0, 50.0)}, 'generators': {}, 'x_nodes': {'XGR_AL11': (140.0, 0.0)},
+                       'statuses': {'GNODE211 VNODE111 1': False}, 'ratio_taps': {'GNODE211 GNODE322 1': 4},
+                       'phase_taps': {}}
+
+    unchanged, reason = diff_records(base, base)
+    assert reason is None and not any(unchanged.values())
+
+
+def test_diff_records_impedance_change_is_loaded_normally(fixture_path):
+    changes, reason = diff_records(read_records(fixture_path('base.uct')), read_records(fixture_path('impedance.uct')))
+    assert changes is None
+    assert reason == 'element G5MEGA14 GNODE211 1 changed beyond its status'
+
+
+def assert_same_state(network, fresh):
+    for getter, columns in STATE:
+        variant, loaded = getattr(network, getter)()[columns], getattr(fresh, getter)()[columns]
+        assert variant.sort_index().equals(loaded.sort_index()), getter
+
+
+def test_apply_matches_fresh_load(fixture_path):
+    pp = pytest.importorskip('pypowsybl.network')
+    network = pp.load(fixture_path('base.uct'))
+    loader = ScenarioLoader(network, fixture_path('base.uct'))
+    assert loader.apply(fixture_path('scenario.uct')) is None
+    assert_same_state(network, pp.load(fixture_path('scenario.uct')))
+
+    loader.reset()
+    assert network.get_working_variant_id() == BASE_VARIANT
+    assert_same_state(network, pp.load(fixture_path('base.uct')))
+
+
+def test_apply_starts_from_the_unsolved_base(fixture_path):
+    pp = pytest.importorskip('pypowsybl.network')
+    network = pp.load(fixture_path('base.uct'))
+    loader = ScenarioLoader(network, fixture_path('base.uct'))
+    # As a regulated solve of the base would: taps the scenario file does not change must not be inherited
+    network.update_ratio_tap_changers(id='GNODE211 GNODE322 1', tap=-7)
+    network.update_loads(id='GNODE322_load', p0=95.0)
+    assert loader.apply(fixture_path('scenario.uct')) is None
+    assert_same_state(network, pp.load(fixture_path('scenario.uct')))
+
+
+def test_apply_falls_back_on_impedance_change(fixture_path):
+    pp = pytest.importorskip('pypowsybl.network')
+    network = pp.load(fixture_path('base.uct'))
+    loader = ScenarioLoader(network, fixture_path('base.uct'))
+    assert loader.apply(fixture_path('impedance.uct')) == 'element G5MEGA14 GNODE211 1 changed beyond its status'
+    assert network.get_working_variant_id() == BASE_VARIANT
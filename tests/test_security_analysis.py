@@ -0,0 +1,31 @@
+import shutil
+
+import pandas as pd
+import pytest
+
+from Common.scripts import load_script
+
+pytest.importorskip('pypowsybl.security')
+daily_lf = load_script('daily_lf')
+
+
+def report_path(folder, hour):
+    return folder / f'20240717_{hour}_FO3_GR_0_OPENLF_N-1_REPORT.xlsx'
+
+
+def test_hours_are_analysed_independently(tmp_path, fixture_path):
+    shutil.copy(fixture_path('base.uct'), tmp_path / '20240717_0030_FO3_GR0.uct')
+    # A network without nodes has no converged base case, an unreadable file raises
+    (tmp_path / '20240717_0130_FO3_GR0.uct').write_text('##C 2007.05.01\n')
+    (tmp_path / '20240717_0230_FO3_GR0.uct').write_text('##C 2007.05.01\n##N\n##ZGR\nGARBAGE\n')
+    failed = daily_lf.process_security_files('20240717', ['0030', '0130', '0230'], [0], 'FO3', 'GR', 'uct',
+                                             str(tmp_path), str(tmp_path))
+    assert failed == ['0230']
+    assert not report_path(tmp_path, '0130').exists() and not report_path(tmp_path, '0230').exists()
+
+    sheets = pd.read_excel(report_path(tmp_path, '0030'), sheet_name=None)
+    assert list(sheets) == ['N-1 Branches', 'Contingencies', 'Limit Violations']
+    # The Greek and Romanian lines to Bulgaria and the X-node lines are tripped
+    assert sheets['Contingencies']['element_type'].value_counts().to_dict() == {'LINE': 3, 'DANGLING_LINE': 2}
+    assert set(sheets['Contingencies']['status']) == {'CONVERGED'}
+    assert 'BASE CASE' in set(sheets['N-1 Branches']['contingency_id'])
@@ -0,0 +1,38 @@
+import json
+
+import pytest
+
+from Common.solver import StrategyStore, run_loadflow
+
+
+def test_stores_of_two_workers_keep_both_entries(tmp_path, fixture_path):
+    path = str(tmp_path / 'solver_strategies.jsonl')
+    first, second = StrategyStore(path), StrategyStore(path)
+    first.put(fixture_path('base.uct'), 'robust')
+    second.put(fixture_path('scenario.uct'), 'regulated')
+    second.save()
+    first.save()
+    store = StrategyStore(path)
+    assert store.get(fixture_path('base.uct')) == 'robust'
+    assert store.get(fixture_path('scenario.uct')) == 'regulated'
+    assert store.get(fixture_path('impedance.uct')) is None
+
+
+def test_line_cut_by_a_crashed_writer(tmp_path, fixture_path):
+    path = tmp_path / 'solver_strategies.jsonl'
+    path.write_text('{"key": "abc", "profile": "fast"}\n{"key": "de')
+    store = StrategyStore(str(path), autosave=1)
+    assert list(store.strategies) == ['abc']
+    store.put(fixture_path('base.uct'), 'fast')
+    # The new entry starts on its own line and the cut line stays unreadable
+    lines = path.read_text().splitlines()
+    assert json.loads(lines[-1])['profile'] == 'fast'
+    assert StrategyStore(str(path)).get(fixture_path('base.uct')) == 'fast'
+
+
+def test_remembered_profile_is_tried_first(tmp_path, fixture_path):
+    pp = pytest.importorskip('pypowsybl.network')
+    store = StrategyStore(str(tmp_path / 'solver_strategies.jsonl'))
+    assert run_loadflow(pp.load(fixture_path('base.uct')), fixture_path('base.uct'), store=store) == 'fast'
+    store.put(fixture_path('base.uct'), 'regulated')
+    assert run_loadflow(pp.load(fixture_path('base.uct')), fixture_path('base.uct'), store=store) == 'regulated'
@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+from Common.solver_report import METRICS_FILE, SolverReport, filter_records, format_records
+
+
+RECORDS = [
+    {'depth': 0, 'key': 'loadFlow', 'severity': None, 'message': 'Load flow', 'values': {}},
+    {'depth': 1, 'key': 'busCount', 'severity': 'INFO', 'message': '8 buses', 'values': {}},
+    {'depth': 1, 'key': 'lowVoltage', 'severity': 'WARN', 'message': 'Low voltage', 'values': {}},
+    {'depth': 1, 'key': 'acLfComplete', 'severity': 'INFO', 'message': 'AC load flow complete', 'values': {}},
+]
+
+
+def test_filter_keeps_warnings_and_summaries():
+    assert [record['key'] for record in filter_records(RECORDS)] == ['lowVoltage', 'acLfComplete']
+    assert [record['key'] for record in filter_records(RECORDS, 'ERROR', summary_keys=())] == []
+    assert format_records(RECORDS[:2]) == 'Load flow\n  8 buses'
+
+
+def test_report_of_a_solved_file(tmp_path, fixture_path):
+    pp = pytest.importorskip('pypowsybl.network')
+    from Common.solver import run_loadflow
+
+    report = SolverReport(fixture_path('base.uct'), str(tmp_path), full_detail=True)
+    profile = run_loadflow(pp.load(fixture_path('base.uct')), report=report)
+    metrics = report.finish(profile)
+    assert (metrics['file'], metrics['profile'], metrics['converged'], metrics['attempts']) == ('base.uct', 'fast', True, 1)
+    assert metrics['status'] == 'CONVERGED' and metrics['iterations'] > 0
+    assert 'AC' in open(metrics['detail']).read()
+    lines = (tmp_path / METRICS_FILE).read_text().splitlines()
+    assert [json.loads(line)['file'] for line in lines] == ['base.uct']
+
+
+def test_diverged_file_writes_its_detail(tmp_path, fixture_path):
+    pytest.importorskip('pypowsybl.report')
+    report = SolverReport(fixture_path('base.uct'), str(tmp_path))
+    metrics = report.finish(None)
+    assert not metrics['converged'] and metrics['status'] is None
+    assert metrics['detail'].endswith('base.txt')
+    assert SolverReport(fixture_path('base.uct')).finish(None)['detail'] is None
@@ -0,0 +1,20 @@
+import sys
+
+from Common.lazy import LazyModule, lazy_import
+from Common.startup import ENTRY_POINTS, check_startup
+
+
+def test_entry_points_do_not_import_heavy_modules():
+    # The import time itself depends on the machine, only the heavy imports are checked
+    rows = check_startup(budget_ms=10 ** 6)
+    assert [row['entry_point'] for row in rows] == list(ENTRY_POINTS)
+    assert {row['entry_point']: row['heavy_modules'] for row in rows} == {name: [] for name in ENTRY_POINTS}
+
+
+def test_lazy_module_imports_on_first_use():
+    sys.modules.pop('colorsys', None)
+    module = lazy_import('colorsys')
+    assert isinstance(module, LazyModule) and 'not loaded' in repr(module)
+    assert 'colorsys' not in sys.modules
+    assert module.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+    assert 'colorsys' in sys.modules and lazy_import('colorsys') is sys.modules['colorsys']
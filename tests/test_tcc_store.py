@@ -0,0 +1,54 @@
+import os
+
+import pandas as pd
+import pytest
+
+from Common.tcc_store import append_tcc, partition_path, query_tcc
+
+pytest.importorskip('pyarrow')
+
+
+def tcc_rows(date, timestamps, border, values):
+    return pd.DataFrame({'Date': date, 'Timestamp': timestamps, 'Border & Direction': border, 'TCC': values})
+
+
+def test_rerun_of_some_hours_keeps_the_other_hours(tmp_path):
+    store = str(tmp_path)
+    append_tcc(store, tcc_rows('20240717', ['00:30', '01:30', '02:30'], 'NGR Export', [100.0, 110.0, 120.0]))
+    append_tcc(store, tcc_rows('20240717', ['01:30'], 'NGR Export', [115.0]))
+    stored = query_tcc(store)
+    assert stored[['Timestamp', 'TCC']].values.tolist() == [['00:30', 100.0], ['01:30', 115.0], ['02:30', 120.0]]
+
+
+def test_rerun_of_a_month_does_not_duplicate(tmp_path):
+    store = str(tmp_path)
+    month = pd.concat([tcc_rows('20240717', ['00:30', '00:30', '01:30'], 'NGR Export', [100.0, 101.0, 110.0]),
+                       tcc_rows('20240717', ['00:30'], 'SRO Export', [50.0]),
+                       tcc_rows('20240801', ['00:30'], 'NGR Export', [90.0])], ignore_index=True)
+    append_tcc(store, month)
+    append_tcc(store, month)
+    stored = query_tcc(store)
+    assert len(stored) == len(month)
+    # Rows of one key (one per D/U file) keep their file order
+    assert query_tcc(store, '20240717', '20240717', ['NGR Export'])['TCC'].tolist() == [100.0, 101.0, 110.0]
+    assert os.path.exists(partition_path(store, 2024, 8))
+
+
+def test_other_borders_and_days_are_kept(tmp_path):
+    store = str(tmp_path)
+    append_tcc(store, pd.concat([tcc_rows('20240717', ['00:30'], 'NGR Export', [100.0]),
+                                 tcc_rows('20240717', ['00:30'], 'SRO Export', [50.0]),
+                                 tcc_rows('20240718', ['00:30'], 'NGR Export', [105.0])], ignore_index=True))
+    append_tcc(store, tcc_rows('20240717', ['00:30'], 'NGR Export', [99.0]))
+    stored = query_tcc(store).set_index(['Date', 'Border & Direction'])['TCC']
+    assert stored.to_dict() == {('20240717', 'NGR Export'): 99.0, ('20240717', 'SRO Export'): 50.0,
+                                ('20240718', 'NGR Export'): 105.0}
+
+
+def test_daily_aggregate(tmp_path):
+    store = str(tmp_path)
+    append_tcc(store, tcc_rows('20240717', ['00:30', '01:30', '02:30'], 'NGR Export', [100.0, 110.0, 120.0]))
+    summary = query_tcc(store, aggregate='daily', percentile=50)
+    assert summary[['Min', 'Max', 'Mean', 'Count', 'P50']].values.tolist() == [[100.0, 120.0, 110.0, 3, 110.0]]
+    with pytest.raises(ValueError):
+        query_tcc(store, aggregate='weekly')
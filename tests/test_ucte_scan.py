@@ -0,0 +1,51 @@
+from Common.ucte_scan import is_relevant, scan_ucte, x_node_neighbours
+
+
+def write_variant(tmp_path, fixture_path, text_change):
+    # A copy of base.uct changed by text_change(text)
+    with open(fixture_path('base.uct'), 'r', encoding='latin-1') as file:
+        text = file.read()
+    path = tmp_path / 'variant.uct'
+    path.write_text(text_change(text), encoding='latin-1')
+    return str(path)
+
+
+def test_scan_base(fixture_path):
+    scan = scan_ucte(fixture_path('base.uct'))
+    assert scan['valid'], scan['errors']
+    assert scan['countries'] == ['GR', 'RO', 'BG', 'XX']
+    assert (scan['nodes'], scan['lines'], scan['transformers']) == (8, 7, 1)
+    assert scan['x_nodes'] == {'XGR_AL11': ['GNODE211'], 'XRO_RS11': ['RNODE211']}
+    assert x_node_neighbours(scan, ['G']) == ['GNODE211']
+    assert is_relevant(scan, ['R']) and not is_relevant(scan, ['V'])
+
+
+def test_file_ending_with_tt_block_is_valid(tmp_path, fixture_path):
+    # ##TT records are shorter than transformers, they must not be read as a truncated ##T record
+    path = write_variant(tmp_path, fixture_path, lambda text: text + '##TT\nGNODE211 GNODE322 1 ASYM   12.0  90.0\n')
+    scan = scan_ucte(path)
+    assert scan['valid'], scan['errors']
+    assert scan['transformers'] == 1
+
+
+def test_truncated_last_record(tmp_path, fixture_path):
+    path = write_variant(tmp_path, fixture_path, lambda text: text[:text.index('##R')] + 'GNODE211 GNODE322 1 0 400.0\n')
+    scan = scan_ucte(path)
+    assert not scan['valid']
+    assert scan['errors'][0].startswith('truncated record')
+
+
+def test_empty_file_and_missing_block(tmp_path, fixture_path):
+    empty = tmp_path / 'empty.uct'
+    empty.write_text('')
+    assert scan_ucte(str(empty))['errors'] == ['empty file']
+
+    path = write_variant(tmp_path, fixture_path, lambda text: text[:text.index('##L')])
+    assert scan_ucte(path)['errors'] == ['missing block(s) ##L']
+
+
+def test_line_to_unknown_node(tmp_path, fixture_path):
+    path = write_variant(tmp_path, fixture_path, lambda text: text.replace('RNODE111 RNODE211 1', 'RNODE111 RNODE999 1'))
+    scan = scan_ucte(path)
+    assert not scan['valid']
+    assert "unknown node 'RNODE999'" in scan['errors'][0]
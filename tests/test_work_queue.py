@@ -0,0 +1,61 @@
+from Common.work_queue import DONE, FAILED, PENDING, RUNNING, WorkQueue
+
+
+def statuses(queue):
+    return {job['id']: job['status'] for job in queue.jobs()}
+
+
+def expire_leases(queue):
+    # As if the workers had stopped renewing their leases long ago
+    queue.connection.execute('UPDATE jobs SET claimed_at = 0 WHERE status = ?', (RUNNING,))
+
+
+def test_dependencies_run_first(tmp_path):
+    with WorkQueue(str(tmp_path / 'queue.db')) as queue:
+        first = queue.enqueue('daily_lf', {'date': '20240717'})
+        second = queue.enqueue('comparisons', {'date': '20240717'}, depends_on=[first])
+        assert queue.enqueue('daily_lf', {'date': '20240717'}) == first
+        assert queue.claim('a')[0] == first
+        assert queue.claim('b') is None
+        assert queue.complete(first, 'a')
+        assert queue.claim('b') == (second, 'comparisons', {'date': '20240717'})
+
+
+def test_failure_is_retried_then_cascades(tmp_path):
+    with WorkQueue(str(tmp_path / 'queue.db')) as queue:
+        first = queue.enqueue('daily_lf', {'date': '20240717'}, max_attempts=2)
+        second = queue.enqueue('comparisons', {'date': '20240717'}, depends_on=[first])
+        third = queue.enqueue('tcc', {'date': '20240717'}, depends_on=[second])
+        queue.claim('a')
+        queue.fail(first, 'error', 'a')
+        assert statuses(queue)[first] == PENDING
+        queue.claim('a')
+        queue.fail(first, 'error', 'a')
+        assert statuses(queue) == {first: FAILED, second: FAILED, third: FAILED}
+        assert queue.retry_failed() == 3
+
+
+def test_finish_by_a_worker_that_lost_the_job(tmp_path):
+    with WorkQueue(str(tmp_path / 'queue.db')) as queue:
+        job = queue.enqueue('daily_lf', {'date': '20240717'})
+        queue.claim('a')
+        expire_leases(queue)
+        assert queue.claim('b')[0] == job
+        assert not queue.heartbeat(job, 'a')
+        assert not queue.complete(job, 'a') and not queue.fail(job, 'error', 'a')
+        assert queue.complete(job, 'b')
+        assert statuses(queue) == {job: DONE}
+
+
+def test_expired_lease_without_attempts_left_fails(tmp_path):
+    with WorkQueue(str(tmp_path / 'queue.db')) as queue:
+        first = queue.enqueue('daily_lf', {'date': '20240717'}, max_attempts=2)
+        second = queue.enqueue('comparisons', {'date': '20240717'}, depends_on=[first])
+        for _ in range(2):
+            assert queue.claim('a')[0] == first
+            expire_leases(queue)
+        # Both attempts crashed: the job and its dependant fail instead of being claimed again
+        assert queue.claim('b') is None
+        assert statuses(queue) == {first: FAILED, second: FAILED}
+        assert not queue.has_open_jobs()
+        assert queue.jobs(FAILED)[0]['error'] == 'Lease of worker a expired'